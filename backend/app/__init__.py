@@ -29,6 +29,11 @@ def create_app(config_class=Config):
         # Import models INSIDE app context to ensure they're registered properly
         from app.models.user import User
         from app.models.inventory import Product, Transaction  # Import specific classes
+        from app.models.rollups import StockRollup, DailySales, ProductTrend, TrendRefresh
+        from app.models.alerts import StockAlert, AlertCursor
+        from app.models.locations import Location, StockLevel
+        from app.models.assistant import AssistantSession
+        from app.models.idempotency import IdempotencyKey
         
         # This ensures models are registered with metadata
         # Print table names to confirm registration
@@ -38,13 +43,29 @@ def create_app(config_class=Config):
     from app.routes.auth import auth_bp
     from app.routes.inventory import inventory_bp
     from app.routes.predictions import predictions_bp
+    from app.routes.alerts import alerts_bp
+    from app.routes.health import health_bp
+    from app.routes.locations import locations_bp
+    from app.routes.batch import batch_bp
     from app.routes.csv_handler import csv_handler
     from app.routes.assistant import assistant_bp
+    from app.services import product_changes
+    from app.services.sales_store import append_committed_sales
+    from app.utils.instrumentation import metrics_bp, init_instrumentation
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(inventory_bp, url_prefix='/api/inventory')
     app.register_blueprint(predictions_bp, url_prefix='/api/predictions')
+    app.register_blueprint(alerts_bp, url_prefix='/api/alerts')
+    app.register_blueprint(health_bp, url_prefix='/api')
+    app.register_blueprint(locations_bp, url_prefix='/api/locations')
+    app.register_blueprint(batch_bp, url_prefix='/api')
     app.register_blueprint(csv_handler, url_prefix='/api/csv')
     app.register_blueprint(assistant_bp)
+    app.register_blueprint(metrics_bp)
+
+    init_instrumentation(app)
+    # The sales store follows committed sales and new products
+    product_changes.on_commit(append_committed_sales)
 
     return app
\ No newline at end of file
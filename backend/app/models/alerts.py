@@ -0,0 +1,36 @@
+from datetime import datetime
+from app.extensions import db
+
+class StockAlert(db.Model):
+    """A product crossing its reorder level, recorded when the write happens."""
+    __tablename__ = 'stock_alerts'
+
+    id = db.Column(db.Integer, primary_key=True)  # doubles as the stream cursor
+    product_id = db.Column(db.String(10), nullable=False, index=True)
+    product_name = db.Column(db.String(100), nullable=False)
+    alert_type = db.Column(db.String(20), nullable=False)  # 'low_stock', 'out_of_stock' or 'restocked'
+    current_stock = db.Column(db.Integer, nullable=False)
+    reorder_level = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StockAlert {self.id}: {self.alert_type} {self.product_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'product_name': self.product_name,
+            'alert_type': self.alert_type,
+            'current_stock': self.current_stock,
+            'reorder_level': self.reorder_level,
+            'created_at': self.created_at.isoformat()
+        }
+
+class AlertCursor(db.Model):
+    """Last alert delivered to each user, so a new session resumes where the last one stopped."""
+    __tablename__ = 'alert_cursors'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    last_alert_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from app.extensions import db
+
+class AssistantSession(db.Model):
+    """One assistant conversation, kept so follow-up questions reuse the model's prompt cache.
+
+    The system message (instructions plus the inventory summary taken at
+    priming time) is stored verbatim: Ollama only re-processes a prompt from
+    the first token that differs from the previous request, so it must stay
+    byte-for-byte identical between turns.
+    """
+    __tablename__ = 'assistant_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)  # random hex, handed to the client
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    system_prompt = db.Column(db.Text, nullable=True)  # None until the LLM is first asked
+    primed_at = db.Column(db.DateTime, nullable=True)  # when the summary in system_prompt was taken
+    messages = db.Column(db.Text, nullable=False, default='[]')  # JSON [{'role', 'content'}], oldest first
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<AssistantSession {self.id}>'
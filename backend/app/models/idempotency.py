@@ -0,0 +1,21 @@
+from datetime import datetime
+from app.extensions import db
+
+class IdempotencyKey(db.Model):
+    """A client's Idempotency-Key and the response the first request with it got.
+
+    The row is inserted in the same database transaction as the write it
+    guards, so the write and the claim commit (or roll back) together.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of method, path and canonical JSON body
+    status_code = db.Column(db.Integer, nullable=True)  # None until the response is stored
+    response = db.Column(db.Text, nullable=True)
+    mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key}>'
@@ -4,6 +4,11 @@ import json
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Catalog snapshots read back recently updated products (see catalog_snapshot)
+        db.Index('ix_products_updated_at', 'updated_at'),
+        db.Index('ix_products_search_rowid', 'search_rowid', unique=True),
+    )
     
     id = db.Column(db.String(10), primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -17,6 +22,8 @@ class Product(db.Model):
     historical_sales = db.Column(db.Text, nullable=False)  # JSON string
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Key of the product in the full-text index, set by its insert trigger (see search_service)
+    search_rowid = db.Column(db.Integer)
     
     def __repr__(self):
         return f'<Product {self.id}: {self.name}>'
@@ -39,12 +46,22 @@ class Product(db.Model):
         
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    # Range queries over the ledger filter by date, usually for one product
+    __table_args__ = (
+        db.Index('ix_transactions_product_date', 'product_id', 'transaction_date'),
+        db.Index('ix_transactions_date', 'transaction_date'),
+        # Only sales not yet folded into historical_sales, so the flush finds them without a scan
+        db.Index('ix_transactions_history_pending', 'history_pending', sqlite_where=db.text('history_pending = 1')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.String(10), db.ForeignKey('products.id'), nullable=False)
     transaction_type = db.Column(db.String(20), nullable=False)  # 'sale', 'restock', 'return', etc.
     quantity = db.Column(db.Integer, nullable=False)
     transaction_date = db.Column(db.DateTime, default=datetime.utcnow)
+    location_id = db.Column(db.String(10), db.ForeignKey('locations.id'))  # None for stock not held per location
+    # A sale whose quantity is not in the product's historical_sales yet (see sales_history)
+    history_pending = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     
     product = db.relationship('Product', backref=db.backref('transactions', lazy=True))
     
@@ -0,0 +1,45 @@
+from datetime import datetime
+from app.extensions import db
+
+class Location(db.Model):
+    """A warehouse or store holding its own stock."""
+    __tablename__ = 'locations'
+
+    id = db.Column(db.String(10), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Location {self.id}: {self.name}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created_at': self.created_at.isoformat()
+        }
+
+class StockLevel(db.Model):
+    """Units of one product held at one location.
+
+    Once a product has any stock levels, Product.current_stock is their sum:
+    sales and transfers update these rows, and each change is added to the
+    product total afterwards (see location_service).
+    """
+    __tablename__ = 'stock_levels'
+
+    product_id = db.Column(db.String(10), db.ForeignKey('products.id'), primary_key=True)
+    location_id = db.Column(db.String(10), db.ForeignKey('locations.id'), primary_key=True, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StockLevel {self.product_id}@{self.location_id}: {self.quantity}>'
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'location_id': self.location_id,
+            'quantity': self.quantity,
+            'updated_at': self.updated_at.isoformat()
+        }
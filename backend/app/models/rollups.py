@@ -0,0 +1,103 @@
+from datetime import datetime
+from app.extensions import db
+
+class StockRollup(db.Model):
+    """Pre-aggregated stock figures per 'category' or 'supplier'.
+
+    A single ('all', '') row with zero figures marks the tables as built.
+    """
+    __tablename__ = 'stock_rollups'
+
+    dimension = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(100), primary_key=True)  # '' for the 'all' marker
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    total_units = db.Column(db.Integer, nullable=False, default=0)
+    stock_value = db.Column(db.Float, nullable=False, default=0.0)  # at purchase price
+    low_stock_count = db.Column(db.Integer, nullable=False, default=0)
+    out_of_stock_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StockRollup {self.dimension}:{self.key}>'
+
+    def to_dict(self):
+        return {
+            'name': self.key,
+            'products': self.product_count,
+            'units': self.total_units,
+            'stockValue': round(self.stock_value, 2),
+            'lowStock': self.low_stock_count,
+            'outOfStock': self.out_of_stock_count
+        }
+
+class DailySales(db.Model):
+    """Units sold and restocked per product per calendar day, maintained from transactions.
+
+    Once raw transactions are compacted away this is the only record of those days.
+    """
+    __tablename__ = 'daily_sales'
+
+    product_id = db.Column(db.String(10), primary_key=True)
+    sales_date = db.Column(db.Date, primary_key=True, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)  # units sold
+    restocked = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailySales {self.product_id} {self.sales_date}: {self.quantity}>'
+
+class LedgerCompaction(db.Model):
+    """One run of the ledger compaction job; raw sale/restock rows before compacted_before are gone."""
+    __tablename__ = 'ledger_compactions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    compacted_before = db.Column(db.Date, nullable=False)
+    transactions_removed = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CatalogVersion(db.Model):
+    """Single-row counter bumped by every transaction that changes products.
+
+    Processes holding an in-memory copy of the catalog compare it to know when theirs is stale.
+    """
+    __tablename__ = 'catalog_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductTrend(db.Model):
+    """Demand trend of one product: recent days against the baseline before them (see trend_service)."""
+    __tablename__ = 'product_trends'
+
+    product_id = db.Column(db.String(10), primary_key=True)
+    trend = db.Column(db.String(10), nullable=False, default='stable', index=True)  # 'up', 'down' or 'stable'
+    recent_mean = db.Column(db.Float, nullable=False, default=0.0)  # units per day
+    baseline_mean = db.Column(db.Float, nullable=False, default=0.0)
+    slope = db.Column(db.Float, nullable=False, default=0.0)  # change in units per day, per day
+    acceleration = db.Column(db.Float, nullable=False, default=0.0)
+    zscore = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f'<ProductTrend {self.product_id}: {self.trend}>'
+
+    def to_dict(self):
+        return {
+            'trend': self.trend,
+            'recent_mean': round(self.recent_mean, 2),
+            'baseline_mean': round(self.baseline_mean, 2),
+            'slope': round(self.slope, 3),
+            'acceleration': round(self.acceleration, 3),
+            'zscore': round(self.zscore, 2)
+        }
+
+class TrendRefresh(db.Model):
+    """Single row recording how far product_trends is up to date.
+
+    Trends are recomputed for everything when the day changes, and otherwise
+    only for products sold in transactions after last_transaction_id.
+    """
+    __tablename__ = 'trend_refresh'
+
+    id = db.Column(db.Integer, primary_key=True)
+    as_of = db.Column(db.Date, nullable=False)
+    last_transaction_id = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,101 @@
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from app.routes.auth import token_required
+from app.utils.query_counter import query_budget
+from app.services.alert_service import (
+    active_alerts, alerts_since, current_generation, get_cursor, latest_alert_id, save_cursor, wait_for_alerts
+)
+from main import db
+import json
+import time
+
+alerts_bp = Blueprint('alerts', __name__)
+
+def _event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+@alerts_bp.route('/', methods=['GET'])
+@query_budget(6)
+@token_required
+def get_alerts(current_user):
+    """Alerts after the caller's cursor; callers without one also get the current low-stock list."""
+    stored = get_cursor(current_user.id)
+    cursor = request.args.get('since', type=int)
+    if cursor is None:
+        cursor = stored
+
+    response = {}
+    if cursor is None:
+        # Read the cursor first so nothing committed in between is skipped
+        cursor = latest_alert_id()
+        response['active'] = active_alerts()
+        alerts = []
+    else:
+        alerts = alerts_since(cursor, current_app.config['ALERT_BATCH_LIMIT'])
+        if alerts:
+            cursor = alerts[-1]['id']
+    if cursor != stored:
+        save_cursor(current_user.id, cursor, new=stored is None)
+
+    response.update({'alerts': alerts, 'cursor': cursor})
+    return jsonify(response), 200
+
+@alerts_bp.route('/stream', methods=['GET'])
+@query_budget(6)
+@token_required
+def stream_alerts(current_user):
+    """Server-sent events carrying each alert once; reconnects resume from Last-Event-ID."""
+    user_id = current_user.id
+    heartbeat = current_app.config['ALERT_HEARTBEAT_SECONDS']
+    max_seconds = current_app.config['ALERT_STREAM_MAX_SECONDS']
+    limit = current_app.config['ALERT_BATCH_LIMIT']
+
+    cursor = request.headers.get('Last-Event-ID', type=int)
+    if cursor is None:
+        cursor = request.args.get('since', type=int)
+    if cursor is None:
+        cursor = get_cursor(user_id)
+    snapshot = None
+    if cursor is None:
+        cursor = latest_alert_id()
+        snapshot = active_alerts()
+        save_cursor(user_id, cursor)
+
+    def generate(cursor):
+        if snapshot is not None:
+            yield _event(snapshot, event='snapshot', event_id=cursor)
+
+        # Streams end after max_seconds; EventSource reconnects with Last-Event-ID
+        deadline = time.monotonic() + max_seconds
+        generation = current_generation()
+        while True:
+            alerts = alerts_since(cursor, limit)
+            for alert in alerts:
+                yield _event(alert, event='alert', event_id=alert['id'])
+            if alerts:
+                cursor = alerts[-1]['id']
+                save_cursor(user_id, cursor)
+
+            # Release the connection while idle
+            db.session.remove()
+            if len(alerts) == limit:
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            latest = wait_for_alerts(generation, min(heartbeat, remaining))
+            if latest == generation:
+                # Other workers' alerts are picked up on the heartbeat poll
+                yield ': keep-alive\n\n'
+            generation = latest
+
+    return Response(stream_with_context(generate(cursor)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
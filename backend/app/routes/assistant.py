@@ -15,7 +15,7 @@ def get_insights():
     product_id = data.get('product_id')  # Optional product ID for context
     
     try:
-        # Get insights from LLM service
+        # Get insights from LLM service; without a user to own them, questions here start no session
         insight = get_llm_insights(query, product_id)
         return jsonify({'insight': insight})
     except Exception as e:
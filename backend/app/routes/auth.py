@@ -1,16 +1,36 @@
 from flask import Blueprint, request, jsonify, current_app
 from app.models.user import User
 from app.extensions import db
+from app.utils.query_counter import query_budget
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
 
 auth_bp = Blueprint('auth', __name__)
 
+# A batch (routes/batch.py) authenticates once and hands its sub-requests the user in their environ
+BATCH_USER_ENVIRON_KEY = 'inventiq.batch_user'
+
+# Claim carried by the short-lived tokens that event streams pass in the query string
+STREAM_SCOPE = 'stream'
+
+def _auth_header():
+    """The token the request authenticates with, and the scope that token must carry."""
+    auth_header = request.headers.get('Authorization')
+    # EventSource cannot set headers, so event streams pass a stream token in the query string;
+    # the session token never appears in URLs or access logs
+    if not auth_header and 'text/event-stream' in request.headers.get('Accept', ''):
+        return request.args.get('token'), STREAM_SCOPE
+    return auth_header, None
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
+        batch_user = request.environ.get(BATCH_USER_ENVIRON_KEY)
+        if batch_user is not None:
+            return f(batch_user, *args, **kwargs)
+        
+        auth_header, scope = _auth_header()
         if not auth_header:
             return jsonify({'message': 'Token is missing!'}), 401
         
@@ -22,6 +42,8 @@ def token_required(f):
         
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            if data.get('scope') != scope:
+                raise Exception('Wrong token scope')
             current_user = User.query.get(data['user_id'])
             if not current_user:
                 raise Exception('User not found')
@@ -34,6 +56,12 @@ def token_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
+        batch_user = request.environ.get(BATCH_USER_ENVIRON_KEY)
+        if batch_user is not None:
+            if batch_user.role != 'admin':
+                return jsonify({'message': 'Admin privileges required!'}), 403
+            return f(batch_user, *args, **kwargs)
+        
         auth_header = request.headers.get('Authorization')
         if not auth_header:
             return jsonify({'message': 'Token is missing!'}), 401
@@ -46,6 +74,8 @@ def admin_required(f):
         
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            if data.get('scope') is not None:
+                raise Exception('Wrong token scope')
             current_user = User.query.get(data['user_id'])
             if not current_user:
                 raise Exception('User not found')
@@ -61,6 +91,7 @@ def admin_required(f):
     return decorated
 
 @auth_bp.route('/register', methods=['POST'])
+@query_budget(3)
 def register():
     data = request.get_json()
     
@@ -83,6 +114,7 @@ def register():
     return jsonify({'message': 'User registered successfully!'}), 201
 
 @auth_bp.route('/login', methods=['POST'])
+@query_budget(3)
 def login():
     data = request.get_json()
     
@@ -117,7 +149,22 @@ def login():
         }
     }), 200
 
+@auth_bp.route('/stream-token', methods=['POST'])
+@query_budget(1)
+@token_required
+def issue_stream_token(current_user):
+    """Short-lived token an EventSource can pass in the query string."""
+    expires_in = current_app.config['STREAM_TOKEN_SECONDS']
+    token = jwt.encode({
+        'user_id': current_user.id,
+        'scope': STREAM_SCOPE,
+        'exp': datetime.utcnow() + timedelta(seconds=expires_in)
+    }, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+    return jsonify({'token': token, 'expiresIn': expires_in}), 200
+
 @auth_bp.route('/status', methods=['GET'])
+@query_budget(1)
 @token_required
 def get_status(current_user):
     return jsonify({
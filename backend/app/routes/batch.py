@@ -0,0 +1,143 @@
+"""
+POST /api/batch: several API calls in one HTTP request.
+
+    {"requests": [{"method": "GET", "path": "/api/inventory/P0001"},
+                  {"method": "GET", "path": "/api/predictions/forecast/P0001?days=30"}],
+     "parallel": false}
+    -> {"responses": [{"status": 200, "body": {...}}, {"status": 200, "body": {...}}]}
+
+Each sub-request goes through its normal route, in order, in a request
+context nested in the batch's. They share the batch's authentication
+(token_required takes the user from the batch instead of decoding the token
+and loading the user again), its database session, which keeps everything
+they load for the rest of the batch (the product page's three calls load
+the product once), and its g, where request_memo keeps forecasts. Whatever
+a sub-request leaves uncommitted is rolled back before the next one, as the
+end of a request would. A failing sub-request gets its own status; the
+batch itself answers 200.
+
+With "parallel": true, a batch of only GETs runs on up to BATCH_WORKERS
+threads. Each thread has its own session, so only the user and the memo are
+shared. Batches that write always run in order.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import event
+from werkzeug.test import EnvironBuilder
+
+from app.routes.auth import BATCH_USER_ENVIRON_KEY, token_required
+from app.utils.instrumentation import SUBREQUEST_ENVIRON_KEY, metrics, timed
+from app.utils.query_counter import query_budget
+from app.utils.request_memo import request_memo, share_request_memo
+from main import db
+
+batch_bp = Blueprint('batch', __name__)
+
+PARALLEL_METHODS = ('GET', 'HEAD')
+
+def _environ(item):
+    """(method, WSGI environ) for one entry of the batch; raises ValueError when malformed."""
+    if not isinstance(item, dict):
+        raise ValueError('each request must be an object')
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path')
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise ValueError('each request needs a path starting with /')
+    if path.split('?')[0].rstrip('/') == request.path.rstrip('/'):
+        raise ValueError('batches cannot be nested')
+    headers = item.get('headers') or {}
+    if not isinstance(headers, dict):
+        raise ValueError('headers must be an object')
+
+    body = {'json': item['body']} if 'body' in item else {}
+    environ = EnvironBuilder(path=path, method=method, base_url=request.host_url,
+                             headers={str(k): str(v) for k, v in headers.items()}, **body).get_environ()
+    environ[SUBREQUEST_ENVIRON_KEY] = True
+    return method, environ
+
+def _dispatch(app, environ):
+    """Run one sub-request through the app; returns (status, body)."""
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception:
+            current_app.logger.exception(f"Batch sub-request {environ['REQUEST_METHOD']} "
+                                         f"{environ['PATH_INFO']} failed")
+            db.session.rollback()
+            return 500, {'message': 'Internal server error'}
+
+        try:
+            if response.mimetype == 'text/event-stream':
+                return 400, {'message': 'Event streams cannot be batched'}
+            body = response.get_json(silent=True)
+            return response.status_code, body if body is not None else response.get_data(as_text=True)
+        finally:
+            response.close()
+
+def _discard_uncommitted(session):
+    if session.new or session.dirty or session.deleted or not session.is_active:
+        session.rollback()
+
+def _run_sequential(app, environs, user):
+    # The identity map only holds weak references, so keep what the sub-requests load alive until the batch ends
+    session = db.session()
+    loaded = []
+
+    def keep(session, instance):
+        loaded.append(instance)
+
+    event.listen(session, 'loaded_as_persistent', keep)
+    try:
+        responses = []
+        for environ in environs:
+            environ[BATCH_USER_ENVIRON_KEY] = user
+            responses.append(_dispatch(app, environ))
+            _discard_uncommitted(session)
+        return responses
+    finally:
+        event.remove(session, 'loaded_as_persistent', keep)
+
+def _run_parallel(app, environs, user):
+    memo = request_memo()
+
+    def run(environ):
+        with app.app_context():
+            share_request_memo(memo)
+            # The thread's own session gets a copy of the user without querying for it
+            environ[BATCH_USER_ENVIRON_KEY] = db.session.merge(user, load=False)
+            return _dispatch(app, environ)
+
+    workers = min(len(environs), app.config.get('BATCH_WORKERS', 4))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch') as pool:
+        return list(pool.map(run, environs))
+
+@batch_bp.route('/batch', methods=['POST'])
+@query_budget(1)  # token_required's; each sub-request is held to its own route's budget
+@token_required
+def run_batch(current_user):
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'requests must be a non-empty list'}), 400
+    limit = current_app.config.get('BATCH_MAX_REQUESTS', 20)
+    if len(items) > limit:
+        return jsonify({'message': f'A batch can hold at most {limit} requests'}), 400
+    try:
+        subrequests = [_environ(item) for item in items]
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    app = current_app._get_current_object()
+    environs = [environ for _, environ in subrequests]
+    parallel = (bool(data.get('parallel')) and len(environs) > 1
+                and all(method in PARALLEL_METHODS for method, _ in subrequests))
+    with timed('subrequests'):
+        if parallel:
+            responses = _run_parallel(app, environs, current_user)
+        else:
+            responses = _run_sequential(app, environs, current_user)
+
+    metrics.inc('inventiq_batch_subrequests_total', len(environs),
+                labels={'mode': 'parallel' if parallel else 'sequential'})
+    return jsonify({'responses': [{'status': status, 'body': body} for status, body in responses]}), 200
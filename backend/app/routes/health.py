@@ -0,0 +1,90 @@
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import select, text
+from app.models.rollups import StockRollup
+from app.services.ollama_service import OllamaService
+from app.utils.query_counter import query_budget
+from main import db
+from datetime import datetime
+import threading
+import time
+
+health_bp = Blueprint('health', __name__)
+
+# probe name -> (expires_at, result), shared by all requests in the process
+_probe_cache = {}
+_probe_lock = threading.Lock()
+
+def _check_database():
+    db.session.execute(text('SELECT 1'))
+    return {'ok': True}
+
+def _check_rollups():
+    # Dashboard aggregates are built at startup; without them the dashboard rebuilds on first hit
+    built = db.session.execute(select(StockRollup.dimension).where(StockRollup.dimension == 'all')).first()
+    return {'ok': built is not None}
+
+def _check_ollama():
+    if not current_app.config.get('USE_OLLAMA', True):
+        return {'ok': True, 'detail': 'disabled'}
+
+    service = OllamaService(
+        base_url=current_app.config.get('OLLAMA_BASE_URL', 'http://localhost:11434'),
+        model=current_app.config.get('OLLAMA_MODEL', 'llama3')
+    )
+    if service.is_available(timeout=current_app.config['READINESS_OLLAMA_TIMEOUT']):
+        return {'ok': True}
+    return {'ok': False, 'detail': f"model {service.model} is not pulled"}
+
+# name -> (check, required); insights fall back to canned answers without Ollama
+PROBES = {
+    'database': (_check_database, True),
+    'rollups': (_check_rollups, True),
+    'ollama': (_check_ollama, False),
+}
+
+def _run_probe(name, check):
+    """Run a probe at most once per READINESS_CACHE_SECONDS."""
+    now = time.monotonic()
+    entry = _probe_cache.get(name)
+    if entry and entry[0] > now:
+        return entry[1]
+
+    with _probe_lock:
+        # Another request may have refreshed it while we waited
+        entry = _probe_cache.get(name)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        started = time.perf_counter()
+        try:
+            result = check()
+        except Exception as e:
+            result = {'ok': False, 'detail': str(e)}
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        result['checked_at'] = datetime.utcnow().isoformat()
+
+        _probe_cache[name] = (time.monotonic() + current_app.config['READINESS_CACHE_SECONDS'], result)
+        return result
+
+@health_bp.route('/health', methods=['GET'])
+@query_budget(0)
+def health():
+    """Liveness: the process is up and serving requests. Never touches the database."""
+    return jsonify({'status': 'ok'}), 200
+
+@health_bp.route('/ready', methods=['GET'])
+@query_budget(2)
+def ready():
+    """Readiness: required dependencies answer, with probe results cached between polls."""
+    checks = {name: _run_probe(name, check) for name, (check, _) in PROBES.items()}
+    failed = [name for name, (_, required) in PROBES.items() if required and not checks[name]['ok']]
+    degraded = [name for name, (_, required) in PROBES.items() if not required and not checks[name]['ok']]
+
+    if failed:
+        status = 'unavailable'
+    elif degraded:
+        status = 'degraded'
+    else:
+        status = 'ready'
+
+    return jsonify({'status': status, 'checks': checks}), 503 if failed else 200
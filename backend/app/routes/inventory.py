@@ -1,25 +1,133 @@
 from flask import Blueprint, request, jsonify
 from app.models.inventory import Product, Transaction
+from app.models.rollups import DailySales
+from app.models.locations import StockLevel
 from app.routes.auth import token_required
+from app.utils.idempotency import idempotent
+from app.utils.instrumentation import timed
+from app.utils.query_counter import query_budget
+from app.services import product_changes, sales_history
+from app.services.ml_service import add_to_sales_history
+from app.services.sales_history import write_behind_enabled
+from app.services.search_service import search_products
+from app.services.ledger_service import sales_between, transactions_between
+from app.services.location_service import (
+    StockError, is_location_managed, record_location_transaction
+)
 from main import db
+from sqlalchemy import case, delete, func, select, update
 import json
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 inventory_bp = Blueprint('inventory', __name__)
 
+# Fields that bulk updates may overwrite with a literal value, and the types they take
+BULK_SET_FIELDS = {
+    'category': str,
+    'supplier': str,
+    'reorder_level': int,
+    'lead_time': int,
+    'purchase_price': (int, float),
+    'selling_price': (int, float),
+}
+
+def _bulk_set_value(field, value):
+    """Validated literal for a bulk update; raises ValueError."""
+    if field not in BULK_SET_FIELDS:
+        raise ValueError(f'Field cannot be bulk updated: {field}')
+    if isinstance(value, bool) or not isinstance(value, BULK_SET_FIELDS[field]):
+        raise ValueError(f'Invalid value for {field}!')
+    if isinstance(value, str) and not value.strip():
+        raise ValueError(f'{field} cannot be empty!')
+    if not isinstance(value, str) and value < 0:
+        raise ValueError(f'{field} cannot be negative!')
+    return value
+
+def _bulk_filters(source):
+    """Build WHERE conditions from supplier/category/ids in a dict or query args."""
+    conditions = []
+    if source.get('supplier'):
+        conditions.append(Product.supplier == source['supplier'])
+    if source.get('category'):
+        conditions.append(Product.category == source['category'])
+    if source.get('ids'):
+        ids = source['ids']
+        if isinstance(ids, str):
+            ids = [product_id for product_id in ids.split(',') if product_id]
+        conditions.append(Product.id.in_(ids))
+    return conditions
+
+def _count_products(conditions):
+    return db.session.scalar(select(func.count()).select_from(Product).where(*conditions))
+
+def _delete_products(conditions):
+    """Delete matching products and their transactions with set-based statements."""
+    matching_ids = select(Product.id).where(*conditions)
+    
+    # Transactions reference products with a NOT NULL key, so they go first
+    db.session.execute(
+        delete(Transaction).where(Transaction.product_id.in_(matching_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(DailySales).where(DailySales.product_id.in_(matching_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(StockLevel).where(StockLevel.product_id.in_(matching_ids)),
+        execution_options={'synchronize_session': False}
+    )
+    result = db.session.execute(
+        delete(Product).where(*conditions),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
 @inventory_bp.route('/', methods=['GET'])
+@query_budget(2)
 @token_required
 def get_all_products(current_user):
     products = Product.query.all()
-    return jsonify([product.to_dict() for product in products]), 200
+    with timed('serialize'):
+        response = jsonify([product.to_dict() for product in products])
+    return response, 200
+
+@inventory_bp.route('/search', methods=['GET'])
+@query_budget(4)
+@token_required
+def search(current_user):
+    query = request.args.get('q', '').strip()
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=20, type=int)
+    if not query:
+        return jsonify({'message': 'q is required'}), 400
+    if page < 1 or not 1 <= per_page <= 100:
+        return jsonify({'message': 'page must be at least 1 and per_page between 1 and 100'}), 400
+
+    products, total, exact = search_products(query, page, per_page, request.args.get('category'),
+                                             request.args.get('supplier'))
+    with timed('serialize'):
+        response = jsonify({
+            'query': query,
+            'total': total,
+            'total_exact': exact,
+            'page': page,
+            'per_page': per_page,
+            'products': [product.to_dict() for product in products]
+        })
+    return response, 200
 
 @inventory_bp.route('/<product_id>', methods=['GET'])
+@query_budget(2)
 @token_required
 def get_product(current_user, product_id):
     product = Product.query.get_or_404(product_id)  
-    return jsonify(product.to_dict()), 200
+    with timed('serialize'):
+        response = jsonify(product.to_dict())
+    return response, 200
 
 @inventory_bp.route('/', methods=['POST'])
+@query_budget(10)
 @token_required
 def add_product(current_user):
     if current_user.role not in ['admin', 'manager']:
@@ -63,6 +171,7 @@ def add_product(current_user):
     }), 201
 
 @inventory_bp.route('/<product_id>', methods=['PUT'])
+@query_budget(11)
 @token_required
 def update_product(current_user, product_id):
     if current_user.role not in ['admin', 'manager']:
@@ -71,6 +180,10 @@ def update_product(current_user, product_id):
     product = Product.query.get_or_404(product_id)
     data = request.get_json()
     
+    # The total of a product stocked per location follows its locations
+    if 'current_stock' in data and is_location_managed(product_id):
+        return jsonify({'message': 'This product is stocked per location; set stock per location!'}), 400
+    
     # Update fields
     for field in data:
         if field == 'historical_sales':
@@ -86,6 +199,7 @@ def update_product(current_user, product_id):
     }), 200
 
 @inventory_bp.route('/<product_id>', methods=['DELETE'])
+@query_budget(11)
 @token_required
 def delete_product(current_user, product_id):
     if current_user.role != 'admin':
@@ -98,21 +212,113 @@ def delete_product(current_user, product_id):
     supplier_name = product.supplier
     
     if delete_supplier:
-        # Delete all products from this supplier
-        products_to_delete = Product.query.filter_by(supplier=supplier_name).all()
-        for p in products_to_delete:
-            db.session.delete(p)
-        
+        # Delete all products from this supplier in one statement
+        _delete_products([Product.supplier == supplier_name])
+        product_changes.record_bulk_change(db.session)
         db.session.commit()
         return jsonify({'message': f'Supplier {supplier_name} and all associated products deleted successfully!'}), 200
     else:
         # Delete just this product
-        db.session.delete(product)
+        product_changes.record_removal(db.session, product)
+        _delete_products([Product.id == product_id])
         db.session.commit()
         return jsonify({'message': 'Product deleted successfully!'}), 200
 
+@inventory_bp.route('/bulk', methods=['DELETE'])
+@query_budget(10)
+@token_required
+def bulk_delete_products(current_user):
+    if current_user.role != 'admin':
+        return jsonify({'message': 'Permission denied!'}), 403
+    
+    conditions = _bulk_filters(request.args)
+    if not conditions:
+        return jsonify({'message': 'Specify at least one of supplier, category or ids!'}), 400
+    
+    # Dry run only reports how many products would be deleted
+    if request.args.get('dry_run', 'false').lower() == 'true':
+        return jsonify({'dry_run': True, 'matched': _count_products(conditions)}), 200
+    
+    deleted = _delete_products(conditions)
+    product_changes.record_bulk_change(db.session)
+    db.session.commit()
+    
+    return jsonify({
+        'message': f'{deleted} products deleted successfully!',
+        'deleted': deleted
+    }), 200
+
+@inventory_bp.route('/bulk', methods=['PATCH'])
+@query_budget(7)
+@token_required
+def bulk_update_products(current_user):
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'message': 'Permission denied!'}), 403
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Request body must be a JSON object!'}), 400
+    for key in ('filter', 'set', 'adjust'):
+        if not isinstance(data.get(key, {}), dict):
+            return jsonify({'message': f'{key} must be an object!'}), 400
+    conditions = _bulk_filters(data.get('filter', {}))
+    if not conditions:
+        return jsonify({'message': 'Specify at least one of supplier, category or ids in filter!'}), 400
+    
+    values = {}
+    for field, value in data.get('set', {}).items():
+        try:
+            values[field] = _bulk_set_value(field, value)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+    
+    # Relative adjustments are computed by the database, row by row
+    adjust = data.get('adjust', {})
+    adjustments = {
+        'selling_price_pct': ('selling_price', lambda pct: func.round(Product.selling_price * (1 + pct / 100.0), 2)),
+        'purchase_price_pct': ('purchase_price', lambda pct: func.round(Product.purchase_price * (1 + pct / 100.0), 2)),
+        'reorder_level_pct': ('reorder_level', lambda pct: func.round(Product.reorder_level * (1 + pct / 100.0))),
+        'reorder_level_delta': ('reorder_level', lambda delta: Product.reorder_level + delta),
+    }
+    for key, amount in adjust.items():
+        if key not in adjustments:
+            return jsonify({'message': f'Unknown adjustment: {key}'}), 400
+        if not isinstance(amount, (int, float)) or isinstance(amount, bool):
+            return jsonify({'message': f'Adjustment {key} must be a number!'}), 400
+        
+        field, expression = adjustments[key]
+        if field in values:
+            return jsonify({'message': f'Field {field} is changed more than once!'}), 400
+        values[field] = expression(amount)
+    
+    if not values:
+        return jsonify({'message': 'Nothing to update! Provide set or adjust.'}), 400
+    
+    # Reorder levels never go below zero (literals were checked above)
+    if not isinstance(values.get('reorder_level', 0), (int, float)):
+        reorder_level = values['reorder_level']
+        values['reorder_level'] = case((reorder_level < 0, 0), else_=reorder_level)
+    
+    if data.get('dry_run', False):
+        return jsonify({'dry_run': True, 'matched': _count_products(conditions)}), 200
+    
+    values['updated_at'] = datetime.utcnow()
+    result = db.session.execute(
+        update(Product).where(*conditions).values(values),
+        execution_options={'synchronize_session': False}
+    )
+    product_changes.record_bulk_change(db.session)
+    db.session.commit()
+    
+    return jsonify({
+        'message': f'{result.rowcount} products updated successfully!',
+        'updated': result.rowcount
+    }), 200
+
 @inventory_bp.route('/transaction', methods=['POST'])
+@query_budget(15)  # 12, plus claiming the Idempotency-Key, storing the response and pruning old keys
 @token_required
+@idempotent
 def record_transaction(current_user):
     data = request.get_json()
     
@@ -124,6 +330,11 @@ def record_transaction(current_user):
     
     product = Product.query.get_or_404(data['product_id'])
     
+    if data.get('location_id'):
+        return _record_location_transaction(product, data)
+    if data['transaction_type'] in ('sale', 'restock') and is_location_managed(product.id):
+        return jsonify({'message': 'This product is stocked per location; location_id is required!'}), 400
+    
     # Create transaction record
     transaction = Transaction(
         product_id=data['product_id'],
@@ -137,22 +348,21 @@ def record_transaction(current_user):
             return jsonify({'message': 'Insufficient stock!'}), 400
         product.current_stock -= data['quantity']
         
-        # Update historical sales
-        historical_sales = json.loads(product.historical_sales)
-        today = datetime.utcnow().strftime('Day-%j')  # Day of year
-        
-        if today in historical_sales:
-            historical_sales[today] += data['quantity']
+        # Update historical sales, or leave it to the batched write-behind
+        if write_behind_enabled():
+            transaction.history_pending = True
         else:
-            historical_sales[today] = data['quantity']
-            
-        product.historical_sales = json.dumps(historical_sales)
+            with timed('serialize'):
+                product.historical_sales = add_to_sales_history(product.historical_sales, data['quantity'],
+                                                                datetime.utcnow())
         
     elif data['transaction_type'] == 'restock':
         product.current_stock += data['quantity']
     
     db.session.add(transaction)
     db.session.commit()
+    if transaction.history_pending:
+        sales_history.buffer.add(transaction.id)
     
     return jsonify({
         'message': 'Transaction recorded successfully!',
@@ -164,4 +374,74 @@ def record_transaction(current_user):
             'transaction_date': transaction.transaction_date.isoformat()
         },
         'updated_stock': product.current_stock
-    }), 201
\ No newline at end of file
+    }), 201
+
+def _record_location_transaction(product, data):
+    """Sale or restock at one location: only that location's stock row is checked and updated."""
+    product_id = product.id
+    try:
+        transaction, remaining, total = record_location_transaction(
+            product_id, data['location_id'], data['transaction_type'], data['quantity'])
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({
+        'message': 'Transaction recorded successfully!',
+        'transaction': transaction,
+        'location_stock': remaining,
+        'updated_stock': total
+    }), 201
+
+def _date_range():
+    """(start, end) from the start/end query args, defaulting to the last 30 days."""
+    end = request.args.get('end')
+    end = date.fromisoformat(end) if end else datetime.utcnow().date()
+    start = request.args.get('start')
+    start = date.fromisoformat(start) if start else end - timedelta(days=29)
+    if start > end:
+        raise ValueError('start must not be after end')
+    return start, end
+
+@inventory_bp.route('/sales', methods=['GET'])
+@query_budget(2)
+@token_required
+def get_sales(current_user):
+    try:
+        start, end = _date_range()
+        series = sales_between(start, end, request.args.get('product_id'),
+                               request.args.get('granularity', 'day'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'granularity': request.args.get('granularity', 'day'),
+        'total_sold': sum(point['sold'] for point in series),
+        'series': series
+    }), 200
+
+@inventory_bp.route('/transactions', methods=['GET'])
+@query_budget(2)
+@token_required
+def get_transactions(current_user):
+    try:
+        start, end = _date_range()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    limit = request.args.get('limit', default=100, type=int)
+    offset = request.args.get('offset', default=0, type=int)
+    # SQLite reads a negative LIMIT as no limit at all
+    if not 1 <= limit <= 1000:
+        return jsonify({'message': 'limit must be between 1 and 1000'}), 400
+    if offset < 0:
+        return jsonify({'message': 'offset must not be negative'}), 400
+    transactions = transactions_between(start, end, request.args.get('product_id'), limit, offset)
+    
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'transactions': transactions
+    }), 200
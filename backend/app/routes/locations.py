@@ -0,0 +1,120 @@
+from flask import Blueprint, request, jsonify
+from app.models.inventory import Product
+from app.models.locations import Location, StockLevel
+from app.routes.auth import token_required
+from app.utils.idempotency import idempotent
+from app.utils.query_counter import query_budget
+from app.services.location_service import (
+    StockError, adopt_unlocated_stock, location_summaries, set_stock_level, stock_by_location, transfer_stock
+)
+from main import db
+
+locations_bp = Blueprint('locations', __name__)
+
+def _quantity(data, allow_zero=False):
+    """Validated integer quantity from a request body."""
+    quantity = data.get('quantity')
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < (0 if allow_zero else 1):
+        raise StockError('quantity must be a positive integer' if not allow_zero
+                         else 'quantity must be a non-negative integer')
+    return quantity
+
+@locations_bp.route('/', methods=['GET'])
+@query_budget(2)
+@token_required
+def get_locations(current_user):
+    return jsonify(location_summaries()), 200
+
+@locations_bp.route('/', methods=['POST'])
+@query_budget(4)
+@token_required
+def add_location(current_user):
+    """Create a location; adopt_stock moves all stock not yet held per location into it."""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'message': 'Permission denied!'}), 403
+
+    data = request.get_json()
+    for field in ['id', 'name']:
+        if field not in data:
+            return jsonify({'message': f'Missing required field: {field}'}), 400
+    if db.session.get(Location, data['id']):
+        return jsonify({'message': f"Location {data['id']} already exists!"}), 409
+
+    location = Location(id=data['id'], name=data['name'])
+    db.session.add(location)
+    db.session.flush()
+    adopted = adopt_unlocated_stock(location.id) if data.get('adopt_stock') else 0
+    response = location.to_dict()
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Location added successfully!',
+        'location': response,
+        'adopted_products': adopted
+    }), 201
+
+@locations_bp.route('/<location_id>/stock', methods=['GET'])
+@query_budget(3)
+@token_required
+def get_location_stock(current_user, location_id):
+    Location.query.get_or_404(location_id)
+    levels = StockLevel.query.filter_by(location_id=location_id).order_by(StockLevel.product_id).all()
+    return jsonify([level.to_dict() for level in levels]), 200
+
+@locations_bp.route('/<location_id>/stock/<product_id>', methods=['PUT'])
+@query_budget(12)
+@token_required
+def put_stock_level(current_user, location_id, product_id):
+    """Set the count of a product at a location, e.g. after a stock take."""
+    if current_user.role not in ['admin', 'manager']:
+        return jsonify({'message': 'Permission denied!'}), 403
+
+    Product.query.get_or_404(product_id)
+    try:
+        quantity = _quantity(request.get_json(), allow_zero=True)
+        total = set_stock_level(product_id, location_id, quantity)
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({
+        'product_id': product_id,
+        'location_id': location_id,
+        'quantity': quantity,
+        'total_stock': total
+    }), 200
+
+@locations_bp.route('/products/<product_id>', methods=['GET'])
+@query_budget(3)
+@token_required
+def get_product_locations(current_user, product_id):
+    product = Product.query.get_or_404(product_id)
+    return jsonify({
+        'product_id': product_id,
+        'total_stock': product.current_stock,
+        'locations': stock_by_location(product_id)
+    }), 200
+
+@locations_bp.route('/transfer', methods=['POST'])
+@query_budget(10)  # 7, plus claiming the Idempotency-Key, storing the response and pruning old keys
+@token_required
+@idempotent
+def transfer(current_user):
+    data = request.get_json()
+    for field in ['product_id', 'from_location', 'to_location', 'quantity']:
+        if field not in data:
+            return jsonify({'message': f'Missing required field: {field}'}), 400
+
+    try:
+        levels = transfer_stock(data['product_id'], data['from_location'], data['to_location'],
+                                _quantity(data))
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({
+        'message': 'Transfer recorded successfully!',
+        'product_id': data['product_id'],
+        'quantity': data['quantity'],
+        'levels': levels
+    }), 201
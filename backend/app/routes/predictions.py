@@ -1,12 +1,30 @@
 from flask import Blueprint, request, jsonify
 from app.models.inventory import Product
 from app.routes.auth import token_required
+from app.utils.query_counter import query_budget
 from app.services.ml_service import forecast_demand, recommend_restock
+from app.services.assistant_sessions import open_session
 from app.services.llm_service import get_llm_insights
+from app.services.rollup_service import get_dashboard_summary, get_trend_summary
+from app.services.location_service import recommend_location_restock
+from app.services.restock_optimizer import DEFAULTS, optimize_catalog
+from app.services.simulation_service import simulate_catalog
+from app.services.similarity_service import similar_products
+from app.services.trend_service import product_trend
 
 predictions_bp = Blueprint('predictions', __name__)
 
+def _trending(trend):
+    """?trending=true/false overrides the detected trend; without it the detected trend decides."""
+    override = request.args.get('trending', '').strip().lower()
+    if override in ('true', '1', 'yes'):
+        return True
+    if override in ('false', '0', 'no'):
+        return False
+    return trend['trend'] == 'up'
+
 @predictions_bp.route('/forecast/<product_id>', methods=['GET'])
+@query_budget(4)  # a product without sales borrows from similar ones, checking the catalog snapshot
 @token_required
 def get_demand_forecast(current_user, product_id):
     product = Product.query.get_or_404(product_id)
@@ -23,12 +41,14 @@ def get_demand_forecast(current_user, product_id):
     }), 200
 
 @predictions_bp.route('/restock/<product_id>', methods=['GET'])
+@query_budget(2)
 @token_required
 def get_restock_recommendation(current_user, product_id):
     product = Product.query.get_or_404(product_id)
     
-    # Check if product is trending for buffer calculation
-    is_trending = request.args.get('trending', default=False, type=bool)
+    # Trending products get a buffer on top of the order
+    trend = product_trend(product)
+    is_trending = _trending(trend)
     
     recommendation = recommend_restock(product, is_trending)
     
@@ -37,10 +57,88 @@ def get_restock_recommendation(current_user, product_id):
         'current_stock': product.current_stock,
         'reorder_level': product.reorder_level,
         'lead_time': product.lead_time,
+        'trend': trend,
+        'is_trending': is_trending,
         'recommendation': recommendation
     }), 200
 
+@predictions_bp.route('/restock/<product_id>/locations', methods=['GET'])
+@query_budget(4)
+@token_required
+def get_location_restock(current_user, product_id):
+    """Restock split across locations: transfers from surplus locations first, then orders."""
+    product = Product.query.get_or_404(product_id)
+    trend = product_trend(product)
+    is_trending = _trending(trend)
+    
+    return jsonify({
+        'product_id': product_id,
+        'current_stock': product.current_stock,
+        'trend': trend,
+        'is_trending': is_trending,
+        'recommendation': recommend_restock(product, is_trending),
+        'locations': recommend_location_restock(product, is_trending)
+    }), 200
+
+@predictions_bp.route('/similar/<product_id>', methods=['GET'])
+@query_budget(5)
+@token_required
+def get_similar_products(current_user, product_id):
+    """Products that sell, cost and are categorised most like this one; ?mode=approximate uses the LSH index."""
+    k = request.args.get('k', default=10, type=int)
+    mode = request.args.get('mode', default='exact')
+    if mode not in ('exact', 'approximate') or not 1 <= k <= 100:
+        return jsonify({'message': 'mode must be exact or approximate and k between 1 and 100'}), 400
+    
+    neighbours = similar_products(product_id, k, approximate=mode == 'approximate')
+    if neighbours is None:
+        return jsonify({'message': 'Product not found!'}), 404
+    
+    return jsonify({
+        'product_id': product_id,
+        'mode': mode,
+        'similar_products': neighbours
+    }), 200
+
+@predictions_bp.route('/optimize', methods=['GET'])
+@query_budget(6)
+@token_required
+def get_restock_plan(current_user):
+    """Reorder points, EOQ and supplier orders for the whole catalog; parameters allow what-if runs."""
+    params = {name: request.args.get(name) for name in DEFAULTS}
+    try:
+        plan = optimize_catalog(params, supplier=request.args.get('supplier'),
+                                items_per_supplier=request.args.get('items', default=50, type=int))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify(plan), 200
+
+@predictions_bp.route('/simulate', methods=['POST'])
+@query_budget(6)
+@token_required
+def simulate_restock_policy(current_user):
+    """Monte Carlo stockout risk of the reorder policy, for the catalog or the listed products."""
+    data = request.get_json() or {}
+    try:
+        result = simulate_catalog(
+            {name: data.get(name) for name in DEFAULTS},
+            product_ids=data.get('product_ids'),
+            reorder_point=data.get('reorder_point'),
+            order_quantity=data.get('order_quantity'),
+            paths=data.get('paths', 1000),
+            horizon_days=data.get('horizon_days', 30),
+            distribution=data.get('distribution', 'empirical'),
+            seed=data.get('seed'),
+            items=data.get('items', 50)
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify(result), 200
+
 @predictions_bp.route('/insights', methods=['POST'])
+@query_budget(20)
 @token_required
 def get_insights(current_user):
     data = request.get_json()
@@ -51,9 +149,25 @@ def get_insights(current_user):
     query = data['query']
     product_id = data.get('product_id', None)
     
-    insights = get_llm_insights(query, product_id)
+    # session_id continues a conversation; an unknown or expired one starts a new session
+    session = open_session(data.get('session_id'), current_user.id)
+    session_id = session.id  # read before the commits below expire it
+    insights = get_llm_insights(query, product_id, session)
     
     return jsonify({
         'query': query,
-        'insights': insights
-    }), 200
\ No newline at end of file
+        'insights': insights,
+        'session_id': session_id
+    }), 200
+
+@predictions_bp.route('/dashboard', methods=['GET'])
+@query_budget(5)
+@token_required
+def get_dashboard(current_user):
+    return jsonify(get_dashboard_summary()), 200
+
+@predictions_bp.route('/trends', methods=['GET'])
+@query_budget(16)
+@token_required
+def get_trends(current_user):
+    return jsonify(get_trend_summary()), 200
@@ -0,0 +1,107 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import func, insert, select, update
+
+from app.extensions import db
+from app.models.alerts import AlertCursor, StockAlert
+from app.models.inventory import Product
+from app.services import product_changes
+
+# Bumped after every commit that raised alerts; streams wait on it between polls
+_alerts_raised = threading.Condition()
+_generation = 0
+
+def _stock_status(state):
+    if state is None:
+        return None
+    if state['current_stock'] == 0:
+        return 'out_of_stock'
+    if state['current_stock'] <= state['reorder_level']:
+        return 'low_stock'
+    return 'ok'
+
+def _crossings(changes):
+    """(state, alert_type) for every product whose stock status changed."""
+    crossings = []
+    for change in changes.products:
+        old, new = _stock_status(change.old), _stock_status(change.new)
+        if new is None or old == new:
+            continue
+        if new != 'ok':
+            crossings.append((change.new, new))
+        elif old is not None:
+            crossings.append((change.new, 'restocked'))
+    return crossings
+
+@product_changes.on_flush
+def record_alerts(session, changes):
+    """Store an alert for each reorder-level crossing in the writing transaction."""
+    # Set-based bulk edits do not say which products they touched, so they raise no alerts
+    crossings = _crossings(changes)
+    if not crossings:
+        return
+
+    session.execute(insert(StockAlert), [{
+        'product_id': state['id'],
+        'product_name': state['name'],
+        'alert_type': alert_type,
+        'current_stock': state['current_stock'],
+        'reorder_level': state['reorder_level'],
+    } for state, alert_type in crossings])
+
+@product_changes.on_commit
+def notify_streams(changes):
+    global _generation
+    if _crossings(changes):
+        with _alerts_raised:
+            _generation += 1
+            _alerts_raised.notify_all()
+
+def current_generation():
+    return _generation
+
+def wait_for_alerts(generation, timeout):
+    """Block until alerts are committed after `generation` or the timeout passes."""
+    with _alerts_raised:
+        _alerts_raised.wait_for(lambda: _generation != generation, timeout)
+        return _generation
+
+def alerts_since(cursor, limit=100):
+    alerts = StockAlert.query.filter(StockAlert.id > cursor).order_by(StockAlert.id).limit(limit).all()
+    return [alert.to_dict() for alert in alerts]
+
+def latest_alert_id():
+    return db.session.execute(select(func.coalesce(func.max(StockAlert.id), 0))).scalar()
+
+def active_alerts():
+    """Products currently at or below their reorder level, for clients without a cursor."""
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.current_stock, Product.reorder_level)
+        .where(Product.current_stock <= Product.reorder_level)
+        .order_by(Product.current_stock, Product.id)
+    ).all()
+    return [{
+        'product_id': row.id,
+        'product_name': row.name,
+        'alert_type': 'out_of_stock' if row.current_stock == 0 else 'low_stock',
+        'current_stock': row.current_stock,
+        'reorder_level': row.reorder_level
+    } for row in rows]
+
+def get_cursor(user_id):
+    cursor = db.session.get(AlertCursor, user_id)
+    return cursor.last_alert_id if cursor else None
+
+def save_cursor(user_id, alert_id, new=False):
+    """Remember the last alert delivered to a user and commit."""
+    if not new:
+        result = db.session.execute(
+            update(AlertCursor).where(AlertCursor.user_id == user_id)
+            .values(last_alert_id=alert_id, updated_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        )
+        new = result.rowcount == 0
+    if new:
+        db.session.execute(insert(AlertCursor).values(user_id=user_id, last_alert_id=alert_id))
+    db.session.commit()
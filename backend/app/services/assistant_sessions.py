@@ -0,0 +1,81 @@
+"""
+Assistant conversations that reuse the LLM's prompt cache.
+
+A session holds the chat messages of one conversation. The first message,
+the system prompt with the inventory summary, is frozen when the session is
+primed, and every turn is appended after it. Ollama keeps the evaluated
+prompt of the last request and only processes tokens past the longest common
+prefix, so a follow-up question costs its own tokens plus the answer instead
+of the whole summary again.
+
+Storage is bounded three ways: a session keeps its last
+ASSISTANT_SESSION_MAX_TURNS exchanges, each user keeps at most
+ASSISTANT_SESSIONS_PER_USER sessions, and sessions idle for
+ASSISTANT_SESSION_TTL_SECONDS expire. Sessions live in the database so any
+worker can continue one; the model's cache is shared by all of them anyway.
+"""
+import json
+import secrets
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from app.extensions import db
+from app.models.assistant import AssistantSession
+
+def _ttl():
+    return timedelta(seconds=current_app.config.get('ASSISTANT_SESSION_TTL_SECONDS', 1800))
+
+def _prune(user_id):
+    """Drop expired sessions, then this user's oldest beyond the per-user limit."""
+    db.session.execute(delete(AssistantSession).where(AssistantSession.updated_at < datetime.utcnow() - _ttl()))
+    keep = current_app.config.get('ASSISTANT_SESSIONS_PER_USER', 20) - 1  # leaving room for the new one
+    owner = (AssistantSession.user_id == user_id if user_id is not None
+             else AssistantSession.user_id.is_(None))
+    newest = select(AssistantSession.id).where(owner).order_by(AssistantSession.updated_at.desc()).limit(keep)
+    db.session.execute(delete(AssistantSession).where(owner, AssistantSession.id.not_in(newest)))
+
+def open_session(session_id, user_id=None):
+    """The user's live session with this id, or a new one (added to the db session, not yet committed)."""
+    if session_id:
+        session = db.session.get(AssistantSession, session_id)
+        if (session is not None and session.user_id == user_id
+                and session.updated_at >= datetime.utcnow() - _ttl()):
+            return session
+    _prune(user_id)
+    session = AssistantSession(id=secrets.token_hex(16), user_id=user_id, messages='[]')
+    db.session.add(session)
+    return session
+
+def session_messages(session):
+    return json.loads(session.messages or '[]')
+
+def needs_priming(session):
+    """True when the session has no system prompt yet or its inventory summary is too old."""
+    if session.system_prompt is None or session.primed_at is None:
+        return True
+    max_age = current_app.config.get('ASSISTANT_SUMMARY_MAX_AGE_SECONDS', 300)
+    return datetime.utcnow() - session.primed_at > timedelta(seconds=max_age)
+
+def prime(session, system_prompt):
+    """Freeze a new system prompt; the next request re-evaluates the whole conversation once."""
+    session.system_prompt = system_prompt
+    session.primed_at = datetime.utcnow()
+
+def chat_messages(session, user_content):
+    """System prompt, stored turns and the new question, as sent to the chat API."""
+    return ([{'role': 'system', 'content': session.system_prompt}] + session_messages(session)
+            + [{'role': 'user', 'content': user_content}])
+
+def record_turn(session, question, answer):
+    """Append one exchange and commit, trimming to the newest half once ASSISTANT_SESSION_MAX_TURNS is passed."""
+    max_turns = current_app.config.get('ASSISTANT_SESSION_MAX_TURNS', 10)
+    messages = session_messages(session) + [{'role': 'user', 'content': question},
+                                            {'role': 'assistant', 'content': answer}]
+    if len(messages) > 2 * max_turns:
+        # Dropping turns changes the cached prefix; dropping half at once means it happens rarely
+        messages = messages[-2 * max(max_turns // 2, 1):]
+    session.messages = json.dumps(messages)
+    session.updated_at = datetime.utcnow()
+    db.session.commit()
@@ -0,0 +1,285 @@
+"""
+Read-only columnar copy of the product catalog for analytics.
+
+Numeric fields are NumPy arrays and category/supplier are dictionary encoded
+(small int codes into a tuple of names), so a 100k product catalog costs a few
+MB instead of a few hundred MB of ORM objects and DataFrames per request.
+
+Snapshots are immutable: writes committed in this process produce a new
+snapshot from the previous one, and readers keep using whichever one they
+already hold. Products added, deleted or edited by other processes are
+noticed through the catalog version (see product_changes) and trigger a full
+reload. Their stock changes, which leave the version alone, are read back
+incrementally: the products updated since the snapshot's synced_at (less
+CATALOG_SNAPSHOT_LAG_SECONDS for transactions that committed late).
+"""
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app.extensions import db
+from app.models.inventory import Product
+from app.services import product_changes
+
+NUMERIC_COLUMNS = {
+    'current_stock': 'int64',
+    'reorder_level': 'int64',
+    'purchase_price': 'float64',
+    'selling_price': 'float64',
+    'lead_time': 'int32',
+}
+
+# How many low-stock items go into LLM context; the count is always exact
+LOW_STOCK_CONTEXT_ITEMS = 25
+
+class CatalogSnapshot:
+    """One consistent version of the catalog as parallel read-only arrays."""
+
+    def __init__(self, version, engine, ids, names, categories, category_codes, suppliers, supplier_codes, columns,
+                 synced_at=None):
+        self.version = version
+        # Latest products.updated_at this snapshot has read
+        self.synced_at = synced_at
+        self.engine = engine
+        self.ids = ids
+        self.names = names
+        self.categories = tuple(categories)
+        self.category_codes = category_codes
+        self.suppliers = tuple(suppliers)
+        self.supplier_codes = supplier_codes
+        for name in NUMERIC_COLUMNS:
+            setattr(self, name, columns[name])
+        self.index = {product_id: row for row, product_id in enumerate(ids)}
+
+        for array in (ids, names, category_codes, supplier_codes, *columns.values()):
+            array.flags.writeable = False
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    def columns(self):
+        return {name: getattr(self, name) for name in NUMERIC_COLUMNS}
+
+    def row_state(self, row):
+        """The product at row as a dict of the fields snapshots keep."""
+        state = {'id': self.ids[row], 'name': self.names[row],
+                 'category': self.categories[self.category_codes[row]],
+                 'supplier': self.suppliers[self.supplier_codes[row]]}
+        state.update((name, getattr(self, name)[row].item()) for name in NUMERIC_COLUMNS)
+        return state
+
+    @classmethod
+    def load(cls, session, version=None, chunk_size=10000):
+        """Read the catalog in chunks straight into preallocated arrays."""
+        import numpy as np
+
+        # Version first: a write landing mid-load only makes the next check reload again
+        if version is None:
+            version = product_changes.catalog_version(session)
+        count, synced_at = session.execute(select(func.count(Product.id), func.max(Product.updated_at))).one()
+
+        ids = np.empty(count, dtype=object)
+        names = np.empty(count, dtype=object)
+        category_codes = np.empty(count, dtype=np.int32)
+        supplier_codes = np.empty(count, dtype=np.int32)
+        columns = {name: np.empty(count, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        categories, suppliers = {}, {}
+
+        query = select(Product.id, Product.name, Product.category, Product.supplier,
+                       *(getattr(Product, name) for name in NUMERIC_COLUMNS)).order_by(Product.id)
+        row = 0
+        for chunk in session.execute(query.execution_options(yield_per=chunk_size)).partitions():
+            # Products added after the count was taken wait for the next reload
+            chunk = chunk[:count - row]
+            if not chunk:
+                break
+            end = row + len(chunk)
+            ids[row:end] = [r[0] for r in chunk]
+            names[row:end] = [r[1] for r in chunk]
+            category_codes[row:end] = [categories.setdefault(r[2], len(categories)) for r in chunk]
+            supplier_codes[row:end] = [suppliers.setdefault(r[3], len(suppliers)) for r in chunk]
+            for offset, name in enumerate(NUMERIC_COLUMNS, start=4):
+                columns[name][row:end] = [r[offset] for r in chunk]
+            row = end
+
+        arrays = [ids, names, category_codes, supplier_codes]
+        if row < count:
+            # Products deleted while loading
+            arrays = [array[:row] for array in arrays]
+            columns = {name: array[:row] for name, array in columns.items()}
+        return cls(version, session.get_bind(), *arrays[:2], categories, arrays[2], suppliers, arrays[3], columns,
+                   synced_at)
+
+    def catch_up(self, session, lag):
+        """Snapshot with the products updated since synced_at read back, or this one if none differ.
+
+        Only rows updated within lag of synced_at or later are read, so
+        this costs the number of recently sold products, not the catalog.
+        """
+        query = select(Product.id, Product.name, Product.category, Product.supplier,
+                       *(getattr(Product, name) for name in NUMERIC_COLUMNS), Product.updated_at)
+        if self.synced_at is not None:
+            query = query.where(Product.updated_at >= self.synced_at - lag)
+
+        changes, synced_at = [], self.synced_at
+        fields = ('id', 'name', 'category', 'supplier', *NUMERIC_COLUMNS)
+        for row in session.execute(query):
+            if row.updated_at is not None and (synced_at is None or row.updated_at > synced_at):
+                synced_at = row.updated_at
+            state = dict(zip(fields, row))
+            position = self.index.get(row.id)
+            if position is None or self.row_state(position) != state:
+                changes.append(product_changes.ProductChange(row.id, None, state))
+
+        if not changes:
+            # Not part of the data, so moving it forward leaves the snapshot as it was for readers
+            self.synced_at = synced_at
+            return self
+        return self.apply(changes, self.version, synced_at)
+
+    def apply(self, product_changes_list, version, synced_at=None):
+        """New snapshot with the given ProductChanges applied; this one is left untouched."""
+        import numpy as np
+
+        categories = {name: code for code, name in enumerate(self.categories)}
+        suppliers = {name: code for code, name in enumerate(self.suppliers)}
+
+        # Last change per product wins
+        latest = {}
+        for change in product_changes_list:
+            latest[change.product_id] = change.new
+
+        keep = np.ones(self.size, dtype=bool)
+        ids, names = self.ids.copy(), self.names.copy()
+        category_codes, supplier_codes = self.category_codes.copy(), self.supplier_codes.copy()
+        columns = {name: array.copy() for name, array in self.columns().items()}
+        added = []
+
+        for product_id, state in latest.items():
+            row = self.index.get(product_id)
+            if state is None:
+                if row is not None:
+                    keep[row] = False
+            elif row is None:
+                added.append(state)
+            else:
+                names[row] = state['name']
+                category_codes[row] = categories.setdefault(state['category'], len(categories))
+                supplier_codes[row] = suppliers.setdefault(state['supplier'], len(suppliers))
+                for name in NUMERIC_COLUMNS:
+                    columns[name][row] = state[name]
+
+        if not keep.all():
+            ids, names, category_codes, supplier_codes = (
+                ids[keep], names[keep], category_codes[keep], supplier_codes[keep])
+            columns = {name: array[keep] for name, array in columns.items()}
+        if added:
+            ids = np.concatenate([ids, np.array([s['id'] for s in added], dtype=object)])
+            names = np.concatenate([names, np.array([s['name'] for s in added], dtype=object)])
+            category_codes = np.concatenate([category_codes, np.array(
+                [categories.setdefault(s['category'], len(categories)) for s in added], dtype=np.int32)])
+            supplier_codes = np.concatenate([supplier_codes, np.array(
+                [suppliers.setdefault(s['supplier'], len(suppliers)) for s in added], dtype=np.int32)])
+            columns = {name: np.concatenate([array, np.array([s[name] for s in added], dtype=array.dtype)])
+                       for name, array in columns.items()}
+
+        return CatalogSnapshot(version, self.engine, ids, names, categories, category_codes,
+                               suppliers, supplier_codes, columns, synced_at or self.synced_at)
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+def get_catalog_snapshot():
+    """Current snapshot, reloading or catching it up if another process changed the catalog."""
+    global _snapshot, _checked_at
+
+    snapshot = _snapshot
+    interval = current_app.config.get('CATALOG_SNAPSHOT_CHECK_SECONDS', 1)
+    if snapshot is not None and snapshot.engine is db.engine and time.monotonic() - _checked_at < interval:
+        return snapshot
+
+    with _lock:
+        version = product_changes.catalog_version(db.session)
+        if _snapshot is None or _snapshot.engine is not db.engine or _snapshot.version != version:
+            _snapshot = CatalogSnapshot.load(db.session, version)
+        else:
+            lag = timedelta(seconds=current_app.config.get('CATALOG_SNAPSHOT_LAG_SECONDS', 5))
+            _snapshot = _snapshot.catch_up(db.session, lag)
+        _checked_at = time.monotonic()
+        return _snapshot
+
+@product_changes.on_commit
+def apply_committed_changes(changes):
+    """Roll this process's own writes into the snapshot without reloading."""
+    global _snapshot
+
+    if not changes.products:
+        return
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is None:
+            return
+        if changes.version is None:
+            # Stock changes only; catch_up corrects the rare pair of writes applied out of order
+            _snapshot = snapshot.apply(changes.products, snapshot.version)
+            return
+        if snapshot.version >= changes.version:
+            # Nothing loaded yet, or a reload already picked this write up
+            return
+        if changes.bulk or snapshot.version != changes.base_version:
+            # Missed someone else's write, or cannot tell which products changed
+            _snapshot = None
+        else:
+            _snapshot = snapshot.apply(changes.products, changes.version)
+
+def low_stock_rows(snapshot, category=None):
+    """Rows at or below their reorder level, most critical (lowest stock relative to it) first."""
+    import numpy as np
+
+    stock, reorder = snapshot.current_stock, snapshot.reorder_level
+    low = stock <= reorder
+    if category is not None:
+        low &= snapshot.category_codes == (snapshot.categories.index(category)
+                                           if category in snapshot.categories else -1)
+    low = np.flatnonzero(low)
+    return low[np.argsort(stock[low] / np.maximum(reorder[low], 1), kind='stable')]
+
+def inventory_summary():
+    """Catalog figures for LLM context, computed over the snapshot."""
+    import numpy as np
+    from app.services.trend_service import refresh_trends, trending_products
+
+    refresh_trends()
+    snapshot = get_catalog_snapshot()
+    stock, reorder = snapshot.current_stock, snapshot.reorder_level
+    low = low_stock_rows(snapshot)
+
+    counts = np.bincount(snapshot.category_codes, minlength=len(snapshot.categories))
+    categories = sorted(((snapshot.categories[code], int(n)) for code, n in enumerate(counts) if n),
+                        key=lambda item: -item[1])
+
+    return {
+        'total_products': snapshot.size,
+        'categories': dict(categories),
+        'low_stock_count': len(low),
+        'out_of_stock_count': int(np.count_nonzero(stock == 0)),
+        'low_stock_items': [{
+            'id': snapshot.ids[row],
+            'name': snapshot.names[row],
+            'category': snapshot.categories[snapshot.category_codes[row]],
+            'current_stock': int(stock[row]),
+            'reorder_level': int(reorder[row])
+        } for row in low[:LOW_STOCK_CONTEXT_ITEMS]],
+        'trending_products': [{
+            'id': trend['id'],
+            'name': trend['name'],
+            'category': trend['category'],
+            'recent_daily_sales': trend['recent_mean'],
+            'baseline_daily_sales': trend['baseline_mean']
+        } for trend in trending_products()]
+    }
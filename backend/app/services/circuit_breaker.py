@@ -0,0 +1,119 @@
+"""
+Circuit breaker for slow or failing dependencies (the LLM).
+
+Closed, calls go through. After LLM_BREAKER_FAILURES consecutive failures,
+or calls slower than LLM_SLOW_CALL_SECONDS, it opens and callers fall back
+at once instead of each waiting out a timeout. After
+LLM_BREAKER_RESET_SECONDS it goes half-open and lets one probe call
+through: success closes it, failure opens it for another period.
+
+State is per process, like the readiness probe cache: each worker notices
+an outage on its own, so an outage costs at most workers x threshold slow
+calls before everything falls back.
+"""
+import threading
+import time
+
+from flask import current_app
+
+from app.utils.instrumentation import metrics
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Buckets (seconds) for calls that normally take seconds, not milliseconds
+CALL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+class CircuitOpenError(Exception):
+    """The circuit is open (or its half-open probe is in flight); the call was not made."""
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, reset_seconds=30.0, slow_call_seconds=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        metrics.set_gauge('inventiq_circuit_state', 0, labels={'breaker': name})
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def _transition(self, state):
+        self._state = state
+        metrics.set_gauge('inventiq_circuit_state', STATE_VALUES[state], labels={'breaker': self.name})
+        metrics.inc('inventiq_circuit_transitions_total', labels={'breaker': self.name, 'state': state})
+
+    def _acquire(self):
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(f"{self.name} circuit is half-open and probing")
+                self._probing = True
+
+    def _record(self, ok):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self._failures = 0
+                if self._state != CLOSED:
+                    self._transition(CLOSED)
+                return
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self._state != OPEN:
+                    self._transition(OPEN)
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) through the breaker; raises CircuitOpenError without calling it when open.
+
+        A call that returns but took longer than slow_call_seconds counts as
+        a failure (its result is still returned).
+        """
+        self._acquire()
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            elapsed = time.perf_counter() - started
+            metrics.observe('inventiq_circuit_call_seconds', elapsed, labels={'breaker': self.name, 'outcome': 'error'},
+                            buckets=CALL_BUCKETS)
+            self._record(False)
+            raise
+        elapsed = time.perf_counter() - started
+        slow = self.slow_call_seconds is not None and elapsed > self.slow_call_seconds
+        metrics.observe('inventiq_circuit_call_seconds', elapsed,
+                        labels={'breaker': self.name, 'outcome': 'slow' if slow else 'ok'}, buckets=CALL_BUCKETS)
+        self._record(not slow)
+        return result
+
+# name -> CircuitBreaker, shared by all requests in the process
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def llm_breaker():
+    """The process's breaker around Ollama, configured from the app config on first use."""
+    breaker = _breakers.get('llm')
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get('llm')
+            if breaker is None:
+                config = current_app.config
+                breaker = _breakers['llm'] = CircuitBreaker(
+                    'llm', failure_threshold=config.get('LLM_BREAKER_FAILURES', 3),
+                    reset_seconds=config.get('LLM_BREAKER_RESET_SECONDS', 30.0),
+                    slow_call_seconds=config.get('LLM_SLOW_CALL_SECONDS'))
+    return breaker
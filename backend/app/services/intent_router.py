@@ -0,0 +1,328 @@
+"""
+Deterministic intent router for assistant questions.
+
+Most questions put to the assistant are structured: what is low on stock,
+what is trending, how much of X we have, how much of X to reorder. classify()
+scores every intent by the patterns a question matches and extracts the
+slots the intent needs (a product by id or name, a category, a number);
+answer() then answers straight from the catalog snapshot, trends and
+forecasts in milliseconds. Questions that match no intent clearly, match
+several, or read as open-ended ("why", "what should our strategy be") get a
+low confidence and are left to the LLM.
+
+An intent's score is the noisy-or of the weights of its matching patterns.
+Confidence is the best score, discounted by the runner-up (ambiguity), by
+open-ended phrasing, and by required slots that could not be filled.
+"""
+import re
+from collections import namedtuple
+
+from app.extensions import db
+from app.models.inventory import Product
+from app.services.catalog_snapshot import get_catalog_snapshot, low_stock_rows
+from app.services.search_service import search_products
+from app.services.similarity_service import PRODUCT_ID_PATTERN, mentioned_product, similar_products
+
+Route = namedtuple('Route', ['intent', 'confidence', 'slots'])
+
+DECLINING = (r'\bdeclin\w*|\bworst[- ]sell\w*|\bslow[- ]moving\b|\bselling (?:slow(?:ly)?|less|poorly)\b'
+             r'|\btrend\w* down\b|\bdown ?trend\w*')
+
+# (pattern, weight): how strongly a match alone signals the intent
+INTENT_PATTERNS = {
+    'low_stock': [
+        (r'\blow (?:on )?(?:stock|inventory)\b|\b(?:stock|inventory) (?:is |are |running )?low\b', 0.9),
+        (r'\brunning (?:low|out)\b|\bbelow (?:the |their |its )?reorder\b', 0.9),
+        (r'\bneeds? (?:to be )?(?:restock|reorder|replenish)\w*|\bwhat (?:should|do) (?:we|i) (?:restock|reorder)\b',
+         0.8),
+    ],
+    'out_of_stock': [
+        (r'\bout of stock\b|\bsold out\b|\b(?:no|zero) stock\b|\bstock ?outs?\b', 0.95),
+    ],
+    'trending': [
+        (r'\btrend(?:s|ing)?\b|\bpopular\b|\bbest[- ]?sell\w*|\btop[- ]sell\w*', 0.85),
+        (r'\bselling (?:well|fast|best)\b|\bfast[- ]moving\b|\bhot (?:products?|items?|sellers?)\b', 0.8),
+        (DECLINING, 0.85),
+    ],
+    'stock_level': [
+        (r'\bhow (?:much|many)\b(?! (?:products|items|skus|categories)\b).*'
+         r'\b(?:have|left|in stock|on hand|got|remaining)\b', 0.85),
+        (r'\b(?:current |stock |inventory )(?:level|count|quantity)\b|\bstock (?:of|for)\b', 0.7),
+        (r'\bunits of\b|\bin stock\b', 0.4),
+    ],
+    'restock': [
+        (r'\b(?:how (?:much|many)|what quantity)\b.*\b(?:order|reorder|restock|buy|purchase)\b', 0.85),
+        (r'\b(?:restock|reorder)(?:ing)? (?:recommendation|quantity|amount|suggestion)s?\b', 0.9),
+        (r'\b(?:restock|reorder)\b', 0.6),
+    ],
+    'forecast': [
+        (r'\bforecast\w*|\bpredict\w*|\bexpected (?:sales|demand)\b|\bprojected (?:sales|demand)\b', 0.9),
+        (r'\bhow (?:much|many)\b.*\bwill (?:we |i |it |they )?sell\b|\bdemand (?:for|of|next|over)\b', 0.8),
+    ],
+    'similar': [
+        (r'\bsimilar\b|\bsells? like\b|\bselling like\b|\balternatives? (?:to|for)\b', 0.9),
+    ],
+    'overview': [
+        (r'\bhow many (?:products|items|skus)\b|\b(?:inventory|catalog|stock) (?:overview|summary)\b', 0.85),
+        (r'\bsummar(?:y|ise|ize)\b|\bwhat categories\b|\bcategories do\b', 0.7),
+    ],
+}
+
+# Phrasing that asks for reasoning or advice the structured answers cannot give
+OPEN_ENDED_PATTERNS = [
+    (r'\bwhy\b|\bexplain\w*|\breasons?\b', 0.7),
+    (r'\bstrateg\w*|\badvi[cs]e\b|\bsuggest\w*|\bimprove\w*|\bwhat if\b|\bcompare\w*|\bbest way\b', 0.6),
+    (r'\bhow (?:can|could|do|should) (?:we|i)\b|\bshould (?:we|i)\b(?! (?:order|reorder|restock|buy))', 0.5),
+]
+
+# Intents that cannot be answered without a product
+NEEDS_PRODUCT = ('restock', 'forecast', 'similar')
+# How much a runner-up intent's score discounts the best one
+AMBIGUITY = 0.6
+MISSING_SLOT_PENALTY = 0.7
+LONG_QUERY_WORDS = 25
+DEFAULT_LIMIT = 5
+DEFAULT_FORECAST_DAYS = 7
+
+# Where a product name sits in a question, tried in order
+PRODUCT_NAME_PATTERNS = [
+    r'\b(?:how (?:much|many)|what quantity)\s+(?:units of\s+|of\s+)?(?:the\s+|our\s+)?(?P<name>.+?)\s+'
+    r'(?:do|did|does|are|is|have|should|will|can)\b',
+    r'\b(?:stock|inventory|forecast|demand|sales|restock|reorder)\w*\s+(?:level\s+)?(?:of|for|on)\s+'
+    r'(?:the\s+|our\s+)?(?P<name>.+?)(?:\s+(?:next|over|in|for)\b.*)?[?.!]*$',
+    r'\b(?:restock|reorder|order|forecast|predict)\s+(?:the\s+|our\s+)?(?P<name>.+?)(?:\s+(?:next|over|in|for)\b.*)?[?.!]*$',
+    r'\b(?:like|to)\s+(?:the\s+|our\s+)?(?P<name>.+?)[?.!]*$',
+]
+STOP_PHRASES = {'it', 'this', 'that', 'them', 'we', 'i', 'you', 'stock', 'products', 'items', 'everything'}
+
+def _score(query, patterns):
+    """Noisy-or of the weights of the patterns that match."""
+    miss = 1.0
+    for pattern, weight in patterns:
+        if re.search(pattern, query):
+            miss *= 1 - weight
+    return 1 - miss
+
+def _singular(word):
+    return word[:-1] if word.endswith('s') else word
+
+def _category(query, snapshot):
+    """A catalog category named in the query ("toys" or "toy" for Toys), if any."""
+    words = {_singular(word) for word in re.findall(r'\w+', query)}
+    for category in snapshot.categories:
+        name = category.lower()
+        if name in query if ' ' in name else _singular(name) in words:
+            return category
+    return None
+
+def _numbers(query):
+    slots = {}
+    days = re.search(r'\b(\d{1,3})\s*(?:days?|d)\b', query)
+    weeks = re.search(r'\b(\d{1,2})\s*weeks?\b', query)
+    if days:
+        slots['days'] = int(days.group(1))
+    elif weeks:
+        slots['days'] = int(weeks.group(1)) * 7
+    elif re.search(r'\b(?:next|this|coming) week\b', query):
+        slots['days'] = 7
+    elif re.search(r'\b(?:next|this|coming) month\b', query):
+        slots['days'] = 30
+    limit = re.search(r'\b(?:top|first|best|worst)\s+(\d{1,3})\b|\b(\d{1,3})\s+(?:products|items)\b', query)
+    if limit:
+        slots['limit'] = max(1, int(limit.group(1) or limit.group(2)))
+    return slots
+
+def _product(query, product_id, snapshot, category=None):
+    """(product id, candidates, unknown id) for the product a question is about.
+
+    An explicit id in the query wins, then the product the question was
+    asked from, then a name looked up with full-text search. A name that
+    matches several products gives no id and up to three candidates; a
+    name that is just the category asked about is not a product.
+    """
+    explicit = [candidate.upper() for candidate in re.findall(PRODUCT_ID_PATTERN, query)]
+    for candidate in explicit:
+        if candidate in snapshot.index:
+            return candidate, [], None
+    if explicit:
+        return None, [], explicit[0]
+    if product_id and product_id in snapshot.index:
+        return product_id, [], None
+
+    for pattern in PRODUCT_NAME_PATTERNS:
+        match = re.search(pattern, query)
+        if not match:
+            continue
+        name = match.group('name').strip(' ?.!')
+        if not name or name in STOP_PHRASES or len(name) > 60:
+            continue
+        if category and _singular(name) == _singular(category.lower()):
+            return None, [], None
+        # Singular words still prefix-match plural names: "kites" finds Kite, "kite" finds Kites
+        words = ' '.join(_singular(word) for word in name.split())
+        products, total, _ = search_products(words, per_page=3)
+        if not products:
+            continue
+        if total == 1 or ' '.join(_singular(word) for word in products[0].name.lower().split()) == words:
+            return products[0].id, [], None
+        return None, [(product.id, product.name) for product in products], None
+    return None, [], None
+
+def classify(query, product_id=None, snapshot=None):
+    """Route for a question: best intent, confidence in [0, 1] and its slots."""
+    snapshot = snapshot or get_catalog_snapshot()
+    text = ' '.join(query.lower().split())
+    scores = {intent: _score(text, patterns) for intent, patterns in INTENT_PATTERNS.items()}
+    if mentioned_product(text, snapshot):
+        scores['similar'] = max(scores['similar'], 0.95)
+
+    ranked = sorted(scores.items(), key=lambda item: -item[1])
+    (intent, best), (_, runner_up) = ranked[0], ranked[1]
+    if best == 0:
+        return Route(None, 0.0, {})
+
+    slots = _numbers(text)
+    category = _category(text, snapshot)
+    if category:
+        slots['category'] = category
+    if re.search(DECLINING, text):
+        slots['direction'] = 'down'
+
+    openness = _score(text, OPEN_ENDED_PATTERNS)
+    if len(text.split()) > LONG_QUERY_WORDS:
+        openness = 1 - (1 - openness) * 0.7
+    confidence = best * (1 - AMBIGUITY * runner_up) * (1 - openness)
+
+    if intent in NEEDS_PRODUCT or intent == 'stock_level':
+        product, candidates, unknown = _product(text, product_id, snapshot, category)
+        if product:
+            slots['product_id'] = product
+        elif candidates:
+            slots['candidates'] = candidates
+        elif unknown:
+            slots['unknown_id'] = unknown
+        elif intent == 'restock':
+            # "what should we restock?" is a question about the whole catalog
+            intent = 'low_stock'
+        elif intent in NEEDS_PRODUCT or 'category' not in slots:
+            confidence *= 1 - MISSING_SLOT_PENALTY
+    return Route(intent, round(confidence, 3), slots)
+
+def _names(items):
+    return ', '.join(items)
+
+def _count(number, noun):
+    return f"{number} {noun}" if number == 1 else f"{number} {noun}s"
+
+def _low_stock(slots, snapshot):
+    category = slots.get('category')
+    rows = low_stock_rows(snapshot, category)
+    where = f' in {category}' if category else ''
+    if not len(rows):
+        return f"Good news! You don't have any items{where} that need restocking at the moment."
+    items = _names(f"{snapshot.names[row]} ({int(snapshot.current_stock[row])}/{int(snapshot.reorder_level[row])})"
+                   for row in rows[:slots.get('limit', DEFAULT_LIMIT)])
+    return f"I found {_count(len(rows), 'item')}{where} that need restocking soon. The most critical ones are: {items}"
+
+def _out_of_stock(slots, snapshot):
+    import numpy as np
+
+    out = snapshot.current_stock == 0
+    category = slots.get('category')
+    if category:
+        out &= snapshot.category_codes == snapshot.categories.index(category)
+    rows = np.flatnonzero(out)
+    where = f' in {category}' if category else ''
+    if not len(rows):
+        return f"Nothing{where} is out of stock right now."
+    names = _names(snapshot.names[row] for row in rows[:slots.get('limit', DEFAULT_LIMIT)])
+    more = '...' if len(rows) > slots.get('limit', DEFAULT_LIMIT) else ''
+    return f"{_count(len(rows), 'product')}{where} {'is' if len(rows) == 1 else 'are'} out of stock: {names}{more}"
+
+def _trending(slots, snapshot):
+    from app.services.trend_service import refresh_trends, trending_products
+
+    refresh_trends()
+    direction = slots.get('direction', 'up')
+    products = trending_products(slots.get('limit', DEFAULT_LIMIT), direction, slots.get('category'))
+    names = _names(item['name'] for item in products)
+    if direction == 'down':
+        return (f"These products are selling noticeably less than usual: {names}" if products
+                else "No products are declining noticeably at the moment.")
+    return (f"Based on recent sales data, your top trending products are: {names}" if products
+            else "I don't have enough sales data to determine trending products at this time.")
+
+def _stock_level(slots, snapshot, product):
+    if product is None:
+        import numpy as np
+
+        rows = np.flatnonzero(snapshot.category_codes == snapshot.categories.index(slots['category']))
+        units = int(snapshot.current_stock[rows].sum())
+        low = len(low_stock_rows(snapshot, slots['category']))
+        return (f"{slots['category']} has {_count(len(rows), 'product')} with {_count(units, 'unit')} in stock; "
+                f"{low} of them {'is' if low == 1 else 'are'} at or below their reorder level.")
+    text = (f"We have {product.current_stock} units of {product.name} ({product.id}) in stock; "
+            f"its reorder level is {product.reorder_level}.")
+    if product.current_stock <= product.reorder_level:
+        text += " That is at or below the reorder level, so it needs restocking."
+    return text
+
+def _restock(slots, snapshot, product):
+    from app.services.ml_service import recommend_restock
+
+    quantity = recommend_restock(product)
+    if not quantity:
+        return (f"{product.name} ({product.id}) has enough stock ({product.current_stock} units); "
+                f"no reorder is needed right now.")
+    return (f"I recommend ordering {quantity} units of {product.name} ({product.id}). It has "
+            f"{product.current_stock} units in stock and a {product.lead_time}-day lead time.")
+
+def _forecast(slots, snapshot, product):
+    from app.services.ml_service import forecast_demand
+
+    days = min(slots.get('days', DEFAULT_FORECAST_DAYS), 365)
+    forecast = forecast_demand(product, days)
+    total = sum(forecast)
+    return (f"Expected demand for {product.name} ({product.id}) over the next {days} days is about "
+            f"{round(total)} units ({total / max(days, 1):.1f} per day).")
+
+def _similar(slots, snapshot, product):
+    neighbours = similar_products(product.id, slots.get('limit', DEFAULT_LIMIT))
+    if not neighbours:
+        return f"There are no other products to compare {product.id} with yet."
+    names = _names(f"{item['name']} ({item['daily_demand']}/day)" for item in neighbours)
+    return f"Products that sell most like {product.id} are: {names}"
+
+def _overview(slots, snapshot):
+    import numpy as np
+
+    counts = np.bincount(snapshot.category_codes, minlength=len(snapshot.categories))
+    categories = sorted(((snapshot.categories[code], int(n)) for code, n in enumerate(counts) if n),
+                        key=lambda item: -item[1])
+    listed = _names(f"{name} ({count})" for name, count in categories[:10])
+    return (f"You have {snapshot.size} products across {len(categories)} categories: {listed}. "
+            f"{len(low_stock_rows(snapshot))} are at or below their reorder level and "
+            f"{int(np.count_nonzero(snapshot.current_stock == 0))} are out of stock.")
+
+CATALOG_ANSWERS = {'low_stock': _low_stock, 'out_of_stock': _out_of_stock, 'trending': _trending,
+                   'overview': _overview}
+PRODUCT_ANSWERS = {'stock_level': _stock_level, 'restock': _restock, 'forecast': _forecast,
+                   'similar': _similar}
+
+def answer(route, snapshot=None):
+    """Answer a routed question from the catalog; None if the route cannot be answered directly."""
+    snapshot = snapshot or get_catalog_snapshot()
+    slots = route.slots
+    if route.intent in CATALOG_ANSWERS:
+        return CATALOG_ANSWERS[route.intent](slots, snapshot)
+    if route.intent not in PRODUCT_ANSWERS:
+        return None
+    if slots.get('unknown_id'):
+        return f"I couldn't find a product with ID {slots['unknown_id']}."
+    if slots.get('candidates'):
+        options = _names(f"{name} ({product_id})" for product_id, name in slots['candidates'])
+        return f"Several products match that name. Which one do you mean: {options}?"
+    product = db.session.get(Product, slots['product_id']) if slots.get('product_id') else None
+    if product is None and not (route.intent == 'stock_level' and slots.get('category')):
+        return None
+    return PRODUCT_ANSWERS[route.intent](slots, snapshot, product)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from app.extensions import db
+from app.models.inventory import Transaction
+from app.models.rollups import DailySales, LedgerCompaction
+from app.services.rollup_service import LEDGER_COLUMNS, compaction_watermark, rebuild_daily_sales
+from app.services.sales_history import apply_pending_sales
+from app.services.sales_store import append_folded_sales
+
+GRANULARITIES = {
+    'day': None,
+    'month': '%Y-%m',
+}
+
+def _start_of(day):
+    return datetime.combine(day, datetime.min.time())
+
+def sales_between(start, end, product_id=None, granularity='day'):
+    """Units sold and restocked per day or month for days in [start, end].
+
+    Reads the daily aggregates, so the cost depends on the range asked for,
+    not on how many raw transactions have accumulated.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    period = DailySales.sales_date
+    if GRANULARITIES[granularity]:
+        period = func.strftime(GRANULARITIES[granularity], DailySales.sales_date)
+
+    query = (
+        select(period.label('period'),
+               func.sum(DailySales.quantity).label('sold'),
+               func.sum(DailySales.restocked).label('restocked'))
+        .where(DailySales.sales_date >= start, DailySales.sales_date <= end)
+        .group_by(period)
+        .order_by(period)
+    )
+    if product_id:
+        query = query.where(DailySales.product_id == product_id)
+
+    return [{'period': str(row.period), 'sold': int(row.sold), 'restocked': int(row.restocked)}
+            for row in db.session.execute(query)]
+
+def transactions_between(start, end, product_id=None, limit=100, offset=0):
+    """Raw ledger entries for days in [start, end], newest first."""
+    query = Transaction.query.filter(
+        Transaction.transaction_date >= _start_of(start),
+        Transaction.transaction_date < _start_of(end + timedelta(days=1))
+    )
+    if product_id:
+        query = query.filter(Transaction.product_id == product_id)
+
+    transactions = query.order_by(Transaction.transaction_date.desc(), Transaction.id.desc()) \
+        .limit(limit).offset(offset).all()
+    return [{
+        'id': t.id,
+        'product_id': t.product_id,
+        'transaction_type': t.transaction_type,
+        'quantity': t.quantity,
+        'location_id': t.location_id,
+        'transaction_date': t.transaction_date.isoformat()
+    } for t in transactions]
+
+def compact_ledger(retention_days, dry_run=False):
+    """Fold sale/restock transactions older than retention_days into the daily aggregates.
+
+    The aggregates for the compacted days are rebuilt from the raw rows first, so
+    whatever the incremental updates recorded is replaced by the exact totals
+    before the raw rows are deleted.
+    """
+    cutoff = datetime.utcnow().date() - timedelta(days=retention_days)
+    watermark = compaction_watermark(db.session)
+    old_rows = (Transaction.transaction_date < _start_of(cutoff),
+                Transaction.transaction_type.in_(LEDGER_COLUMNS))
+    count = db.session.execute(select(func.count(Transaction.id)).where(*old_rows)).scalar()
+
+    result = {
+        'compacted_before': cutoff.isoformat(),
+        'previous_watermark': watermark.isoformat() if watermark else None,
+        'transactions': count,
+        'dry_run': dry_run
+    }
+    if dry_run or (watermark and cutoff <= watermark):
+        return result
+
+    # Pending sales must reach historical_sales before their rows go
+    folded = {}
+    apply_pending_sales(db.session, folded=folded)
+    rebuild_daily_sales(db.session, end=cutoff)
+    db.session.execute(delete(Transaction).where(*old_rows), execution_options={'synchronize_session': False})
+    db.session.add(LedgerCompaction(compacted_before=cutoff, transactions_removed=count))
+    db.session.commit()
+    append_folded_sales(folded)
+    return result
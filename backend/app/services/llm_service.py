@@ -1,124 +1,81 @@
-import json
 from flask import current_app
-from app.models.inventory import Product, Transaction
-import pandas as pd
-from .ollama_service import get_ollama_insights
+from app.extensions import db
+from app.services.assistant_sessions import record_turn
+from app.services.circuit_breaker import CircuitOpenError, llm_breaker
+from app.services.intent_router import Route, answer, classify
+from app.utils.instrumentation import metrics, timed
+from .ollama_service import OllamaService, prepare_messages
 
-def prepare_inventory_summary():
-    """Prepare a summary of inventory data for the LLM context."""
-    products = Product.query.all()
-    
-    # Convert to dataframe for easier analysis
-    products_data = []
-    for p in products:
-        product_data = {
-            'id': p.id,
-            'name': p.name,
-            'category': p.category,
-            'supplier': p.supplier,
-            'current_stock': p.current_stock,
-            'reorder_level': p.reorder_level,
-            'purchase_price': p.purchase_price,
-            'selling_price': p.selling_price
-        }
-        
-        # Add historical sales data if available
-        if hasattr(p, 'historical_sales') and p.historical_sales:
-            product_data['historical_sales'] = p.historical_sales
-            
-        products_data.append(product_data)
-        
-    df = pd.DataFrame(products_data)
-    
-    # Create summary stats
-    summary = {
-        'total_products': len(products),
-        'categories': df['category'].value_counts().to_dict() if not df.empty else {},
-        'low_stock_items': []
-    }
-    
-    # Get low stock items
-    if not df.empty:
-        low_stock_df = df[df['current_stock'] <= df['reorder_level']]
-        summary['low_stock_count'] = low_stock_df.shape[0]
-        summary['out_of_stock_count'] = df[df['current_stock'] == 0].shape[0]
-        
-        # Add detailed low stock items
-        summary['low_stock_items'] = low_stock_df[['id', 'name', 'category', 'current_stock', 'reorder_level']].to_dict('records')
-        
-        # Add trending products based on historical sales if available
-        if 'historical_sales' in df.columns and not df['historical_sales'].isna().all():
-            # Process historical sales to identify trending products
-            trending_products = []
-            for _, row in df.iterrows():
-                if row.get('historical_sales'):
-                    # Calculate total sales from historical data
-                    try:
-                        sales_data = row['historical_sales']
-                        if isinstance(sales_data, dict):
-                            total_sales = sum(sales_data.values())
-                            trending_products.append({
-                                'id': row['id'],
-                                'name': row['name'],
-                                'category': row['category'],
-                                'total_sales': total_sales
-                            })
-                    except (TypeError, AttributeError):
-                        pass
-            
-            # Sort by total sales and get top trending products
-            trending_products.sort(key=lambda x: x.get('total_sales', 0), reverse=True)
-            summary['trending_products'] = trending_products[:5]  # Top 5 trending products
-    
-    return summary
+def route_query(query, product_id=None):
+    """(route, direct answer or None) for a question; None leaves it to the LLM."""
+    use_ollama = current_app.config.get('USE_OLLAMA', True)
+    # Without Ollama there is nothing better to hand a question to, so routing is more lenient
+    threshold = current_app.config.get('ROUTER_CONFIDENCE' if use_ollama else 'ROUTER_FALLBACK_CONFIDENCE', 0.5)
+    with timed('router'):
+        route = classify(query, product_id)
+        if route.intent is None or route.confidence < threshold:
+            return route, None
+        return route, answer(route)
 
-def get_product_details(product_id):
-    """Get detailed information about a specific product."""
-    product = Product.query.get(product_id)
-    if not product:
-        return None
-        
-    return product.to_dict()
+def fallback_answer(route):
+    """Deterministic answer for when the LLM can't be used: the router's best guess, else the overview."""
+    threshold = current_app.config.get('ROUTER_FALLBACK_CONFIDENCE', 0.15)
+    direct = answer(route) if route.intent is not None and route.confidence >= threshold else None
+    return direct or answer(Route('overview', 1.0, {}))
 
-def get_llm_insights(query, product_id=None):
-    """Generate insights using LLM based on user query."""
+def _failure_reason(error):
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    import requests  # already loaded, unless the prompt failed before Ollama was called
+    return 'timeout' if isinstance(error, requests.Timeout) else 'error'
+
+def get_llm_insights(query, product_id=None, session=None):
+    """Generate insights using LLM based on user query.
+
+    session (see assistant_sessions) keeps the conversation. Every answer,
+    direct or fallback too, is recorded and committed in it, so the LLM sees
+    them on a follow-up and the session id handed back always exists.
+    """
+    route, direct = route_query(query, product_id)
+    if direct is not None:
+        metrics.inc('inventiq_assistant_queries_total', labels={'route': 'direct', 'intent': route.intent})
+        if session is not None:
+            record_turn(session, query, direct)
+        return direct
+    
     # Check if we should use Ollama or fallback to mock responses
     use_ollama = current_app.config.get('USE_OLLAMA', True)
     
     if use_ollama:
         try:
-            # Use Ollama for generating insights
-            return get_ollama_insights(query, product_id)
+            question, messages = prepare_messages(query, product_id, session)
+            # Only the call to Ollama counts for the breaker, which fails it fast while Ollama is down or too slow
+            insight = llm_breaker().call(OllamaService.from_config(current_app.config).chat, messages)
         except Exception as e:
-            current_app.logger.error(f"Error using Ollama: {str(e)}")
-            # Fallback to mock responses if Ollama fails
-            return f"I encountered an issue connecting to the AI service. Please try again later. Error: {str(e)}"
+            reason = _failure_reason(e)
+            if reason != 'circuit_open':
+                current_app.logger.error(f"Error using Ollama: {str(e)}")
+            metrics.inc('inventiq_assistant_queries_total', labels={'route': 'fallback', 'intent': route.intent or 'none'})
+            metrics.inc('inventiq_assistant_fallbacks_total', labels={'reason': reason})
+            # Whatever failed may have left the db session unusable; the new session, if any, goes back in
+            db.session.rollback()
+            if session is not None:
+                db.session.add(session)
+            # Answer from the inventory data instead of failing the question
+            insight = ("The AI assistant is unavailable right now, so here is what the inventory data shows. "
+                       + fallback_answer(route))
+            if session is not None:
+                record_turn(session, query, insight)
+            return insight
+
+        metrics.inc('inventiq_assistant_queries_total', labels={'route': 'llm', 'intent': route.intent or 'none'})
+        if session is not None:
+            record_turn(session, question, insight)
+        return insight
     else:
-        # Prepare context for mock responses
-        inventory_summary = prepare_inventory_summary()
-        
-        # Add specific product details if provided
-        product_details = None
-        if product_id:
-            product_details = get_product_details(product_id)
-        
-        # Mock responses based on query keywords
-        query_lower = query.lower()
-        
-        if "low stock" in query_lower or "restock" in query_lower:
-            if inventory_summary.get('low_stock_items', []):
-                items = inventory_summary['low_stock_items'][:3]  # Get top 3 items
-                items_text = ", ".join([f"{item['name']} ({item['current_stock']}/{item['reorder_level']})" for item in items])
-                return f"I found {len(inventory_summary['low_stock_items'])} items that need restocking soon. The most critical ones are: {items_text}"
-            else:
-                return "Good news! You don't have any items that need restocking at the moment."
-        
-        if "trend" in query_lower or "trending" in query_lower or "popular" in query_lower:
-            if inventory_summary.get('trending_products', []):
-                trending_names = [item['name'] for item in inventory_summary['trending_products'][:5]]
-                return f"Based on recent sales data, your top trending products are: {', '.join(trending_names)}"
-            else:
-                return "I don't have enough sales data to determine trending products at this time."
-        
+        metrics.inc('inventiq_assistant_queries_total', labels={'route': 'fallback', 'intent': route.intent or 'none'})
         # Default response
-        return f"I can provide insights about your inventory. Try asking about low stock items, trending products, or specific categories."
\ No newline at end of file
+        insight = "I can provide insights about your inventory. Try asking about low stock items, trending products, or specific categories."
+        if session is not None:
+            record_turn(session, query, insight)
+        return insight
@@ -0,0 +1,281 @@
+"""
+Per-location stock counters.
+
+Each product's stock is split into one StockLevel row per location. A sale or
+transfer checks and updates only the rows for the locations involved, with a
+single conditional UPDATE, so sales of one product at different warehouses do
+not wait on each other's availability checks.
+
+Product.current_stock stays the catalog-wide total that everything else reads
+(dashboards, alerts, the catalog snapshot). The movement's transaction touches
+only the location rows and the new ledger row. Once it has committed, the
+change is added to the product total as a delta in a second, short
+transaction, together with the rollups, daily sales and alerts that follow
+from it; no transaction reads the total and writes it back. If that second
+step fails the movement stands and the error is logged with the delta the
+total is missing.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import exists, func, insert, literal, select, update
+
+from app.extensions import db
+from app.models.inventory import Product, Transaction
+from app.models.locations import Location, StockLevel
+from app.services import product_changes, sales_history
+from app.services.ml_service import add_to_sales_history, restock_level
+from app.services.sales_history import write_behind_enabled
+
+# Window of location sales used to split a product's demand between locations
+DEMAND_SHARE_DAYS = 30
+
+class StockError(ValueError):
+    """A stock movement that cannot be applied (unknown location, not enough units)."""
+
+def is_location_managed(product_id):
+    """True once any location holds the product; its total is then the sum of its levels."""
+    return db.session.execute(select(exists().where(StockLevel.product_id == product_id))).scalar()
+
+def _update_level(product_id, location_id, quantity, *conditions):
+    """Add quantity (negative to remove) to a stock level; returns the new level, or None if no row matched."""
+    statement = (
+        update(StockLevel)
+        .where(StockLevel.product_id == product_id, StockLevel.location_id == location_id, *conditions)
+        .values(quantity=StockLevel.quantity + quantity, updated_at=datetime.utcnow())
+    )
+    if db.session.get_bind().dialect.update_returning:
+        return db.session.execute(statement.returning(StockLevel.quantity),
+                                  execution_options={'synchronize_session': False}).scalar()
+    result = db.session.execute(statement, execution_options={'synchronize_session': False})
+    return _level(product_id, location_id) if result.rowcount else None
+
+def _take(product_id, location_id, quantity):
+    """Remove units from one location if it has enough; returns what is left there."""
+    remaining = _update_level(product_id, location_id, -quantity, StockLevel.quantity >= quantity)
+    if remaining is None:
+        if _level(product_id, location_id) is None:
+            raise StockError(f'Product {product_id} is not stocked at location {location_id}')
+        raise StockError('Insufficient stock!')
+    return remaining
+
+def _put(product_id, location_id, quantity):
+    """Add units to one location, creating its stock level if needed; returns the new level."""
+    level = _update_level(product_id, location_id, quantity)
+    if level is None:
+        if db.session.get(Location, location_id) is None:
+            raise StockError(f'Unknown location {location_id}')
+        db.session.execute(insert(StockLevel).values(product_id=product_id, location_id=location_id,
+                                                     quantity=quantity, updated_at=datetime.utcnow()))
+        level = quantity
+    return level
+
+def _level(product_id, location_id):
+    return db.session.execute(
+        select(StockLevel.quantity)
+        .where(StockLevel.product_id == product_id, StockLevel.location_id == location_id)
+    ).scalar()
+
+def _apply_to_total(product_id, delta, record=None, sold=0):
+    """Add a committed movement to Product.current_stock in its own transaction; returns the new total.
+
+    record is the movement's TransactionRecord, for the daily sales; sold is
+    added to today's historical_sales when the write-behind is off.
+    """
+    try:
+        columns = [getattr(Product, field) for field in product_changes.PRODUCT_FIELDS]
+        statement = (
+            update(Product)
+            .where(Product.id == product_id)
+            .values(current_stock=Product.current_stock + delta)
+        )
+        if db.session.get_bind().dialect.update_returning:
+            row = db.session.execute(statement.returning(*columns),
+                                     execution_options={'synchronize_session': False}).one()
+        else:
+            db.session.execute(statement, execution_options={'synchronize_session': False})
+            row = db.session.execute(select(*columns).where(Product.id == product_id)).one()
+        new = dict(row._mapping)
+        old = {**new, 'current_stock': new['current_stock'] - delta}
+        if sold:
+            # The UPDATE above holds the row, so no other write of the history can land in between
+            new['historical_sales'] = add_to_sales_history(old['historical_sales'], sold, record.transaction_date)
+            db.session.execute(update(Product).where(Product.id == product_id)
+                               .values(historical_sales=new['historical_sales']),
+                               execution_options={'synchronize_session': False})
+
+        # Core statements bypass the ORM, so the change is published by hand
+        changes = product_changes.ChangeSet(products=[product_changes.ProductChange(product_id, old, new)])
+        if record is not None:
+            changes.transactions.append(record)
+        product_changes.publish(db.session, changes)
+        db.session.commit()
+        return new['current_stock']
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Stock of {product_id} is missing a change of {delta} units: {str(e)}")
+        return db.session.execute(select(Product.current_stock).where(Product.id == product_id)).scalar()
+
+def record_location_transaction(product_id, location_id, transaction_type, quantity):
+    """Apply a sale or restock at one location and commit it, then add it to the product total.
+
+    Returns (transaction dict, units left at the location, product total).
+    """
+    if transaction_type == 'sale':
+        remaining = _take(product_id, location_id, quantity)
+    elif transaction_type == 'restock':
+        remaining = _put(product_id, location_id, quantity)
+    else:
+        raise StockError('Only sale and restock transactions can be recorded per location')
+
+    # With the write-behind on, the sale reaches historical_sales in the next batch
+    deferred = transaction_type == 'sale' and write_behind_enabled()
+    now = datetime.utcnow()
+    # A Core insert, so the ORM does not hand it to the rollups inside this transaction
+    result = db.session.execute(insert(Transaction).values(
+        product_id=product_id, location_id=location_id, transaction_type=transaction_type,
+        quantity=quantity, transaction_date=now, history_pending=deferred))
+    record = {
+        'id': result.inserted_primary_key[0],
+        'product_id': product_id,
+        'location_id': location_id,
+        'transaction_type': transaction_type,
+        'quantity': quantity,
+        'transaction_date': now.isoformat()
+    }
+    db.session.commit()
+    if deferred:
+        sales_history.buffer.add(record['id'])
+
+    delta = -quantity if transaction_type == 'sale' else quantity
+    sold = quantity if transaction_type == 'sale' and not deferred else 0
+    total = _apply_to_total(product_id, delta, product_changes.TransactionRecord(
+        product_id, transaction_type, quantity, now, deferred), sold=sold)
+    return record, remaining, total
+
+def transfer_stock(product_id, from_location, to_location, quantity):
+    """Move units between two locations in one transaction; the product total does not change."""
+    if from_location == to_location:
+        raise StockError('Source and destination must differ')
+
+    # Touch the two rows in a fixed order so opposite transfers cannot deadlock
+    if to_location < from_location:
+        levels = {to_location: _put(product_id, to_location, quantity)}
+        levels[from_location] = _take(product_id, from_location, quantity)
+    else:
+        levels = {from_location: _take(product_id, from_location, quantity)}
+        levels[to_location] = _put(product_id, to_location, quantity)
+
+    # Transfers are ledger entries only; nothing derived from sales needs to see them
+    now = datetime.utcnow()
+    db.session.execute(insert(Transaction), [
+        {'product_id': product_id, 'location_id': location_id, 'transaction_type': transaction_type,
+         'quantity': quantity, 'transaction_date': now}
+        for location_id, transaction_type in ((from_location, 'transfer_out'), (to_location, 'transfer_in'))
+    ])
+    db.session.commit()
+    return {from_location: levels[from_location], to_location: levels[to_location]}
+
+def set_stock_level(product_id, location_id, quantity):
+    """Set a location's count (e.g. after a stock take), then add the difference to the product total."""
+    # Until its stock is adopted into a location the total is not a sum of levels; one count would replace it
+    if not is_location_managed(product_id):
+        raise StockError(f'Product {product_id} is not stocked per location yet; adopt its stock into a location first')
+
+    level = db.session.execute(
+        select(StockLevel)
+        .where(StockLevel.product_id == product_id, StockLevel.location_id == location_id)
+        .with_for_update()
+    ).scalar()
+    if level is None:
+        if db.session.get(Location, location_id) is None:
+            raise StockError(f'Unknown location {location_id}')
+        level = StockLevel(product_id=product_id, location_id=location_id, quantity=0)
+        db.session.add(level)
+    delta = quantity - (level.quantity or 0)
+    level.quantity = quantity
+    db.session.commit()
+    return _apply_to_total(product_id, delta)
+
+def adopt_unlocated_stock(location_id):
+    """Put the whole stock of every product not yet held per location into this location."""
+    unlocated = select(Product.id, literal(location_id), Product.current_stock, literal(datetime.utcnow())) \
+        .where(~exists().where(StockLevel.product_id == Product.id))
+    result = db.session.execute(
+        insert(StockLevel).from_select(['product_id', 'location_id', 'quantity', 'updated_at'], unlocated)
+    )
+    return result.rowcount
+
+def location_summaries():
+    """Every location with the number of products it holds and its total units."""
+    totals = (
+        select(StockLevel.location_id,
+               func.count(StockLevel.product_id).label('products'),
+               func.coalesce(func.sum(StockLevel.quantity), 0).label('units'))
+        .group_by(StockLevel.location_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(Location, totals.c.products, totals.c.units)
+        .outerjoin(totals, totals.c.location_id == Location.id)
+        .order_by(Location.id)
+    )
+    return [{**location.to_dict(), 'products': products or 0, 'units': units or 0}
+            for location, products, units in rows]
+
+def stock_by_location(product_id):
+    return {level.location_id: level.quantity
+            for level in StockLevel.query.filter_by(product_id=product_id).order_by(StockLevel.location_id)}
+
+def demand_shares(product_id, locations, days=DEMAND_SHARE_DAYS):
+    """Fraction of the product's recent sales made at each location; even split without history."""
+    since = datetime.utcnow() - timedelta(days=days)
+    sold = dict(db.session.execute(
+        select(Transaction.location_id, func.sum(Transaction.quantity))
+        .where(Transaction.product_id == product_id, Transaction.transaction_type == 'sale',
+               Transaction.location_id.is_not(None), Transaction.transaction_date >= since)
+        .group_by(Transaction.location_id)
+    ).all())
+    total = sum(sold.get(location_id, 0) for location_id in locations)
+    if not total:
+        return {location_id: 1 / len(locations) for location_id in locations}
+    return {location_id: sold.get(location_id, 0) / total for location_id in locations}
+
+def recommend_location_restock(product, is_trending=False):
+    """Split the product's restock level across its locations by where it sells.
+
+    Shortfalls are covered from other locations' surplus first; only what is
+    left is ordered from the supplier, so the total order matches what
+    recommend_restock would ask for the product as a whole.
+    """
+    levels = stock_by_location(product.id)
+    if not levels:
+        return []
+
+    shares = demand_shares(product.id, list(levels))
+    level = restock_level(product)
+    targets = {location_id: level * share for location_id, share in shares.items()}
+    gaps = {location_id: round(targets[location_id] - levels[location_id]) for location_id in levels}
+
+    surplus = sorted(((-gap, location_id) for location_id, gap in gaps.items() if gap < 0), reverse=True)
+    recommendations = []
+    for location_id in sorted(levels, key=lambda location_id: -gaps[location_id]):
+        need = max(gaps[location_id], 0)
+        transfers = []
+        while need and surplus:
+            available, source = surplus.pop(0)
+            moved = min(available, need)
+            transfers.append({'from_location': source, 'quantity': moved})
+            need -= moved
+            if available > moved:
+                surplus.insert(0, (available - moved, source))
+        order = round(need * 1.2) if is_trending else need
+        recommendations.append({
+            'location_id': location_id,
+            'current_stock': levels[location_id],
+            'demand_share': round(shares[location_id], 3),
+            'target_stock': round(targets[location_id]),
+            'transfers': transfers,
+            'order_quantity': order
+        })
+    return recommendations
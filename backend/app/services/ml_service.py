@@ -1,32 +1,68 @@
 import json
-import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
+import re
+import statistics
+from datetime import date
+from statistics import NormalDist
+from app.utils.instrumentation import timed
+from app.utils.request_memo import request_memo
+
+# numpy and pandas are imported inside the functions that need them, so
+# importing the routes (and starting a worker) does not pay for them
+
+# Restock targets: probability of not running out during a lead time, how often
+# stock is reviewed, and how much recent history the demand variability uses
+SERVICE_LEVEL = 0.95
+REVIEW_DAYS = 7
+DEMAND_WINDOW_DAYS = 90
+
+def sales_key(day):
+    """historical_sales key for a calendar date (ISO, so keys never wrap or collide across years)."""
+    return day.strftime('%Y-%m-%d')
+
+def add_to_sales_history(historical_sales, quantity, day):
+    """historical_sales JSON string with quantity added to the given day."""
+    sales = json.loads(historical_sales) if historical_sales else {}
+    key = sales_key(day)
+    sales[key] = sales.get(key, 0) + quantity
+    return json.dumps(sales)
+
+def _history_order(day_key):
+    """Sort key for historical sales: legacy 'Day-N' keys first by N, then ISO dates."""
+    match = re.match(r'Day-(\d+)$', day_key)
+    if match:
+        return (0, int(match.group(1)))
+    try:
+        return (1, date.fromisoformat(day_key).toordinal())
+    except ValueError:
+        return (0, 0)
+
+def parse_sales_history(historical_sales):
+    """Return (day, quantity) pairs from a historical_sales JSON string in day order."""
+    sales = json.loads(historical_sales) if historical_sales else {}
+    return sorted(sales.items(), key=lambda item: _history_order(item[0]))
 
 def prepare_time_series(product):
     """Convert historical sales to time series data."""
-    historical_sales = json.loads(product.historical_sales)
+    import pandas as pd
+    # Already in day order
+    sales_data = [{'day': day, 'quantity': quantity}
+                  for day, quantity in parse_sales_history(product.historical_sales)]
     
-    # Convert to dataframe
-    sales_data = []
-    for day, quantity in historical_sales.items():
-        sales_data.append({'day': day, 'quantity': quantity})
-        
-    df = pd.DataFrame(sales_data)
-    
-    # Sort by day
-    df['day_num'] = df['day'].str.extract(r'Day-(\d+)').astype(int)
-    df = df.sort_values('day_num')
-    
-    return df
+    return pd.DataFrame(sales_data, columns=['day', 'quantity'])
 
 def simple_forecast(product, days=30):
     """Use simple moving average to forecast demand."""
+    import numpy as np
     df = prepare_time_series(product)
     
-    # If insufficient data, return simple average
+    # If insufficient data, blend what there is with what similar products sell
     if len(df) < 5:
-        avg_sales = df['quantity'].mean()
+        from app.services.similarity_service import PRIOR_DAYS, neighbour_demand
+        prior = neighbour_demand(product)
+        if prior is None:
+            avg_sales = df['quantity'].mean() if len(df) else 0
+        else:
+            avg_sales = (df['quantity'].sum() + PRIOR_DAYS * prior) / (len(df) + PRIOR_DAYS)
         return [round(avg_sales) for _ in range(days)]
     
     # Calculate moving average
@@ -45,27 +81,100 @@ def simple_forecast(product, days=30):
     
     return forecast
 
+def moving_average_matrix(history, days=30, window=5):
+    """Vectorized moving-average point forecast for a products x days matrix."""
+    import numpy as np
+    history = np.asarray(history)
+    
+    # Mirror simple_forecast: short histories fall back to the overall mean
+    if history.shape[1] < window:
+        level = history.mean(axis=1, dtype=np.float64) if history.shape[1] else np.zeros(history.shape[0])
+    else:
+        level = history[:, -window:].mean(axis=1, dtype=np.float64)
+    
+    return np.repeat(level[:, None], days, axis=1)
+
+def naive_matrix(history, days=30):
+    """Repeat the last observed day for every product."""
+    import numpy as np
+    last_day = np.asarray(history)[:, -1:].astype(np.float64)
+    return np.repeat(last_day, days, axis=1)
+
+def seasonal_naive_matrix(history, days=30, season=7):
+    """Repeat the last observed week for every product."""
+    import numpy as np
+    history = np.asarray(history)
+    if history.shape[1] < season:
+        return naive_matrix(history, days)
+    
+    last_season = history[:, -season:].astype(np.float64)
+    reps = -(-days // season)  # ceiling division
+    return np.tile(last_season, (1, reps))[:, :days]
+
+def mean_matrix(history, days=30):
+    """Forecast the all-time mean for every product."""
+    import numpy as np
+    level = np.asarray(history).mean(axis=1, dtype=np.float64)
+    return np.repeat(level[:, None], days, axis=1)
+
+# Point-forecast methods evaluated by the backtesting harness. Each takes a
+# products x days history matrix and returns a products x days forecast.
+FORECAST_METHODS = {
+    'moving_average': moving_average_matrix,
+    'naive': naive_matrix,
+    'seasonal_naive': seasonal_naive_matrix,
+    'mean': mean_matrix,
+}
+
+@timed('forecast')
 def forecast_demand(product, days=30):
-    """Forecast demand using simple moving average."""
-    return simple_forecast(product, days)
+    """Forecast demand using simple moving average.
+
+    Memoized for the request on the product's sales history. A shorter
+    horizon is cut from a longer forecast already made, so the forecast and
+    restock calls of one batch agree.
+    """
+    memo = request_memo()
+    if memo is None:
+        return simple_forecast(product, days)
+    key = ('forecast', product.id, product.historical_sales)
+    forecast = memo.get(key)
+    if forecast is None or len(forecast) < days:
+        forecast = memo[key] = simple_forecast(product, days)
+    return forecast[:max(days, 0)]
+
+def demand_variability(product, window=DEMAND_WINDOW_DAYS):
+    """Standard deviation of daily sales over the most recent history entries."""
+    quantities = [quantity for _, quantity in parse_sales_history(product.historical_sales)][-window:]
+    return statistics.stdev(quantities) if len(quantities) > 1 else 0.0
 
-def recommend_restock(product, is_trending=False):
-    """Recommend restock quantity based on forecast and current stock."""
+def safety_stock(demand_std, lead_time, service_level=SERVICE_LEVEL):
+    """Units held against demand variability over the lead time (scalars or NumPy arrays)."""
+    return NormalDist().inv_cdf(service_level) * demand_std * lead_time ** 0.5
+
+def restock_level(product, service_level=SERVICE_LEVEL):
+    """Order-up-to level: forecast demand over lead time and review period, plus safety stock."""
     forecast = forecast_demand(product, days=7)  # Forecast next 7 days
     avg_daily_demand = sum(forecast) / len(forecast)
     
-    # Calculate safety stock (2 weeks worth)
-    safety_stock = avg_daily_demand * 14
-    
-    # Calculate reorder point
-    reorder_point = avg_daily_demand * 7 + safety_stock
-    
+    cycle_stock = avg_daily_demand * (product.lead_time + REVIEW_DAYS)
+    return cycle_stock + safety_stock(demand_variability(product), product.lead_time, service_level)
+
+def recommend_restock(product, is_trending=None):
+    """Recommend restock quantity based on forecast and current stock.
+
+    is_trending=None detects the trend from the product's recent sales.
+    """
+    if is_trending is None:
+        from app.services.trend_service import product_trend
+        is_trending = product_trend(product)['trend'] == 'up'
+
     # Calculate order quantity
     current_stock = product.current_stock
-    order_quantity = max(0, round(reorder_point - current_stock))
+    order_quantity = max(0, round(restock_level(product) - current_stock))
     
     # If trending, increase order by 20%
     if is_trending:
         order_quantity = round(order_quantity * 1.2)
     
-    return order_quantity
\ No newline at end of file
+    return order_quantity
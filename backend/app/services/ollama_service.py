@@ -1,85 +1,123 @@
-import requests
 import json
+import threading
 from flask import current_app
 from app.models.inventory import Product, Transaction
-import pandas as pd
+from app.services.catalog_snapshot import inventory_summary
+from app.services.assistant_sessions import chat_messages, needs_priming, prime, record_turn
+from app.services.similarity_service import mentioned_product, similar_products_context
+from app.utils.instrumentation import metrics, timed
+
+SYSTEM_PROMPT = """You are an intelligent inventory management assistant for InventIQ system. 
+    Your role is to provide accurate, helpful insights about inventory data.
+    When asked about low stock items or trending products, always include specific product names and quantities.
+    For restock recommendations, include a 30% buffer for trending or fast-moving products.
+    Be concise but informative."""
+
+def _keep_alive(value):
+    """OLLAMA_KEEP_ALIVE as Ollama takes it: seconds as a number, otherwise a duration like '30m'."""
+    value = str(value).strip()
+    return int(value) if value.lstrip('-').isdigit() else value
 
 class OllamaService:
-    def __init__(self, base_url="http://localhost:11434", model="llama3"):
-        """Initialize the Ollama service with base URL and model."""
+    def __init__(self, base_url="http://localhost:11434", model="llama3", keep_alive=None):
+        """Initialize the Ollama service with base URL and model.
+
+        keep_alive is how long Ollama keeps the model (and its prompt cache)
+        loaded after a request; None leaves Ollama's default of 5 minutes.
+        """
         self.base_url = base_url
         self.model = model
+        self.keep_alive = keep_alive
         self.api_endpoint = f"{self.base_url}/api/generate"
-    
-    def generate(self, prompt, system_prompt=None, temperature=0.7, max_tokens=500):
-        """Generate a response using Ollama."""
+        self.chat_endpoint = f"{self.base_url}/api/chat"
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(base_url=config.get('OLLAMA_BASE_URL', 'http://localhost:11434'),
+                   model=config.get('OLLAMA_MODEL', 'llama3'),
+                   keep_alive=_keep_alive(config.get('OLLAMA_KEEP_ALIVE', '30m')))
+
+    @staticmethod
+    def _timeout():
+        """(connect, read) timeouts: a down server fails fast, a slow one is cut off at OLLAMA_TIMEOUT."""
+        return (current_app.config.get('OLLAMA_CONNECT_TIMEOUT', 2.0), current_app.config.get('OLLAMA_TIMEOUT', 60))
+
+    def _payload(self, temperature, max_tokens):
         payload = {
             "model": self.model,
-            "prompt": prompt,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
+            "stream": False,
+            "options": {"temperature": temperature, "num_predict": max_tokens},
         }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+    
+    def is_available(self, timeout=1.0):
+        """Whether the Ollama server answers and has the configured model pulled."""
+        import requests
+        response = requests.get(f"{self.base_url}/api/tags", timeout=timeout)
+        response.raise_for_status()
+        models = [model.get('name', '') for model in response.json().get('models', [])]
+        return any(name == self.model or name.startswith(f"{self.model}:") for name in models)
+
+    @timed('llm')
+    def generate(self, prompt, system_prompt=None, temperature=0.7, max_tokens=500):
+        """Generate a response using Ollama; raises on failure so callers can fall back."""
+        import requests  # deferred with the other heavy imports; most workers never call Ollama
+        payload = {**self._payload(temperature, max_tokens), "prompt": prompt}
         
         if system_prompt:
             payload["system"] = system_prompt
             
+        # Without a timeout a stuck Ollama would hold a server thread forever
+        response = requests.post(self.api_endpoint, json=payload, timeout=self._timeout())
+        response.raise_for_status()
+        return response.json()["response"]
+
+    @timed('llm')
+    def chat(self, messages, temperature=0.7, max_tokens=500):
+        """Answer the last message of a conversation with the chat API; raises on failure.
+
+        Ollama evaluates only the prompt tokens after the longest prefix it
+        still has cached from the previous request; prompt_eval_count in its
+        reply counts those, so the metric shows what a follow-up really cost.
+        """
+        import requests
+        response = requests.post(self.chat_endpoint, json={**self._payload(temperature, max_tokens),
+                                                           "messages": messages}, timeout=self._timeout())
+        response.raise_for_status()
+        data = response.json()
+        metrics.inc('inventiq_llm_prompt_tokens_total', data.get('prompt_eval_count', 0))
+        metrics.inc('inventiq_llm_generated_tokens_total', data.get('eval_count', 0))
+        return data["message"]["content"]
+
+    def warm_up(self, timeout=300):
+        """Load the model into memory (a chat request without messages) so the first question skips the load."""
+        import requests
+        response = requests.post(self.chat_endpoint, json={"model": self.model, "messages": [],
+                                                           "keep_alive": self.keep_alive}, timeout=timeout)
+        response.raise_for_status()
+
+def warm_up_ollama(app):
+    """Load the Ollama model in the background at startup; failures are only logged."""
+    if not app.config.get('USE_OLLAMA', True) or not app.config.get('OLLAMA_WARM_UP', True):
+        return None
+    service = OllamaService.from_config(app.config)
+
+    def run():
         try:
-            response = requests.post(self.api_endpoint, json=payload)
-            response.raise_for_status()
-            return response.json()["response"]
+            service.warm_up()
+            app.logger.info(f"Ollama model {service.model} loaded")
         except Exception as e:
-            current_app.logger.error(f"Error calling Ollama API: {str(e)}")
-            return f"Error generating insights: {str(e)}"
+            app.logger.warning(f"Ollama warm-up failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name='ollama-warm-up', daemon=True)
+    thread.start()
+    return thread
 
 def prepare_inventory_summary():
     """Prepare a summary of inventory data for the LLM context."""
-    products = Product.query.all()
-    
-    # Convert to dataframe for easier analysis
-    products_data = []
-    for p in products:
-        product_data = {
-            'id': p.id,
-            'name': p.name,
-            'category': p.category,
-            'supplier': p.supplier,
-            'current_stock': p.current_stock,
-            'reorder_level': p.reorder_level,
-            'purchase_price': p.purchase_price,
-            'selling_price': p.selling_price
-        }
-        
-        # Add historical sales data if available
-        if hasattr(p, 'historical_sales') and p.historical_sales:
-            product_data['historical_sales'] = p.historical_sales
-            
-        products_data.append(product_data)
-        
-    df = pd.DataFrame(products_data)
-    
-    # Create summary stats
-    summary = {
-        'total_products': len(products),
-        'categories': df['category'].value_counts().to_dict() if not df.empty else {},
-        'low_stock_items': []
-    }
-    
-    # Get low stock items
-    if not df.empty:
-        low_stock_df = df[df['current_stock'] <= df['reorder_level']]
-        summary['low_stock_count'] = low_stock_df.shape[0]
-        summary['out_of_stock_count'] = df[df['current_stock'] == 0].shape[0]
-        
-        # Add detailed low stock items
-        summary['low_stock_items'] = low_stock_df[['id', 'name', 'category', 'current_stock', 'reorder_level']].to_dict('records')
-        
-        # Add trending products based on historical sales if available
-        if 'historical_sales' in df.columns and not df['historical_sales'].isna().all():
-            # This would need to be implemented based on your historical_sales data structure
-            # For now, we'll just include a placeholder
-            summary['trending_products'] = []
-    
-    return summary
+    return inventory_summary()
 
 def get_product_details(product_id):
     """Get detailed information about a specific product."""
@@ -87,46 +125,44 @@ def get_product_details(product_id):
     if not product:
         return None
         
-    return product.to_dict()
-
-def get_ollama_insights(query, product_id=None):
-    """Generate insights using Ollama based on user query."""
-    ollama_service = OllamaService(
-        base_url=current_app.config.get('OLLAMA_BASE_URL', 'http://localhost:11434'),
-        model=current_app.config.get('OLLAMA_MODEL', 'llama3')
-    )
-    
-    # Prepare context for the LLM
-    inventory_summary = prepare_inventory_summary()
-    
-    # Add specific product details if provided
-    product_details = None
-    if product_id:
-        product_details = get_product_details(product_id)
-    
-    # Create the system prompt
-    system_prompt = """You are an intelligent inventory management assistant for InventIQ system. 
-    Your role is to provide accurate, helpful insights about inventory data.
-    When asked about low stock items or trending products, always include specific product names and quantities.
-    For restock recommendations, include a 30% buffer for trending or fast-moving products.
-    Be concise but informative."""
-    
-    # Create the user prompt with inventory data
-    user_prompt = f"""Inventory Summary:
-{json.dumps(inventory_summary, indent=2)}
+    details = product.to_dict()
+    details['similar_products'] = similar_products_context(product_id)
+    return details
 
-{"Product Details:\n" + json.dumps(product_details, indent=2) if product_details else ""}
+def _system_prompt():
+    """Instructions plus the current inventory summary."""
+    return f"""{SYSTEM_PROMPT}
 
-User Query: {query}
+Inventory Summary:
+{json.dumps(prepare_inventory_summary(), indent=2)}"""
 
-Provide a helpful response addressing the user's query based on the inventory data provided above."""
-    
-    # Generate response using Ollama
-    insight = ollama_service.generate(
-        prompt=user_prompt,
-        system_prompt=system_prompt,
-        temperature=0.7,
-        max_tokens=500
-    )
-    
+def _question(query, product_id):
+    """The user message for a question, with the details of the product it is about, if any."""
+    product_id = product_id or mentioned_product(query)
+    product_details = get_product_details(product_id) if product_id else None
+    details = f"Product Details:\n{json.dumps(product_details, indent=2)}\n\n" if product_details else ""
+    return f"""{details}User Query: {query}
+
+Provide a helpful response addressing the user's query based on the inventory data provided."""
+
+def prepare_messages(query, product_id=None, session=None):
+    """(question, chat messages) for a query, priming the session first if it needs it.
+
+    With a session the conversation continues: the system prompt and
+    inventory summary it was primed with stay the same, so Ollama only
+    evaluates the new question. Without one every call is a fresh prompt.
+    """
+    question = _question(query, product_id)
+    if session is None:
+        return question, [{'role': 'system', 'content': _system_prompt()}, {'role': 'user', 'content': question}]
+    if needs_priming(session):
+        prime(session, _system_prompt())
+    return question, chat_messages(session, question)
+
+def get_ollama_insights(query, product_id=None, session=None):
+    """Generate insights using Ollama based on user query; the exchange is recorded in the session, if any."""
+    question, messages = prepare_messages(query, product_id, session)
+    insight = OllamaService.from_config(current_app.config).chat(messages)
+    if session is not None:
+        record_turn(session, question, insight)
     return insight
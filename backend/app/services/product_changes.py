@@ -0,0 +1,190 @@
+"""
+Capture product and transaction writes so derived data can follow them.
+
+Every ORM flush is inspected for new, changed and deleted products and for new
+transactions. Registered listeners see the changes twice:
+
+- on_flush listeners run inside the same database transaction, so they can
+  keep tables such as the rollups exactly in step with the write.
+- on_commit listeners run once the transaction has committed, for in-process
+  state (caches, notifications) that must never see a rolled-back write.
+
+Set-based statements (bulk updates/deletes) bypass the ORM, so the code issuing
+them calls record_bulk_change() or record_removal() instead.
+
+Each flush that adds, deletes or edits products also bumps the catalog
+version, so processes that cache the catalog can tell whether a write was the
+next one after their copy (base_version) or whether they missed some. Stock
+and sales history change with every sale and do not bump it: every write
+would queue on the one version row. Caches pick those up from the products'
+updated_at instead (see catalog_snapshot).
+"""
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+PRODUCT_FIELDS = ('id', 'name', 'category', 'supplier', 'current_stock', 'reorder_level',
+                  'purchase_price', 'selling_price', 'lead_time', 'historical_sales')
+
+# Fields every sale changes; changing only these leaves the catalog version alone
+VOLATILE_FIELDS = ('current_stock', 'historical_sales')
+
+# old/new are dicts of PRODUCT_FIELDS; old is None for inserts, new is None for deletes
+ProductChange = namedtuple('ProductChange', ['product_id', 'old', 'new'])
+# history_pending: a sale the sales history write-behind has yet to fold in (see sales_history)
+TransactionRecord = namedtuple('TransactionRecord', ['product_id', 'transaction_type', 'quantity',
+                                                     'transaction_date', 'history_pending'], defaults=(False,))
+
+class ChangeSet:
+    """Product changes and new transactions from one or more flushes."""
+
+    def __init__(self, products=None, transactions=None, bulk=False):
+        self.products = products or []
+        self.transactions = transactions or []
+        self.bulk = bulk
+        # Catalog version before and after these changes; None if no product was added, deleted or edited
+        self.base_version = None
+        self.version = None
+
+    def __bool__(self):
+        return bool(self.products or self.transactions or self.bulk)
+
+    def extend(self, other):
+        self.products.extend(other.products)
+        self.transactions.extend(other.transactions)
+        self.bulk = self.bulk or other.bulk
+        if self.base_version is None:
+            self.base_version = other.base_version
+        if other.version is not None:
+            self.version = other.version
+
+_flush_listeners = []
+_commit_listeners = []
+
+def on_flush(listener):
+    """Register listener(session, changes) to run inside the writing transaction."""
+    _flush_listeners.append(listener)
+    return listener
+
+def on_commit(listener):
+    """Register listener(changes) to run after the writing transaction commits."""
+    # App factories may run more than once per process
+    if listener not in _commit_listeners:
+        _commit_listeners.append(listener)
+    return listener
+
+def product_state(product):
+    """Current values of the tracked product fields."""
+    return {field: getattr(product, field) for field in PRODUCT_FIELDS}
+
+def committed_state(product):
+    """Values of the tracked product fields as last loaded from the database."""
+    state = inspect(product)
+    values = {}
+    for field in PRODUCT_FIELDS:
+        history = state.attrs[field].load_history()
+        if history.deleted:
+            values[field] = history.deleted[0]
+        elif history.unchanged:
+            values[field] = history.unchanged[0]
+        else:
+            values[field] = None
+    return values
+
+def catalog_version(session):
+    from app.models.rollups import CatalogVersion
+
+    return session.execute(select(CatalogVersion.version).where(CatalogVersion.id == 1)).scalar() or 0
+
+def _bump_catalog_version(session):
+    """Increment the catalog version and return the new value."""
+    from app.models.rollups import CatalogVersion
+
+    bump = update(CatalogVersion).where(CatalogVersion.id == 1).values(version=CatalogVersion.version + 1)
+    if session.get_bind().dialect.update_returning:
+        version = session.execute(bump.returning(CatalogVersion.version),
+                                  execution_options={'synchronize_session': False}).scalar()
+    else:
+        session.execute(bump, execution_options={'synchronize_session': False})
+        version = catalog_version(session) or None
+
+    if version is None:
+        session.execute(insert(CatalogVersion).values(id=1, version=1))
+        version = 1
+    return version
+
+def changes_catalog(changes):
+    """Whether the changes go beyond stock and sales history."""
+    if changes.bulk:
+        return True
+    for change in changes.products:
+        if change.old is None or change.new is None:
+            return True
+        if any(change.old[field] != change.new[field] for field in PRODUCT_FIELDS if field not in VOLATILE_FIELDS):
+            return True
+    return False
+
+def publish(session, changes):
+    """Run flush listeners now and queue the changes for the commit listeners."""
+    if changes_catalog(changes):
+        changes.version = _bump_catalog_version(session)
+        changes.base_version = changes.version - 1
+
+    for listener in _flush_listeners:
+        listener(session, changes)
+    session.info.setdefault('product_changes', ChangeSet()).extend(changes)
+
+def record_removal(session, product):
+    """Record a product that is being deleted with a set-based statement."""
+    publish(session, ChangeSet(products=[ProductChange(product.id, committed_state(product), None)]))
+
+def record_bulk_change(session):
+    """Record that set-based statements changed an unknown set of products."""
+    publish(session, ChangeSet(bulk=True))
+
+@event.listens_for(Session, 'before_flush')
+def _capture_changes(session, flush_context, instances):
+    from app.models.inventory import Product, Transaction
+
+    changes = ChangeSet()
+    for obj in session.new:
+        if isinstance(obj, Product):
+            changes.products.append(ProductChange(obj.id, None, product_state(obj)))
+        elif isinstance(obj, Transaction):
+            changes.transactions.append(TransactionRecord(
+                obj.product_id, obj.transaction_type, obj.quantity, obj.transaction_date or datetime.utcnow(),
+                bool(obj.history_pending)))
+
+    for obj in session.dirty:
+        if isinstance(obj, Product) and session.is_modified(obj):
+            old, new = committed_state(obj), product_state(obj)
+            if old != new:
+                changes.products.append(ProductChange(obj.id, old, new))
+
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            changes.products.append(ProductChange(obj.id, committed_state(obj), None))
+
+    if changes:
+        publish(session, changes)
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_committed_changes(session):
+    changes = session.info.pop('product_changes', None)
+    if not changes:
+        return
+
+    for listener in _commit_listeners:
+        try:
+            listener(changes)
+        except Exception as e:
+            # The write is already committed; a broken cache must not fail the request
+            if has_app_context():
+                current_app.logger.error(f"Error in product change listener {listener.__name__}: {str(e)}")
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('product_changes', None)
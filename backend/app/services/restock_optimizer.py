@@ -0,0 +1,207 @@
+"""
+Catalog-wide reorder points, safety stock and economic order quantities.
+
+One NumPy pass over the catalog snapshot: daily demand mean and variability
+come from the sales history, safety stock from the target service level and
+each product's lead time, and order sizes from the EOQ trade-off between the
+cost of placing an order and the cost of holding purchase-priced stock.
+Products that are due are grouped by supplier, and products of the same
+supplier that will be due within the review period ride along on that order.
+
+Demand statistics are cached per catalog and sales-store version, so what-if
+calls with different costs or service levels only redo the arithmetic.
+"""
+import math
+import threading
+import time
+
+from flask import current_app
+
+from app.services.catalog_snapshot import get_catalog_snapshot
+from app.services.ml_service import DEMAND_WINDOW_DAYS, REVIEW_DAYS, SERVICE_LEVEL, safety_stock
+from app.services.sales_store import demand_matrix, get_sales_store
+
+DAYS_PER_YEAR = 365
+
+DEFAULTS = {
+    'service_level': SERVICE_LEVEL,
+    'ordering_cost': 50.0,   # fixed cost of placing one purchase order
+    'holding_rate': 0.25,    # yearly cost of holding stock, as a fraction of its purchase price
+    'review_days': REVIEW_DAYS,
+}
+
+_demand = None
+_demand_key = None
+_lock = threading.Lock()
+
+def _moments(matrix):
+    """Per-row (sum, sum of squares, days since the first sale) of a products x days matrix."""
+    import numpy as np
+
+    sold = matrix > 0
+    # Leading zeros before a product's first sale do not count as days without demand
+    first = np.where(sold.any(axis=1), sold.argmax(axis=1), matrix.shape[1])
+    return (matrix.sum(axis=1, dtype=np.float64), np.square(matrix, dtype=np.float64).sum(axis=1),
+            matrix.shape[1] - first)
+
+def demand_statistics(snapshot, window=DEMAND_WINDOW_DAYS):
+    """(mean, std) daily demand arrays aligned with the snapshot rows."""
+    import numpy as np
+    global _demand, _demand_key
+
+    store = get_sales_store() if current_app.config.get('SALES_STORE_ENABLED', True) else None
+    key = (id(snapshot), snapshot.version, store and (store.directory, store.meta['generation'],
+                                                      store.days, store.products), window)
+    with _lock:
+        if key == _demand_key:
+            return _demand
+
+        totals, squares, days = _moments(demand_matrix(snapshot.ids, window))
+        days = np.maximum(days, 1)
+        mean = totals / days
+        variance = (squares - totals * mean) / np.maximum(days - 1, 1)
+        _demand, _demand_key = (mean, np.sqrt(np.maximum(variance, 0))), key
+        return _demand
+
+def validate_parameters(params):
+    """Merge request parameters over DEFAULTS, raising ValueError for values out of range."""
+    values = dict(DEFAULTS)
+    for name, value in params.items():
+        if name in DEFAULTS and value is not None:
+            values[name] = float(value)
+    if not all(math.isfinite(value) for value in values.values()):
+        raise ValueError('parameters must be finite numbers')
+    values['review_days'] = int(values['review_days'])
+
+    if not 0.5 <= values['service_level'] < 1:
+        raise ValueError('service_level must be at least 0.5 and below 1')
+    if values['ordering_cost'] < 0:
+        raise ValueError('ordering_cost must not be negative')
+    if values['holding_rate'] <= 0:
+        raise ValueError('holding_rate must be positive')
+    if values['review_days'] < 0:
+        raise ValueError('review_days must not be negative')
+    return values
+
+def optimize(snapshot, mean, std, service_level, ordering_cost, holding_rate, review_days):
+    """Reorder policy arrays for every product in the snapshot."""
+    import numpy as np
+
+    lead_time = np.maximum(snapshot.lead_time, 0).astype(np.float64)
+    stock = snapshot.current_stock.astype(np.float64)
+    unit_cost = snapshot.purchase_price
+
+    safety = safety_stock(std, lead_time, service_level)
+    reorder_point = mean * lead_time + safety
+
+    # EOQ = sqrt(2DS / H); products without demand or cost never need a batch
+    annual_demand = mean * DAYS_PER_YEAR
+    holding_cost = holding_rate * unit_cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eoq = np.where(holding_cost > 0, np.sqrt(2 * annual_demand * ordering_cost / holding_cost), 0.0)
+        days_of_cover = np.where(mean > 0, stock / mean, np.inf)
+
+    due = (stock <= reorder_point) & (mean > 0)
+    due_soon = (stock - mean * review_days <= reorder_point) & (mean > 0) & ~due
+
+    # Consolidation: a supplier that gets an order anyway also takes what is due before the next review
+    supplier_due = np.bincount(snapshot.supplier_codes[due], minlength=len(snapshot.suppliers)) > 0
+    ordered = due | (due_soon & supplier_due[snapshot.supplier_codes])
+
+    # Enough to get back above the reorder point for the review period, at least one EOQ batch
+    shortfall = reorder_point + mean * review_days - stock
+    order_quantity = np.where(ordered, np.ceil(np.maximum(eoq, shortfall)), 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ordering = np.where(eoq > 0, ordering_cost * annual_demand / eoq, 0.0)
+
+    return {
+        'daily_demand': mean,
+        'demand_std': std,
+        'safety_stock': safety,
+        'reorder_point': reorder_point,
+        'eoq': eoq,
+        'days_of_cover': days_of_cover,
+        'due': due,
+        'consolidated': ordered & ~due,
+        'order_quantity': order_quantity,
+        'order_value': order_quantity * unit_cost,
+        'annual_holding_cost': holding_cost * (eoq / 2 + safety),
+        'annual_ordering_cost': ordering,
+        'annual_margin': annual_demand * (snapshot.selling_price - unit_cost),
+    }
+
+def _round(value, digits=2):
+    value = float(value)
+    return None if value == float('inf') else round(value, digits)
+
+def optimize_catalog(params=None, supplier=None, items_per_supplier=50):
+    """Reorder policy for the whole catalog, with orders grouped by supplier."""
+    import numpy as np
+
+    started = time.perf_counter()
+    values = validate_parameters(params or {})
+    snapshot = get_catalog_snapshot()
+    mean, std = demand_statistics(snapshot)
+    policy = optimize(snapshot, mean, std, **values)
+
+    codes = snapshot.supplier_codes
+    ordered = policy['order_quantity'] > 0
+    if supplier is not None:
+        ordered &= codes == (snapshot.suppliers.index(supplier) if supplier in snapshot.suppliers else -1)
+
+    count = len(snapshot.suppliers)
+    lines = np.bincount(codes[ordered], minlength=count)
+    units = np.bincount(codes[ordered], weights=policy['order_quantity'][ordered], minlength=count)
+    value = np.bincount(codes[ordered], weights=policy['order_value'][ordered], minlength=count)
+
+    # Most urgent first within each supplier
+    rows = np.flatnonzero(ordered)
+    rows = rows[np.lexsort((policy['days_of_cover'][rows], codes[rows]))]
+    items = {}
+    for row in rows:
+        supplier_items = items.setdefault(int(codes[row]), [])
+        if len(supplier_items) < items_per_supplier:
+            supplier_items.append({
+                'id': snapshot.ids[row],
+                'name': snapshot.names[row],
+                'current_stock': int(snapshot.current_stock[row]),
+                'lead_time': int(snapshot.lead_time[row]),
+                'daily_demand': _round(policy['daily_demand'][row]),
+                'safety_stock': _round(policy['safety_stock'][row], 1),
+                'reorder_point': _round(policy['reorder_point'][row], 1),
+                'eoq': _round(policy['eoq'][row], 1),
+                'order_quantity': int(policy['order_quantity'][row]),
+                'order_value': _round(policy['order_value'][row]),
+                'days_of_cover': _round(policy['days_of_cover'][row], 1),
+                'consolidated': bool(policy['consolidated'][row])
+            })
+
+    suppliers = sorted(({
+        'supplier': snapshot.suppliers[code],
+        'lines': int(lines[code]),
+        'units': int(units[code]),
+        'value': _round(value[code]),
+        'items': items.get(code, [])
+    } for code in np.flatnonzero(lines)), key=lambda order: -order['value'])
+
+    consolidated = policy['consolidated'] & ordered
+    return {
+        'parameters': values,
+        'summary': {
+            'products': snapshot.size,
+            'due': int(np.count_nonzero(policy['due'] & ordered)),
+            'consolidated': int(np.count_nonzero(consolidated)),
+            'purchase_orders': len(suppliers),
+            'order_units': int(units.sum()),
+            'order_value': _round(value.sum()),
+            'safety_stock_value': _round((policy['safety_stock'] * snapshot.purchase_price).sum()),
+            'annual_holding_cost': _round(policy['annual_holding_cost'].sum()),
+            'annual_ordering_cost': _round(policy['annual_ordering_cost'].sum()),
+            'annual_margin': _round(policy['annual_margin'].sum()),
+            # At least one order per supplier that the consolidated lines would have needed on their own
+            'ordering_cost_saved': _round(len(set(codes[consolidated].tolist())) * values['ordering_cost'])
+        },
+        'suppliers': suppliers,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
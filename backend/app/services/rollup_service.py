@@ -0,0 +1,287 @@
+import time
+import weakref
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, delete, func, insert, literal, select, update
+
+from app.extensions import db
+from app.models.inventory import Product, Transaction
+from app.models.rollups import DailySales, LedgerCompaction, StockRollup
+from app.services import product_changes
+from app.services.trend_service import get_trends, refresh_trends, trend_counts, trending_products
+
+# Engines whose rollup tables have been built; until then increments are skipped
+_ready_engines = weakref.WeakSet()
+
+# window -> (expires_at, rows) for the aggregate queries behind the dashboard
+_query_cache = {}
+
+# transaction_type -> DailySales column it adds to
+LEDGER_COLUMNS = {'sale': 'quantity', 'restock': 'restocked'}
+
+ROLLUP_COLUMNS = ['product_count', 'total_units', 'stock_value', 'low_stock_count', 'out_of_stock_count']
+
+def _contribution(state):
+    """Rollup figures one product contributes to each of its rollup keys."""
+    if state is None:
+        return {}
+
+    stock = state['current_stock'] or 0
+    low_stock = 1 if 0 < stock <= (state['reorder_level'] or 0) else 0
+    out_of_stock = 1 if stock == 0 else 0
+    figures = (1, stock, stock * (state['purchase_price'] or 0.0), low_stock, out_of_stock)
+
+    # Catalog totals are summed from the category rows when read, so no single row
+    # is touched by every write
+    return {
+        ('category', state['category']): figures,
+        ('supplier', state['supplier']): figures,
+    }
+
+def _rollups_ready(session):
+    engine = session.get_bind()
+    if engine in _ready_engines:
+        return True
+    if session.execute(select(StockRollup.dimension).where(StockRollup.dimension == 'all')).first():
+        _ready_engines.add(engine)
+        return True
+    return False
+
+def _increment(session, model, keys, values):
+    """Add values to a row, creating it if it does not exist yet."""
+    conditions = [getattr(model, column) == value for column, value in keys.items()]
+    increments = {column: getattr(model, column) + amount for column, amount in values.items()}
+    if model is StockRollup:
+        increments['updated_at'] = datetime.utcnow()
+
+    result = session.execute(update(model).where(*conditions).values(increments),
+                             execution_options={'synchronize_session': False})
+    if result.rowcount == 0:
+        session.execute(insert(model).values({**keys, **values}))
+
+@product_changes.on_flush
+def apply_changes(session, changes):
+    """Keep stock rollups and daily sales in step with each write."""
+    # Sales and restocks are summed per product and day before touching the table
+    daily = defaultdict(lambda: {'quantity': 0, 'restocked': 0})
+    for record in changes.transactions:
+        column = LEDGER_COLUMNS.get(record.transaction_type)
+        if column:
+            daily[(record.product_id, record.transaction_date.date())][column] += record.quantity
+    for (product_id, sales_date), values in daily.items():
+        _increment(session, DailySales, {'product_id': product_id, 'sales_date': sales_date}, values)
+
+    if changes.bulk:
+        rebuild_stock_rollups(session)
+        return
+
+    deltas = defaultdict(lambda: [0, 0, 0.0, 0, 0])
+    for change in changes.products:
+        for key, figures in _contribution(change.old).items():
+            for i, value in enumerate(figures):
+                deltas[key][i] -= value
+        for key, figures in _contribution(change.new).items():
+            for i, value in enumerate(figures):
+                deltas[key][i] += value
+
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas or not _rollups_ready(session):
+        return
+
+    for (dimension, key), delta in deltas.items():
+        _increment(session, StockRollup, {'dimension': dimension, 'key': key}, dict(zip(ROLLUP_COLUMNS, delta)))
+
+def rebuild_stock_rollups(session):
+    """Recompute every stock rollup from the products table."""
+    low_stock = case((and_(Product.current_stock > 0, Product.current_stock <= Product.reorder_level), 1), else_=0)
+    out_of_stock = case((Product.current_stock == 0, 1), else_=0)
+    now = datetime.utcnow()
+
+    session.execute(delete(StockRollup), execution_options={'synchronize_session': False})
+    # The 'all' row only marks the tables as built; writes never update it
+    session.execute(insert(StockRollup).values(dimension='all', key='', updated_at=now))
+    for dimension, column in (('category', Product.category), ('supplier', Product.supplier)):
+        query = select(
+            literal(dimension),
+            column,
+            func.count(Product.id),
+            func.coalesce(func.sum(Product.current_stock), 0),
+            func.coalesce(func.sum(Product.current_stock * Product.purchase_price), 0.0),
+            func.coalesce(func.sum(low_stock), 0),
+            func.coalesce(func.sum(out_of_stock), 0),
+            literal(now),
+        ).group_by(column)
+        session.execute(insert(StockRollup).from_select(
+            ['dimension', 'key'] + ROLLUP_COLUMNS + ['updated_at'], query))
+
+    _ready_engines.add(session.get_bind())
+
+def compaction_watermark(session):
+    """First day whose raw transactions are still kept, or None if nothing was compacted."""
+    return session.execute(select(func.max(LedgerCompaction.compacted_before))).scalar()
+
+def rebuild_daily_sales(session, start=None, end=None):
+    """Recompute daily sales from the transactions table for days in [start, end).
+
+    Days before the compaction watermark have no raw transactions left, so they are never rebuilt.
+    """
+    watermark = compaction_watermark(session)
+    if watermark and (start is None or start < watermark):
+        start = watermark
+
+    sales_date = func.date(Transaction.transaction_date)
+    sold = func.sum(case((Transaction.transaction_type == 'sale', Transaction.quantity), else_=0))
+    restocked = func.sum(case((Transaction.transaction_type == 'restock', Transaction.quantity), else_=0))
+    query = (
+        select(Transaction.product_id, sales_date, sold, restocked)
+        .where(Transaction.transaction_type.in_(LEDGER_COLUMNS))
+        .group_by(Transaction.product_id, sales_date)
+    )
+    stale = delete(DailySales)
+    if start:
+        query = query.where(Transaction.transaction_date >= datetime.combine(start, datetime.min.time()))
+        stale = stale.where(DailySales.sales_date >= start)
+    if end:
+        query = query.where(Transaction.transaction_date < datetime.combine(end, datetime.min.time()))
+        stale = stale.where(DailySales.sales_date < end)
+
+    session.execute(stale, execution_options={'synchronize_session': False})
+    session.execute(insert(DailySales).from_select(['product_id', 'sales_date', 'quantity', 'restocked'], query))
+
+def rebuild_rollups():
+    """Rebuild all rollup tables and commit."""
+    rebuild_stock_rollups(db.session)
+    rebuild_daily_sales(db.session)
+    db.session.commit()
+
+def _cached(name, query_function):
+    """Serve an aggregate query from a short-lived in-process cache."""
+    ttl = current_app.config.get('DASHBOARD_CACHE_SECONDS', 30)
+    entry = _query_cache.get(name)
+    if entry and entry[0] > time.monotonic() and entry[1] is db.engine:
+        return entry[2]
+
+    result = query_function()
+    if ttl > 0:
+        _query_cache[name] = (time.monotonic() + ttl, db.engine, result)
+    return result
+
+def get_top_movers(days, limit=5):
+    """Best-selling products over the last `days` days."""
+    def query():
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        units = func.sum(DailySales.quantity).label('units')
+        rows = db.session.execute(
+            select(Product.id, Product.name, Product.category, units)
+            .join(Product, Product.id == DailySales.product_id)
+            .where(DailySales.sales_date >= since)
+            .group_by(Product.id, Product.name, Product.category)
+            .having(units > 0)
+            .order_by(units.desc())
+            .limit(limit)
+        ).all()
+        return [{'id': r.id, 'name': r.name, 'category': r.category, 'unitsSold': int(r.units)} for r in rows]
+
+    return _cached(f'top_movers:{days}:{limit}', query)
+
+def _load_rollups():
+    """All stock rollup rows, building the tables on first use."""
+    rollups = StockRollup.query.all()
+    if not any(r.dimension == 'all' for r in rollups):
+        rebuild_rollups()
+        rollups = StockRollup.query.all()
+    return rollups
+
+def _catalog_totals(rollups):
+    """Catalog-wide figures summed from the category rollups."""
+    categories = [r for r in rollups if r.dimension == 'category']
+    totals = {column: sum(getattr(r, column) for r in categories) for column in ROLLUP_COLUMNS}
+    totals['updated_at'] = max((r.updated_at for r in categories if r.updated_at), default=None)
+    return totals
+
+def get_dashboard_summary():
+    """Dashboard figures read from the stock rollups."""
+    rollups = _load_rollups()
+    totals = _catalog_totals(rollups)
+    categories = sorted((r for r in rollups if r.dimension == 'category' and r.product_count), key=lambda r: r.key)
+    suppliers = sorted((r for r in rollups if r.dimension == 'supplier' and r.product_count), key=lambda r: r.key)
+
+    return {
+        'totalProducts': totals['product_count'],
+        'lowStockItems': totals['low_stock_count'],
+        'outOfStockItems': totals['out_of_stock_count'],
+        'totalCategories': len(categories),
+        'totalSuppliers': len(suppliers),
+        'totalUnits': totals['total_units'],
+        'stockValue': round(totals['stock_value'], 2),
+        'categories': [r.to_dict() for r in categories],
+        'suppliers': [r.to_dict() for r in suppliers],
+        'topMovers': {str(days): get_top_movers(days) for days in (7, 30, 90)},
+        'updatedAt': totals['updated_at'].isoformat() if totals['updated_at'] else None
+    }
+
+def _percent_change(recent, previous):
+    if not previous:
+        return 100 if recent else 0
+    return round((recent - previous) / previous * 100)
+
+def get_trend_summary(limit=5):
+    """Sales trends: per-product trends from the trend engine, daily and category totals over the last 7 days."""
+    def query():
+        today = datetime.utcnow().date()
+        recent_start = today - timedelta(days=6)
+        previous_start = today - timedelta(days=13)
+        in_recent = DailySales.sales_date >= recent_start
+        recent = func.coalesce(func.sum(case((in_recent, DailySales.quantity), else_=0)), 0)
+        previous = func.coalesce(func.sum(case((in_recent, 0), else_=DailySales.quantity)), 0)
+
+        refresh_trends()
+        counts = trend_counts()
+        movers = get_top_movers(30, limit)
+        trends = get_trends([mover['id'] for mover in movers])
+        top_selling = [{
+            'id': mover['id'],
+            'name': mover['name'],
+            'category': mover['category'],
+            'avgSales': round(mover['unitsSold'] / 30, 2),
+            'trend': trends[mover['id']]['trend'],
+            'trendPercentage': abs(_percent_change(trends[mover['id']]['recent_mean'],
+                                                   trends[mover['id']]['baseline_mean']))
+        } for mover in movers]
+
+        daily_rows = db.session.execute(
+            select(DailySales.sales_date, func.sum(DailySales.quantity))
+            .where(in_recent)
+            .group_by(DailySales.sales_date)
+        ).all()
+        daily_totals = {str(sales_date): int(total) for sales_date, total in daily_rows}
+        sales_trend = []
+        for offset in range(6, -1, -1):
+            day = str(today - timedelta(days=offset))
+            sales_trend.append({'date': day, 'sales': daily_totals.get(day, 0)})
+
+        category_rows = db.session.execute(
+            select(Product.category, recent.label('recent'), previous.label('previous'))
+            .join(Product, Product.id == DailySales.product_id)
+            .where(DailySales.sales_date >= previous_start)
+            .group_by(Product.category)
+        ).all()
+        category_trends = [{'category': r.category, 'trend': _percent_change(r.recent, r.previous)}
+                           for r in category_rows]
+
+        return {
+            'topSellingProducts': top_selling,
+            'salesTrend': sales_trend,
+            'categoryTrends': category_trends,
+            'trendingUp': counts['up'],
+            'trendingDown': counts['down'],
+            'trendingProducts': trending_products(limit),
+            'decliningProducts': trending_products(limit, direction='down'),
+        }
+
+    summary = dict(_cached(f'trends:{limit}', query))
+    total_products = _catalog_totals(_load_rollups())['product_count']
+    summary['stableProducts'] = total_products - summary['trendingUp'] - summary['trendingDown']
+    return summary
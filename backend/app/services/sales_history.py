@@ -0,0 +1,192 @@
+"""
+Write-behind for the sales history kept on each product.
+
+Recording a sale used to rewrite the product's whole historical_sales JSON
+to bump one day's count. Now the sale's Transaction row is written with
+history_pending set, and each process buffers the ids of its committed
+sales and folds them into historical_sales in one batched transaction,
+coalesced per product and day, every SALES_HISTORY_FLUSH_MS or once
+SALES_HISTORY_FLUSH_EVENTS sales are waiting.
+
+The transactions table is the durable log. A flush claims its rows by
+clearing history_pending with UPDATE ... RETURNING, so a sale is folded in
+exactly once however flushes, replays and workers overlap. Sales a crashed
+worker never flushed stay pending. The next flush in any worker picks them
+up once they are SALES_HISTORY_REPLAY_SECONDS old (an idle worker still
+sweeps for them that often), and startup replays them all. The buffer is
+flushed on exit too. Since the rows are the log, a failed flush only keeps
+one flush's worth of ids to retry; older ones are left to the sweep.
+
+historical_sales (forecasts, trends, similarity) and the sales store, which
+is appended what each flush folded in, lag by up to one flush interval. The
+ledger and rollups follow the Transaction rows and see a sale as soon as it
+commits.
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, select, update
+
+from app.extensions import db
+from app.models.inventory import Product, Transaction
+from app.services.ml_service import add_to_sales_history
+from app.services.sales_store import append_folded_sales
+from app.utils.instrumentation import metrics
+
+# Transaction ids per claiming UPDATE, to keep its IN (...) list bounded
+CLAIM_CHUNK = 500
+
+def write_behind_enabled():
+    return current_app.config.get('SALES_HISTORY_WRITE_BEHIND', True)
+
+def apply_pending_sales(session, ids=None, older_than=None, folded=None):
+    """Fold pending sales into historical_sales in the session's transaction (not committed); returns how many.
+
+    ids limits it to those transactions, plus any pending since before
+    older_than; without ids every pending sale is folded in. folded, a dict,
+    collects {(product_id, date): quantity} for the sales store to append
+    once the transaction commits.
+    """
+    if ids is None:
+        claims = [None]
+    else:
+        ids = list(ids)
+        claims = [Transaction.id.in_(ids[start:start + CLAIM_CHUNK]) for start in range(0, len(ids), CLAIM_CHUNK)]
+        if older_than is not None:
+            claims.append(Transaction.transaction_date < older_than)
+
+    claimed = []
+    for claim in claims:
+        condition = Transaction.history_pending.is_(True)
+        if claim is not None:
+            condition = and_(condition, claim)
+        claimed += session.execute(
+            update(Transaction).where(condition).values(history_pending=False)
+            .returning(Transaction.product_id, Transaction.transaction_date, Transaction.quantity),
+            execution_options={'synchronize_session': False}
+        ).all()
+    if not claimed:
+        return 0
+
+    sales = {}
+    for product_id, transaction_date, quantity in claimed:
+        key = (product_id, transaction_date.date())
+        sales[key] = sales.get(key, 0) + quantity
+    # Locked so no other write of historical_sales lands in between, in id order so concurrent flushes cannot deadlock
+    products = session.execute(
+        select(Product).where(Product.id.in_({product_id for product_id, _ in sales}))
+        .order_by(Product.id).with_for_update()
+    ).scalars()
+    products = {product.id: product for product in products}
+    for (product_id, day), quantity in sorted(sales.items()):
+        if product_id in products:
+            products[product_id].historical_sales = add_to_sales_history(
+                products[product_id].historical_sales, quantity, day)
+    if folded is not None:
+        for key, quantity in sales.items():
+            folded[key] = folded.get(key, 0) + quantity
+    return len(claimed)
+
+def replay_pending_sales(session):
+    """Fold in every sale left pending (by a crash or a kill) and commit; run at startup."""
+    folded = {}
+    replayed = apply_pending_sales(session, folded=folded)
+    session.commit()
+    append_folded_sales(folded)
+    if replayed:
+        current_app.logger.info(f"Replayed {replayed} pending sales into the sales history")
+    return replayed
+
+class SalesHistoryBuffer:
+    """Ids of this process's committed sales that historical_sales does not include yet."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = []
+        self._app = None
+        self._wake = threading.Event()
+        self._pid = None
+        self._exit_registered = False
+        # When a flush last swept for other workers' stale pending sales
+        self._swept_at = 0.0
+
+    def add(self, transaction_id):
+        """Queue a committed sale (its Transaction written with history_pending) for the next flush."""
+        app = current_app._get_current_object()
+        with self._lock:
+            self._ids.append(transaction_id)
+            self._app = app
+            # Threads do not survive a fork, so each worker starts its own
+            if self._pid != os.getpid():
+                self._start(app)
+            if len(self._ids) >= app.config.get('SALES_HISTORY_FLUSH_EVENTS', 200):
+                self._wake.set()
+
+    def _start(self, app):
+        self._pid = os.getpid()
+        self._wake = threading.Event()
+        interval = app.config.get('SALES_HISTORY_FLUSH_MS', 500) / 1000.0
+        threading.Thread(target=self._run, args=(interval,), name='sales-history-flush', daemon=True).start()
+        if not self._exit_registered:
+            atexit.register(self.flush)
+            self._exit_registered = True
+
+    def _run(self, interval):
+        wake = self._wake
+        while True:
+            wake.wait(interval)
+            wake.clear()
+            self.flush()
+
+    def pending(self):
+        with self._lock:
+            return len(self._ids)
+
+    def flush(self):
+        """Fold the buffered sales (and any stale pending ones) into historical_sales; returns how many.
+
+        With nothing buffered it still sweeps for stale sales, at most once
+        every SALES_HISTORY_REPLAY_SECONDS.
+        """
+        with self._lock:
+            ids, self._ids = self._ids, []
+            app = self._app
+        if app is None:
+            return 0
+        replay_after = timedelta(seconds=app.config.get('SALES_HISTORY_REPLAY_SECONDS', 60))
+        if not ids and time.monotonic() - self._swept_at < replay_after.total_seconds():
+            return 0
+        self._swept_at = time.monotonic()
+
+        with app.app_context():
+            started = time.perf_counter()
+            folded = {}
+            try:
+                flushed = apply_pending_sales(db.session, ids, older_than=datetime.utcnow() - replay_after,
+                                              folded=folded)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                # The rows are still pending: the next flush retries the newest flush's worth, the sweep the rest
+                retry = ids[-app.config.get('SALES_HISTORY_FLUSH_EVENTS', 200):]
+                with self._lock:
+                    self._ids[:0] = retry
+                app.logger.error(f"Error flushing sales history: {str(e)}")
+                return 0
+            finally:
+                db.session.remove()
+            try:
+                append_folded_sales(folded)
+            except Exception as e:
+                # Committed all the same; a rebuild of the store picks these up
+                app.logger.error(f"Error appending flushed sales to the sales store: {str(e)}")
+            metrics.observe('inventiq_sales_history_flush_seconds', time.perf_counter() - started)
+            metrics.inc('inventiq_sales_history_flushed_total', flushed)
+            return flushed
+
+# One per process; gunicorn's worker_exit flushes it as well as atexit
+buffer = SalesHistoryBuffer()
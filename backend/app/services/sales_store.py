@@ -0,0 +1,433 @@
+"""
+Memory-mapped sales history: one int32 row per product, one column per calendar day.
+
+Files in the store directory:
+
+- meta.json         start date, used and allocated sizes, and the current generation
+- ids.<gen>.bin     product ids (fixed width), in matrix row order
+- sales.<gen>.i32   the products x days matrix, row-major, zero-filled headroom
+
+Every worker maps the same files read-only, so histories are shared through the
+page cache instead of each process parsing them out of JSON. Committed sales are
+added in place under a file lock, in batches: the sales history write-behind
+appends what each of its flushes folded in (sales recorded inline are appended
+as they commit). meta.json is only rewritten when products or days are added.
+Readers then take in the new rows without reopening, and only reopen when
+running out of headroom has rewritten the files under a new generation.
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models.inventory import Product
+from app.services.ml_service import parse_sales_history
+
+try:
+    import fcntl
+except ImportError:  # Windows: the thread lock below still covers a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ID_WIDTH = 10  # Product.id is String(10)
+DAY_HEADROOM = 90
+PRODUCT_HEADROOM = 1024
+
+_thread_lock = threading.Lock()
+
+# (directory, meta mtime) of the open SalesStore, so readers only look at meta.json after a change
+_open_store = None
+_open_stamp = None
+_open_lock = threading.Lock()
+
+# (directory, generation) -> {product id: row} for writers, extended as rows are added
+_writer_rows = {}
+
+def _meta_path(directory):
+    return os.path.join(directory, 'meta.json')
+
+def _data_paths(directory, generation):
+    return (os.path.join(directory, f'ids.{generation}.bin'),
+            os.path.join(directory, f'sales.{generation}.i32'))
+
+def _read_meta(directory):
+    try:
+        with open(_meta_path(directory)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_meta(directory, meta):
+    temp_path = _meta_path(directory) + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(temp_path, _meta_path(directory))
+
+@contextmanager
+def _locked(directory):
+    """Serialize writers across threads and processes."""
+    os.makedirs(directory, exist_ok=True)
+    with _thread_lock, open(os.path.join(directory, 'lock'), 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _map(directory, meta, mode):
+    import numpy as np
+
+    ids_path, sales_path = _data_paths(directory, meta['generation'])
+    ids = np.memmap(ids_path, dtype=f'S{ID_WIDTH}', mode=mode, shape=(meta['product_capacity'],))
+    matrix = np.memmap(sales_path, dtype=np.int32, mode=mode,
+                       shape=(meta['product_capacity'], meta['day_capacity']))
+    return ids, matrix
+
+def _remove_generation(directory, generation):
+    for path in _data_paths(directory, generation):
+        try:
+            os.remove(path)
+        except OSError:
+            # Still mapped somewhere on Windows; the next rebuild will not reuse the name
+            pass
+
+class SalesStore:
+    """Read-only view of the store as of one meta.json."""
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.start = date.fromisoformat(meta['start'])
+        self.days = meta['days']
+        self.products = meta['products']
+        self._ids, self._matrix = _map(directory, meta, 'r')
+        self._index = None
+        self._indexed = 0
+        self._index_lock = threading.Lock()
+
+    def follow(self, meta):
+        """Take in the rows and days another process added to this generation."""
+        self.meta = meta
+        self.days = meta['days']
+        self.products = meta['products']
+
+    @property
+    def end(self):
+        """Last day with a column in use."""
+        return self.start + timedelta(days=self.days - 1)
+
+    @property
+    def index(self):
+        if self._index is None or self._indexed < self.products:
+            with self._index_lock:
+                products = self.products
+                index = self._index if self._index is not None else {}
+                index.update((product_id.decode(), row) for row, product_id
+                             in enumerate(self._ids[self._indexed:products], start=self._indexed))
+                self._index, self._indexed = index, products
+        return self._index
+
+    @property
+    def ids(self):
+        return [product_id.decode() for product_id in self._ids[:self.products]]
+
+    def column(self, day):
+        return (day - self.start).days
+
+    def matrix(self, days=None, end=None):
+        """products x days view ending on `end` (default today), zero-copy while within capacity."""
+        import numpy as np
+
+        end = end or datetime.utcnow().date()
+        stop = self.column(end) + 1
+        start = max(stop - days, 0) if days else 0
+        if stop <= self._matrix.shape[1]:
+            return self._matrix[:self.products, start:stop]
+
+        # Past the allocated columns: no sales were recorded there, pad with zeros
+        view = self._matrix[:self.products, start:]
+        padding = np.zeros((self.products, stop - start - view.shape[1]), dtype=np.int32)
+        return np.hstack([view, padding])
+
+    def history(self, product_id, days=None, end=None):
+        """One product's daily sales ending on `end`, or None if the product has no row."""
+        row = self.index.get(product_id)
+        if row is None:
+            return None
+        return self.matrix(days, end)[row]
+
+def store_directory():
+    """Configured store directory; relative paths live in the instance folder."""
+    directory = current_app.config.get('SALES_STORE_DIR', 'sales_store')
+    return directory if os.path.isabs(directory) else os.path.join(current_app.instance_path, directory)
+
+def get_sales_store(directory=None):
+    """Open (or reuse) the store for reading; None if it has not been built."""
+    global _open_store, _open_stamp
+
+    directory = directory or store_directory()
+    try:
+        stamp = (directory, os.stat(_meta_path(directory)).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+    if stamp != _open_stamp:
+        with _open_lock:
+            if stamp != _open_stamp:
+                meta = _read_meta(directory)
+                if meta is None:
+                    return None
+                if (_open_store is not None and _open_store.directory == directory
+                        and _open_store.meta['generation'] == meta['generation']):
+                    _open_store.follow(meta)
+                else:
+                    _open_store = SalesStore(directory, meta)
+                _open_stamp = stamp
+    return _open_store
+
+def demand_matrix(ids, days, histories=None):
+    """products x days int32 sales ending today for the given product ids.
+
+    Read from the sales store when it is enabled and built. Otherwise each
+    product's historical_sales is placed on the calendar by product_history,
+    days without sales left at zero; `histories` ({id: (JSON, created_at)})
+    is used when given, else the products are loaded from the database.
+    """
+    import numpy as np
+
+    store = get_sales_store() if current_app.config.get('SALES_STORE_ENABLED', True) else None
+    matrix = np.zeros((len(ids), days), dtype=np.int32)
+    if store is not None:
+        source = store.matrix(days)
+        rows = np.array([store.index.get(product_id, -1) for product_id in ids], dtype=np.int64)
+        known = rows >= 0
+        matrix[known, days - source.shape[1]:] = source[rows[known]]
+        return matrix
+
+    if histories is None:
+        query = select(Product.id, Product.historical_sales, Product.created_at)
+        if len(ids) <= 500:  # a handful of products: fetch just those
+            query = query.where(Product.id.in_(ids))
+        histories = db.session.execute(query.execution_options(yield_per=5000))
+    else:
+        histories = ((product_id, historical_sales, created_at)
+                     for product_id, (historical_sales, created_at) in histories.items())
+
+    rows = {product_id: row for row, product_id in enumerate(ids)}
+    first_day = datetime.utcnow().date().toordinal() - days + 1
+    for product_id, historical_sales, created_at in histories:
+        row = rows.get(product_id)
+        if row is None:
+            continue
+        for day, quantity in product_history(historical_sales, created_at).items():
+            if first_day <= day < first_day + days:
+                matrix[row, day - first_day] = quantity
+    return matrix
+
+def _legacy_anchor(keys, created_at):
+    """Day after the last legacy 'Day-N' entry: creation date or first dated entry, whichever is earlier."""
+    anchor = created_at.date() if created_at else datetime.utcnow().date()
+    for key in keys:
+        if not key.startswith('Day-'):
+            anchor = min(anchor, date.fromisoformat(key))
+            break
+    return anchor
+
+def product_history(historical_sales, created_at=None):
+    """{date ordinal: quantity} for one product's historical_sales JSON.
+
+    Legacy 'Day-N' histories carry no dates; they are taken to be the days
+    leading up to the product's creation (or its first dated entry).
+    """
+    entries = parse_sales_history(historical_sales)
+    anchor = _legacy_anchor([key for key, _ in entries], created_at).toordinal()
+    legacy = [int(key[4:]) for key, _ in entries if key.startswith('Day-')]
+    last_legacy = max(legacy, default=0)
+
+    history = {}
+    for key, quantity in entries:
+        if key.startswith('Day-'):
+            ordinal = anchor - 1 - (last_legacy - int(key[4:]))
+        else:
+            ordinal = date.fromisoformat(key).toordinal()
+        history[ordinal] = history.get(ordinal, 0) + int(quantity)
+    return history
+
+def _allocate(directory, meta, ids, fill=None):
+    """Write a new generation of data files, point meta.json at it and drop the old one."""
+    import numpy as np
+
+    previous = _read_meta(directory)
+    meta['generation'] = (previous['generation'] + 1) if previous else 1
+
+    ids_path, sales_path = _data_paths(directory, meta['generation'])
+    new_ids = np.memmap(ids_path, dtype=f'S{ID_WIDTH}', mode='w+', shape=(meta['product_capacity'],))
+    matrix = np.memmap(sales_path, dtype=np.int32, mode='w+',
+                       shape=(meta['product_capacity'], meta['day_capacity']))
+    new_ids[:len(ids)] = ids
+    if fill:
+        fill(matrix)
+    new_ids.flush()
+    matrix.flush()
+    del new_ids, matrix
+
+    _write_meta(directory, meta)
+    if previous:
+        _remove_generation(directory, previous['generation'])
+
+def rebuild_sales_store(session, directory=None, chunk_size=5000):
+    """Rebuild the whole store from the products' historical_sales."""
+    directory = directory or store_directory()
+    query = select(Product.id, Product.historical_sales, Product.created_at).order_by(Product.id)
+
+    # First pass finds the date range, second fills rows, so memory stays flat
+    today = datetime.utcnow().date().toordinal()
+    first_day, last_day, ids = today, today, []
+    for chunk in session.execute(query.execution_options(yield_per=chunk_size)).partitions():
+        for product_id, historical_sales, created_at in chunk:
+            history = product_history(historical_sales, created_at)
+            if history:
+                first_day, last_day = min(first_day, min(history)), max(last_day, max(history))
+            ids.append(product_id)
+
+    rows = {product_id: row for row, product_id in enumerate(ids)}
+
+    def fill(matrix):
+        for chunk in session.execute(query.execution_options(yield_per=chunk_size)).partitions():
+            for product_id, historical_sales, created_at in chunk:
+                row = rows.get(product_id)
+                if row is None:
+                    continue  # added after the first pass; picked up by its first sale
+                for ordinal, quantity in product_history(historical_sales, created_at).items():
+                    matrix[row, ordinal - first_day] = quantity
+
+    days = last_day - first_day + 1
+    meta = {
+        'start': date.fromordinal(first_day).isoformat(),
+        'days': days,
+        'day_capacity': days + DAY_HEADROOM,
+        'products': len(ids),
+        'product_capacity': len(ids) + PRODUCT_HEADROOM,
+    }
+    with _locked(directory):
+        _allocate(directory, meta, [product_id.encode() for product_id in ids], fill)
+    return meta
+
+def _grow(directory, meta, products, day_column):
+    """Copy the store into files large enough for `products` rows and `day_column`."""
+    old_ids, old_matrix = _map(directory, meta, 'r')
+    grown = dict(meta)
+    grown['product_capacity'] = max(meta['product_capacity'], products + PRODUCT_HEADROOM)
+    grown['day_capacity'] = max(meta['day_capacity'], day_column + 1 + DAY_HEADROOM)
+
+    def fill(matrix):
+        matrix[:meta['products'], :meta['days']] = old_matrix[:meta['products'], :meta['days']]
+
+    _allocate(directory, grown, old_ids[:meta['products']], fill)
+    return grown
+
+def _rows(directory, meta):
+    """Writers' {product id: row} for meta's generation, decoding only the ids added since the last call."""
+    global _writer_rows
+
+    key = (directory, meta['generation'])
+    rows = _writer_rows.get(key)
+    if rows is None:
+        rows = {}
+        _writer_rows = {key: rows}
+    if len(rows) < meta['products']:
+        import numpy as np
+
+        ids_path, _ = _data_paths(directory, meta['generation'])
+        ids = np.memmap(ids_path, dtype=f'S{ID_WIDTH}', mode='r', shape=(meta['product_capacity'],))
+        for row in range(len(rows), meta['products']):
+            rows[ids[row].decode()] = row
+    return rows
+
+def add_sales(sales, directory=None):
+    """Add {(product_id, date): quantity} to the store; new products get a row."""
+    global _writer_rows
+
+    directory = directory or store_directory()
+    with _locked(directory):
+        meta = _read_meta(directory)
+        if meta is None:
+            return False  # not built yet; the rebuild will read these from the database
+
+        start = date.fromisoformat(meta['start'])
+        rows = _rows(directory, meta)
+        new_ids = []
+        for product_id, _ in sales:
+            if product_id not in rows and product_id not in new_ids:
+                new_ids.append(product_id)
+
+        columns = {day: (day - start).days for _, day in sales}
+        if any(column < 0 for column in columns.values()):
+            logger.warning("Sales before %s are not in the store until it is rebuilt", start)
+        last_column = max(columns.values(), default=0)
+        products = meta['products'] + len(new_ids)
+        grown = products > meta['product_capacity'] or last_column >= meta['day_capacity']
+        if grown:
+            meta = _grow(directory, meta, products, last_column)
+            # Rows keep their numbers in the new generation
+            _writer_rows = {(directory, meta['generation']): rows}
+
+        ids, matrix = _map(directory, meta, 'r+')
+        for offset, product_id in enumerate(new_ids):
+            ids[meta['products'] + offset] = product_id.encode()
+        new_rows = {product_id: meta['products'] + offset for offset, product_id in enumerate(new_ids)}
+        for (product_id, day), quantity in sales.items():
+            if columns[day] >= 0:
+                matrix[rows.get(product_id, new_rows.get(product_id)), columns[day]] += quantity
+        ids.flush()
+        matrix.flush()
+        rows.update(new_rows)
+
+        days = max(meta['days'], last_column + 1)
+        if grown or new_ids or days != meta['days']:
+            meta['products'] = products
+            meta['days'] = days
+            _write_meta(directory, meta)
+        return True
+
+def append_folded_sales(sales):
+    """Add sales the write-behind folded into historical_sales (after its commit)."""
+    if sales and current_app.config.get('SALES_STORE_ENABLED', True):
+        add_sales(sales)
+
+def append_committed_sales(changes):
+    """Keep the store in step with committed sales and new products.
+
+    Registered with product_changes by the app factory. Sales left pending
+    for the write-behind are appended by its flush instead, a batch at a time.
+    """
+    if not has_app_context() or not current_app.config.get('SALES_STORE_ENABLED', True):
+        return
+
+    sales = {}
+    for record in changes.transactions:
+        if record.transaction_type == 'sale' and not record.history_pending:
+            key = (record.product_id, record.transaction_date.date())
+            sales[key] = sales.get(key, 0) + record.quantity
+    for change in changes.products:
+        if change.old is None and change.new is not None:
+            for ordinal, quantity in product_history(change.new['historical_sales']).items():
+                key = (change.product_id, date.fromordinal(ordinal))
+                sales[key] = sales.get(key, 0) + quantity
+
+    if sales:
+        add_sales(sales)
+
+def ensure_sales_store(session):
+    """Build the store on first start."""
+    if current_app.config.get('SALES_STORE_ENABLED', True) and _read_meta(store_directory()) is None:
+        rebuild_sales_store(session)
@@ -0,0 +1,188 @@
+"""
+Product search backed by an SQLite FTS5 index.
+
+product_search is an external-content FTS5 table over the id, name, category
+and supplier columns of products: it stores only the inverted index and
+reads the text from products itself. Triggers on products keep it in step
+with every write, including set-based bulk statements that bypass the ORM.
+Updates of stock and prices do not touch it.
+
+The index is keyed on products.search_rowid, which the insert trigger sets
+once, rather than on the rowid: products has a string primary key, so VACUUM
+is free to renumber its rowids and would leave the index pointing at other
+products.
+
+Each search term is matched as a prefix ("blu cha" finds "Blue Chair"), and
+results are ranked by where the terms matched, the id and name counting
+most, then by name length. This is cheaper than FTS5's bm25(), whose
+document frequencies cost a pass over every posting of each term (most of
+the catalog for "supplier"), and for short catalog fields ranks much the
+same. Databases without FTS5 fall back to LIKE matching.
+"""
+import re
+
+from sqlalchemy import case, column, func, literal, select, table, text
+
+from app.extensions import db
+from app.models.inventory import Product
+
+SEARCH_TABLE = 'product_search'
+SEARCH_COLUMNS = ('id', 'name', 'category', 'supplier')
+# What a term starting a word in each column adds to a match's relevance
+COLUMN_WEIGHTS = (10, 5, 2, 1)
+MAX_TERMS = 8
+# Matches ranked per query; beyond this they follow in index order
+RANK_CANDIDATES = 2000
+# Matches counted at most; past this the total is a lower bound
+COUNT_LIMIT = 10000
+
+_FTS_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        id, name, category, supplier,
+        content='products', content_rowid='search_rowid',
+        tokenize="unicode61 remove_diacritics 2", prefix='1 2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_insert AFTER INSERT ON products BEGIN
+        UPDATE products SET search_rowid = (SELECT coalesce(max(search_rowid), 0) + 1 FROM products)
+        WHERE rowid = new.rowid AND search_rowid IS NULL;
+        INSERT INTO {SEARCH_TABLE} (rowid, id, name, category, supplier)
+        SELECT search_rowid, id, name, category, supplier FROM products WHERE rowid = new.rowid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_delete AFTER DELETE ON products BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, id, name, category, supplier)
+        VALUES ('delete', old.search_rowid, old.id, old.name, old.category, old.supplier);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS products_search_update AFTER UPDATE OF id, name, category, supplier
+        ON products BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, id, name, category, supplier)
+        VALUES ('delete', old.search_rowid, old.id, old.name, old.category, old.supplier);
+        INSERT INTO {SEARCH_TABLE} (rowid, id, name, category, supplier)
+        VALUES (new.search_rowid, new.id, new.name, new.category, new.supplier);
+    END""",
+]
+_FTS_TRIGGERS = ('products_search_insert', 'products_search_delete', 'products_search_update')
+
+def fts_available(session):
+    """True when the database is SQLite built with FTS5."""
+    if session.get_bind().dialect.name != 'sqlite':
+        return False
+    options = session.execute(text('PRAGMA compile_options')).scalars().all()
+    return 'ENABLE_FTS5' in options
+
+def _index_sql(session):
+    return session.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': SEARCH_TABLE}
+    ).scalar()
+
+def _index_exists(session):
+    return _index_sql(session) is not None
+
+def ensure_search_index(session):
+    """Create the FTS table and its triggers if missing or keyed on the rowid, indexing existing products once."""
+    if not fts_available(session) or 'search_rowid' in (_index_sql(session) or ''):
+        return
+    rebuild_search_index(session)
+
+def rebuild_search_index(session):
+    """(Re)create the FTS table and triggers and index every product; commits."""
+    if not fts_available(session):
+        return
+    for trigger in _FTS_TRIGGERS:
+        session.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+    session.execute(text(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+    # Products from before the insert trigger get keys above any already given out
+    session.execute(text('UPDATE products SET search_rowid = rowid + '
+                         '(SELECT coalesce(max(search_rowid), 0) FROM products) WHERE search_rowid IS NULL'))
+    for statement in _FTS_STATEMENTS:
+        session.execute(text(statement))
+    session.execute(text(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')"))
+    session.commit()
+
+def search_terms(query):
+    """Words of a search query, lower-cased; punctuation and FTS syntax are dropped."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+def _filters(category, supplier):
+    conditions = []
+    if category:
+        conditions.append(Product.category == category)
+    if supplier:
+        conditions.append(Product.supplier == supplier)
+    return conditions
+
+_search = table(SEARCH_TABLE, column('rowid'))
+
+def _matches(match, conditions):
+    """Search rowids of products matching an FTS query and the category/supplier filters."""
+    statement = select(_search.c.rowid).where(text(f'{SEARCH_TABLE} MATCH :match').bindparams(match=match))
+    if conditions:
+        statement = statement.join(Product, Product.search_rowid == _search.c.rowid)
+        statement = statement.where(*conditions)
+    return statement
+
+def _relevance(terms):
+    """Column-weighted count of the terms that start a word in each searchable column."""
+    score = literal(0)
+    for term in terms:
+        for field, weight in zip(SEARCH_COLUMNS, COLUMN_WEIGHTS):
+            # The ' ' prefix lets '% term%' match the first word too
+            starts_word = (literal(' ') + getattr(Product, field)).ilike(f'% {term}%')
+            score = score + case((starts_word, weight), else_=0)
+    return score
+
+def search_products(query, page=1, per_page=20, category=None, supplier=None):
+    """(products on this page, total matches, whether the total is exact), best matches first.
+
+    Only the first RANK_CANDIDATES matches are ranked; a query that broad
+    ("a", "supplier") lists the rest after them in index order. Counting
+    stops at COUNT_LIMIT matches.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], 0, True
+    conditions = _filters(category, supplier)
+    offset = (page - 1) * per_page
+
+    if not _index_exists(db.session):
+        # No FTS5: every term must appear somewhere, ordered by name
+        for term in terms:
+            pattern = f'%{term}%'
+            conditions.append(Product.id.ilike(pattern) | Product.name.ilike(pattern) |
+                              Product.category.ilike(pattern) | Product.supplier.ilike(pattern))
+        total = db.session.scalar(select(func.count()).select_from(Product).where(*conditions))
+        products = db.session.execute(
+            select(Product).where(*conditions).order_by(Product.name, Product.id).offset(offset).limit(per_page)
+        ).scalars().all()
+        return products, total, True
+
+    # Quoted prefix terms: user input can never be read as FTS query syntax
+    match = ' '.join(f'"{term}"*' for term in terms)
+    rowid = Product.search_rowid
+    products, total = [], None
+
+    if offset < RANK_CANDIDATES:
+        candidates = _matches(match, conditions).limit(RANK_CANDIDATES).subquery('candidates')
+        rows = db.session.execute(
+            select(Product, func.count().over())
+            .join(candidates, candidates.c.rowid == rowid)
+            .order_by(_relevance(terms).desc(), func.length(Product.name), Product.id)
+            .offset(offset)
+            .limit(min(per_page, RANK_CANDIDATES - offset))
+        ).all()
+        products = [product for product, _ in rows]
+        # The window count is the total unless the candidates ran out before the matches did
+        if rows and rows[0][1] < RANK_CANDIDATES:
+            total = rows[0][1]
+        elif not rows and offset == 0:
+            total = 0
+    if total is None:
+        capped = _matches(match, conditions).limit(COUNT_LIMIT + 1).subquery()
+        total = db.session.scalar(select(func.count()).select_from(capped))
+
+    if offset + per_page > RANK_CANDIDATES and total > RANK_CANDIDATES:
+        start = max(offset, RANK_CANDIDATES)
+        rest = _matches(match, conditions).limit(offset + per_page - start).offset(start).subquery('rest')
+        products += db.session.execute(
+            select(Product).join(rest, rest.c.rowid == rowid).order_by(rest.c.rowid)
+        ).scalars().all()
+    return products, min(total, COUNT_LIMIT), total <= COUNT_LIMIT
@@ -0,0 +1,389 @@
+"""
+Nearest-neighbour search over product sales profiles.
+
+Every product is a unit vector built from weighted blocks:
+
+- the shape of its last PROFILE_WEEKS of weekly sales and of its weekday mix
+- its sales level, price and category/supplier, each soft-binned or hashed
+  into a few dimensions so that new categories need no new columns
+
+Cosine similarity is then a single dot product. Exact search scans the
+vectors in blocks; approximate search looks only at products sharing a
+random-hyperplane (SimHash) bucket with the query in any of LSH_TABLES tables
+and re-ranks those exactly.
+
+The index follows this process's committed writes row by row (see
+product_changes). Writes from other processes are noticed through the
+catalog version: the rows whose category, supplier or price differ between
+the snapshot the index last followed and the current one are re-indexed.
+Like the catalog snapshot, the index is never changed in place: a catch-up
+builds a copy and swaps it in, so searches under way keep a consistent one.
+An index older than SIMILARITY_REBUILD_SECONDS is rebuilt by the request
+that notices it, outside the lock, while other requests keep using the old
+one.
+"""
+import re
+import threading
+import time
+import zlib
+
+from flask import current_app
+
+from app.extensions import db
+from app.services import product_changes
+from app.services.catalog_snapshot import get_catalog_snapshot
+from app.services.sales_store import demand_matrix
+
+PROFILE_WEEKS = 12
+HASH_DIMENSIONS = 32
+PRICE_BINS = (-1.0, 4.0, 11)  # log10 price from $0.10 to $10,000
+LEVEL_BINS = (0.0, 7.0, 8)    # log1p units per day
+# How much each block counts towards the cosine
+WEIGHTS = {'weekly': 0.6, 'weekday': 0.4, 'level': 0.5, 'price': 0.4, 'category': 0.6, 'supplier': 0.3}
+SEARCH_BLOCK_ROWS = 65536
+LSH_TABLES = 8
+# Hyperplanes per table are chosen so that a bucket holds about this many products
+LSH_BUCKET_ROWS = 64
+# Pseudo-days of neighbour demand blended into a product's own short history
+PRIOR_DAYS = 7
+PRODUCT_ID_PATTERN = r'\b[A-Za-z]{1,3}-?\d{2,}\b'
+
+_index = None
+_pending = set()
+# Products changed while a rebuild runs, to be applied to the new index as well
+_missed = set()
+_rebuilding = False
+_lock = threading.Lock()
+
+def _unit_rows(block):
+    import numpy as np
+
+    norms = np.linalg.norm(block, axis=1, keepdims=True)
+    return np.divide(block, norms, out=np.zeros_like(block), where=norms > 0)
+
+def _soft_bins(values, bins, known=None):
+    """Gaussian soft one-hot of each value over evenly spaced bin centres; all zero where not known."""
+    import numpy as np
+
+    centres = np.linspace(*bins)
+    width = centres[1] - centres[0]
+    block = np.exp(-0.5 * ((values[:, None] - centres) / width) ** 2)
+    if known is not None:
+        block[~known] = 0
+    return block
+
+def _hashed(names):
+    """Signed feature hashing of each distinct name into HASH_DIMENSIONS: unrelated names are near-orthogonal."""
+    import numpy as np
+
+    vectors = np.zeros((len(names), HASH_DIMENSIONS))
+    for row, name in enumerate(names):
+        digest = zlib.crc32(str(name or '').encode())
+        for salt in range(2):
+            bucket = (digest >> (salt * 8)) % HASH_DIMENSIONS
+            vectors[row, bucket] += 1 if (digest >> (16 + salt)) & 1 else -1
+    return vectors
+
+def profile_vectors(sales, category_codes, categories, supplier_codes, suppliers, prices):
+    """float32 unit feature vectors for a products x days sales matrix and coded categories/suppliers."""
+    import numpy as np
+
+    sales = sales[:, -PROFILE_WEEKS * 7:].astype(np.float64)
+    weeks = sales.reshape(len(sales), PROFILE_WEEKS, 7)
+    sold = sales > 0
+    # Average over the days since the first sale, so new products are not diluted by days before they existed
+    first = np.where(sold.any(axis=1), sold.argmax(axis=1), sales.shape[1] - 1)
+    daily = sales.sum(axis=1) / (sales.shape[1] - first)
+    sold = sold.any(axis=1)
+
+    blocks = {
+        'weekly': weeks.sum(axis=2),
+        'weekday': weeks.sum(axis=1),
+        'level': _soft_bins(np.log1p(daily), LEVEL_BINS, known=sold),
+        'price': _soft_bins(np.log10(np.maximum(prices, 0.1)), PRICE_BINS),
+        'category': _hashed(categories)[category_codes],
+        'supplier': _hashed(suppliers)[supplier_codes],
+    }
+    vectors = np.hstack([_unit_rows(blocks[name]) * WEIGHTS[name] ** 0.5 for name in WEIGHTS])
+    return _unit_rows(vectors).astype(np.float32), daily
+
+class SimilarityIndex:
+    """Product vectors with exact and LSH search; rows of removed products are masked, not deleted."""
+
+    def __init__(self, ids, vectors, daily_demand, version):
+        import numpy as np
+
+        self.ids = list(ids)
+        self.index = {product_id: row for row, product_id in enumerate(self.ids)}
+        self.vectors = vectors
+        self.daily_demand = daily_demand
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.version = version
+        self.engine = None
+        # Catalog snapshot the rows were last brought up to
+        self.snapshot = None
+        self.built_at = time.monotonic()
+        self._bits = int(np.clip(np.log2(max(len(self.ids), 1) / LSH_BUCKET_ROWS), 1, 20))
+        self._planes = np.random.default_rng(0).standard_normal(
+            (vectors.shape[1], LSH_TABLES * self._bits)).astype(np.float32)
+        # Features are mostly non-negative: split around the centre of the data, not the origin
+        self._centre = vectors.mean(axis=0) if len(vectors) else 0
+        self._buckets = None
+
+    @classmethod
+    def build(cls, snapshot):
+        vectors, daily = profile_vectors(demand_matrix(snapshot.ids, PROFILE_WEEKS * 7), snapshot.category_codes,
+                                         snapshot.categories, snapshot.supplier_codes, snapshot.suppliers,
+                                         snapshot.selling_price)
+        index = cls(snapshot.ids, vectors, daily, snapshot.version)
+        index.engine = db.engine
+        index.snapshot = snapshot
+        return index
+
+    def updated(self, snapshot, removed=(), ids=(), vectors=None, daily_demand=None):
+        """Copy brought up to snapshot: removed products masked, rows of ids replaced or appended.
+
+        This index is left untouched, so requests still searching it are not disturbed.
+        """
+        import copy
+        import numpy as np
+
+        fresh = copy.copy(self)
+        fresh.version = snapshot.version
+        fresh.snapshot = snapshot
+        removed = [self.index[product_id] for product_id in removed if product_id in self.index]
+        if not removed and not ids:
+            return fresh
+
+        fresh.alive = self.alive.copy()
+        fresh.alive[removed] = False
+        if ids:
+            fresh.ids = list(self.ids)
+            fresh.index = dict(self.index)
+            new = [row for row, product_id in enumerate(ids) if product_id not in self.index]
+            for row in new:
+                fresh.index[ids[row]] = len(fresh.ids)
+                fresh.ids.append(ids[row])
+            fresh.vectors = np.vstack([self.vectors, vectors[new]])
+            fresh.daily_demand = np.concatenate([self.daily_demand, daily_demand[new]])
+            fresh.alive = np.concatenate([fresh.alive, np.ones(len(new), dtype=bool)])
+            rows = np.array([fresh.index[product_id] for product_id in ids], dtype=np.int64)
+            fresh.vectors[rows] = vectors
+            fresh.daily_demand[rows] = daily_demand
+            fresh.alive[rows] = True
+            fresh._buckets = None
+        return fresh
+
+    def _codes(self, vectors):
+        """(rows, LSH_TABLES) bucket codes: one bit per hyperplane side."""
+        import numpy as np
+
+        bits = ((vectors - self._centre) @ self._planes > 0).reshape(len(vectors), LSH_TABLES, self._bits)
+        return bits.astype(np.int64) @ (1 << np.arange(self._bits))
+
+    def _candidates(self, vector):
+        import numpy as np
+
+        if self._buckets is None:
+            codes = self._codes(self.vectors)
+            self._buckets = []
+            for table in range(LSH_TABLES):
+                order = np.argsort(codes[:, table], kind='stable')
+                self._buckets.append((codes[order, table], order))
+        query = self._codes(vector[None, :])[0]
+        found = []
+        for table, (codes, order) in enumerate(self._buckets):
+            start, stop = np.searchsorted(codes, query[table]), np.searchsorted(codes, query[table], 'right')
+            found.append(order[start:stop])
+        return np.unique(np.concatenate(found))
+
+    def _scores(self, rows, selection, vector, exclude):
+        """Cosine of the query with the selected rows, -inf for rows to skip; rows are the selection's numbers."""
+        import numpy as np
+
+        scores = self.vectors[selection] @ vector
+        scores[~self.alive[selection]] = -np.inf
+        if exclude is not None:
+            scores[rows == exclude] = -np.inf
+        return scores
+
+    def search(self, vector, k=10, exclude=None, approximate=False):
+        """(rows, scores) of the k most similar live products, best first."""
+        import numpy as np
+
+        if approximate:
+            candidates = self._candidates(vector)
+            blocks = [(candidates, self._scores(candidates, candidates, vector, exclude))]
+        else:
+            # Slices keep each block a view, so only the scores are allocated
+            blocks = ((rows, self._scores(rows, slice(rows[0], rows[-1] + 1), vector, exclude))
+                      for rows in (np.arange(start, min(start + SEARCH_BLOCK_ROWS, len(self.ids)))
+                                   for start in range(0, len(self.ids), SEARCH_BLOCK_ROWS)))
+
+        best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        for rows, scores in blocks:
+            # Keep only the block's top k, then merge with the best so far
+            if len(scores) > k:
+                keep = np.argpartition(-scores, k)[:k]
+                rows, scores = rows[keep], scores[keep]
+            best_rows = np.concatenate([best_rows, rows])
+            best_scores = np.concatenate([best_scores, scores])
+
+        found = np.isfinite(best_scores)
+        best_rows, best_scores = best_rows[found], best_scores[found]
+        order = np.lexsort((best_rows, -best_scores))[:k]
+        return best_rows[order], best_scores[order]
+
+def _product_vectors(snapshot, ids):
+    rows = [snapshot.index[product_id] for product_id in ids]
+    return profile_vectors(demand_matrix(ids, PROFILE_WEEKS * 7), snapshot.category_codes[rows],
+                           snapshot.categories, snapshot.supplier_codes[rows], snapshot.suppliers,
+                           snapshot.selling_price[rows])
+
+def _changed_products(old, new):
+    """Ids of products added, removed or given another category, supplier or price between two snapshots."""
+    import numpy as np
+
+    removed = set(old.index).difference(new.index)
+    rows = np.array([old.index.get(product_id, -1) for product_id in new.ids], dtype=np.int64)
+    known = rows >= 0
+    rows = rows[known]
+    differs = ~known
+    differs[known] = (
+        (np.asarray(old.categories, dtype=object)[old.category_codes[rows]]
+         != np.asarray(new.categories, dtype=object)[new.category_codes[known]])
+        | (np.asarray(old.suppliers, dtype=object)[old.supplier_codes[rows]]
+           != np.asarray(new.suppliers, dtype=object)[new.supplier_codes[known]])
+        | (old.selling_price[rows] != new.selling_price[known])
+    )
+    return removed.union(new.ids[row] for row in np.flatnonzero(differs).tolist())
+
+def _catch_up(index, snapshot):
+    """Re-index the pending products and, if the catalog version moved, those that differ from index.snapshot.
+
+    Returns a new index if anything changed; other requests may still be searching this one.
+    """
+    if index.snapshot is not None and snapshot.version < index.snapshot.version:
+        # Fetched before another request caught the index up; never go back to it
+        snapshot = index.snapshot
+    changed = set(_pending)
+    _pending.clear()
+    if index.version != snapshot.version:
+        changed.update(_changed_products(index.snapshot, snapshot))
+    if not changed and snapshot is index.snapshot:
+        return index
+    removed = [product_id for product_id in changed if product_id not in snapshot.index]
+    changed = [product_id for product_id in changed if product_id in snapshot.index]
+    if not changed:
+        return index.updated(snapshot, removed)
+    return index.updated(snapshot, removed, changed, *_product_vectors(snapshot, changed))
+
+def get_similarity_index(snapshot=None):
+    """Current index with this process's and other processes' writes applied."""
+    global _index, _rebuilding
+
+    snapshot = snapshot or get_catalog_snapshot()
+    max_age = current_app.config.get('SIMILARITY_REBUILD_SECONDS', 3600)
+    with _lock:
+        index = _index
+        if index is None or index.engine is not db.engine:
+            # Nothing to serve meanwhile, so build it here
+            _pending.clear()
+            _index = SimilarityIndex.build(snapshot)
+            return _index
+        index = _index = _catch_up(index, snapshot)
+        if _rebuilding or time.monotonic() - index.built_at <= max_age:
+            return index
+        _rebuilding = True
+        _missed.clear()
+
+    try:
+        fresh = SimilarityIndex.build(snapshot)
+    except Exception:
+        with _lock:
+            _rebuilding = False
+        raise
+    latest = get_catalog_snapshot()
+    with _lock:
+        _rebuilding = False
+        # Catch-ups meanwhile replaced the object, not the build; a different build means the engine changed
+        if _index is None or _index.built_at != index.built_at:
+            return _index
+        # Writes committed during the build may already have gone to the old index; apply them to the new one too
+        _pending.update(_missed)
+        _index = _catch_up(fresh, latest)
+        return _index
+
+@product_changes.on_commit
+def track_committed_changes(changes):
+    """Queue products whose attributes or sales changed in this process for re-indexing."""
+    with _lock:
+        if _index is None:
+            return
+        if changes.version is not None and not changes.bulk and _index.version == changes.base_version:
+            # Read only by catch-ups, under this lock
+            _index.version = changes.version
+        # Otherwise the version no longer matches and the next get_similarity_index diffs the snapshots
+        changed = {change.product_id for change in changes.products}
+        changed.update(record.product_id for record in changes.transactions if record.transaction_type == 'sale')
+        _pending.update(changed)
+        if _rebuilding:
+            _missed.update(changed)
+
+def _neighbour_dict(index, row, score):
+    # The snapshot the index was caught up to: it holds every live row, where one fetched earlier may not
+    snapshot = index.snapshot
+    catalog_row = snapshot.index[index.ids[row]]
+    return {
+        'id': index.ids[row],
+        'name': snapshot.names[catalog_row],
+        'category': snapshot.categories[snapshot.category_codes[catalog_row]],
+        'supplier': snapshot.suppliers[snapshot.supplier_codes[catalog_row]],
+        'similarity': round(score, 4),
+        'daily_demand': round(float(index.daily_demand[row]), 2)
+    }
+
+def similar_products(product_id, k=10, approximate=False):
+    """The k products that sell, cost and are categorised most like product_id; None if it does not exist."""
+    index = get_similarity_index()
+    row = index.index.get(product_id)
+    if row is None or not index.alive[row]:
+        return None
+    rows, scores = index.search(index.vectors[row], k, exclude=row, approximate=approximate)
+    return [_neighbour_dict(index, row, score) for row, score in zip(rows.tolist(), scores.tolist())]
+
+def _vector_for(product):
+    """Feature vector of a product from its own fields, whether or not it is indexed yet."""
+    import numpy as np
+
+    sales = demand_matrix([product.id], PROFILE_WEEKS * 7,
+                          {product.id: (product.historical_sales, product.created_at)})
+    vectors, _ = profile_vectors(sales, np.zeros(1, dtype=np.int64), [product.category],
+                                 np.zeros(1, dtype=np.int64), [product.supplier],
+                                 np.array([product.selling_price or 0.0]))
+    return vectors[0]
+
+def neighbour_demand(product, k=10):
+    """Similarity-weighted daily demand of the product's nearest neighbours that have sales, or None."""
+    index = get_similarity_index()
+    # Look further than k: other products without sales can be just as similar
+    rows, scores = index.search(_vector_for(product), k * 5, exclude=index.index.get(product.id))
+    selling = (index.daily_demand[rows] > 0) & (scores > 0)
+    rows, scores = rows[selling][:k], scores[selling][:k]
+    if not len(rows):
+        return None
+    return float(scores @ index.daily_demand[rows] / scores.sum())
+
+def mentioned_product(query, snapshot=None):
+    """Catalog product asked about as "sells like P0042" or "similar to P0042", if any."""
+    match = re.search(rf'(?:sells?|selling) like\s+({PRODUCT_ID_PATTERN})|similar to\s+({PRODUCT_ID_PATTERN})',
+                      query, re.IGNORECASE)
+    if not match:
+        return None
+    product_id = (match.group(1) or match.group(2)).upper()
+    return product_id if product_id in (snapshot or get_catalog_snapshot()).index else None
+
+def similar_products_context(product_id, k=5):
+    """Compact neighbour list for LLM context."""
+    return [{'id': item['id'], 'name': item['name'], 'daily_demand': item['daily_demand']}
+            for item in similar_products(product_id, k) or []]
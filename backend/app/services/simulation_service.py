@@ -0,0 +1,262 @@
+"""
+Monte Carlo stockout simulation for (s, Q) reorder policies.
+
+Every product is simulated over many demand paths at once: a products x paths
+array of stock on hand, a ring buffer of orders on their way, and one day
+stepped at a time. Daily demand is drawn either from the product's own recent
+days (empirical) or from a Poisson / negative binomial fitted to their mean
+and variance. Whenever stock on hand plus stock on order falls to the reorder
+point, Q units are ordered and arrive after the product's lead time. Demand
+that finds the shelf empty is lost.
+
+Products are split into chunks that run on a process pool. Each chunk has its
+own seed, so results do not depend on how many workers there are. The pool
+gets this web worker's share of SIMULATION_WORKERS, and simulations larger
+than SIMULATION_MAX_CELLS are refused.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+from app.services.catalog_snapshot import get_catalog_snapshot
+from app.services.ml_service import DEMAND_WINDOW_DAYS
+from app.services.restock_optimizer import demand_statistics, optimize, validate_parameters
+from app.services.sales_store import demand_matrix
+
+DISTRIBUTIONS = ('empirical', 'fitted')
+MAX_PATHS = 10000
+MAX_HORIZON_DAYS = 365
+# products x paths x ring buffer slots per chunk; about 64 MB of int32 order pipeline
+CHUNK_CELLS = 16_000_000
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+def _sampler(history, distribution, rng, paths):
+    """Function drawing one day of demand, products x paths, from each product's history rows."""
+    import numpy as np
+
+    history = np.asarray(history, dtype=np.int32)
+    rows = np.arange(len(history))[:, None]
+    sold = history > 0
+    # Days before a product's first sale are not samples of its demand
+    first = np.where(sold.any(axis=1), sold.argmax(axis=1), history.shape[1] - 1)
+    days = history.shape[1] - first
+
+    if distribution == 'empirical':
+        def draw():
+            picks = first[:, None] + (rng.random((len(history), paths)) * days[:, None]).astype(np.int64)
+            return history[rows, picks]
+        return draw
+
+    counts = np.where(np.arange(history.shape[1]) >= first[:, None], history, 0).astype(np.float64)
+    mean = counts.sum(axis=1) / days
+    variance = (np.square(counts).sum(axis=1) - counts.sum(axis=1) * mean) / np.maximum(days - 1, 1)
+    # Overdispersed demand gets a negative binomial with the same mean and variance, the rest Poisson
+    spread = np.flatnonzero(variance > mean * 1.01)
+    size = mean[spread] ** 2 / (variance[spread] - mean[spread])
+    success = (size / (size + mean[spread]))[:, None]
+
+    def draw():
+        demand = rng.poisson(mean[:, None], (len(history), paths))
+        if len(spread):
+            demand[spread] = rng.negative_binomial(np.maximum(size, 1e-9)[:, None], success,
+                                                   (len(spread), paths))
+        return demand.astype(np.int32)
+    return draw
+
+def simulate_chunk(history, stock, lead_time, reorder_point, order_quantity, paths, horizon_days,
+                   distribution, seed):
+    """Simulate one chunk of products; returns per-product outcome arrays averaged over paths."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    count = len(stock)
+    lead_time = np.maximum(lead_time, 1).astype(np.int64)
+    reorder_point = np.floor(reorder_point).astype(np.int32)[:, None]
+    order_quantity = np.maximum(np.ceil(order_quantity), 1).astype(np.int32)[:, None]
+    draw = _sampler(history, distribution, rng, paths)
+
+    slots = int(lead_time.max()) + 1 if count else 1
+    pipeline = np.zeros((slots, count, paths), dtype=np.int32)  # orders arriving on day % slots
+    on_hand = np.repeat(stock.astype(np.int32)[:, None], paths, axis=1)
+    position = on_hand.copy()  # on hand plus on order
+    lost, demanded, sold, gap = (np.zeros((count, paths), dtype=np.int32) for _ in range(4))
+    stockout_day, stocked_out = (np.zeros((count, paths), dtype=bool) for _ in range(2))
+    stockout_days = np.zeros(count, dtype=np.int64)
+    orders_placed = np.zeros(count, dtype=np.int64)
+    products = np.arange(count)
+
+    for day in range(horizon_days):
+        slot = day % slots
+        on_hand += pipeline[slot]
+        pipeline[slot] = 0
+
+        demand = draw()
+        np.minimum(demand, on_hand, out=sold)
+        on_hand -= sold
+        position -= sold
+        demanded += demand
+        demand -= sold  # what could not be sold is lost
+        lost += demand
+        np.greater(demand, 0, out=stockout_day)
+        stocked_out |= stockout_day
+        stockout_days += np.count_nonzero(stockout_day, axis=1)
+
+        # Order enough batches of Q to bring the position back above the reorder point
+        np.subtract(reorder_point + 1, position, out=gap)
+        if (gap > 0).any():
+            batches = np.where(gap > 0, -(-gap // order_quantity), 0)
+            ordered = batches * order_quantity
+            pipeline[(day + lead_time) % slots, products] += ordered
+            position += ordered
+            orders_placed += np.count_nonzero(batches, axis=1)
+
+    total_demand = demanded.sum(axis=1, dtype=np.int64)
+    total_lost = lost.sum(axis=1, dtype=np.int64)
+    return {
+        'stockout_probability': stocked_out.mean(axis=1),
+        'expected_lost_sales': total_lost / paths,
+        'fill_rate': np.where(total_demand > 0, 1 - total_lost / np.maximum(total_demand, 1), 1.0),
+        'stockout_days': stockout_days / paths,
+        'expected_orders': orders_placed / paths,
+        'expected_ending_stock': on_hand.mean(axis=1),
+        # 5th percentile: the stock left on a bad path
+        'ending_stock_p5': np.percentile(on_hand, 5, axis=1) if count else np.zeros(0),
+    }
+
+def _run_chunk(args):
+    return simulate_chunk(*args)
+
+def _executor(workers):
+    """Process pool shared by requests in this process, rebuilt if the worker count changes."""
+    global _pool, _pool_workers
+    import multiprocessing
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver: forking a threaded web worker directly can inherit held locks
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('forkserver'))
+            _pool_workers = workers
+        return _pool
+
+def simulate(history, stock, lead_time, reorder_point, order_quantity, paths=1000, horizon_days=30,
+             distribution='empirical', seed=None, workers=1):
+    """Simulate all products in chunks, on a process pool when workers > 1; returns concatenated arrays."""
+    import numpy as np
+
+    slots = int(np.maximum(lead_time, 1).max()) + 1 if len(stock) else 1
+    size = max(1, CHUNK_CELLS // (paths * slots))
+    seeds = np.random.SeedSequence(seed).spawn(max(1, -(-len(stock) // size)))
+    tasks = [(history[start:start + size], stock[start:start + size], lead_time[start:start + size],
+              reorder_point[start:start + size], order_quantity[start:start + size],
+              paths, horizon_days, distribution, seeds[number])
+             for number, start in enumerate(range(0, len(stock), size))]
+
+    if workers > 1 and len(tasks) > 1:
+        results = list(_executor(workers).map(_run_chunk, tasks))
+    else:
+        results = [_run_chunk(task) for task in tasks]
+    if not results:
+        return {}
+    return {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+
+def _workers():
+    """This web worker's share of the host's simulation processes."""
+    workers = current_app.config.get('SIMULATION_WORKERS', 0)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, workers // max(current_app.config.get('WEB_WORKERS', 1), 1))
+
+def validate_simulation(paths, horizon_days, distribution, items=50):
+    paths, horizon_days, items = int(paths), int(horizon_days), int(items)
+    if not 1 <= paths <= MAX_PATHS:
+        raise ValueError(f'paths must be between 1 and {MAX_PATHS}')
+    if not 1 <= horizon_days <= MAX_HORIZON_DAYS:
+        raise ValueError(f'horizon_days must be between 1 and {MAX_HORIZON_DAYS}')
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"distribution must be one of {', '.join(DISTRIBUTIONS)}")
+    if items < 1:
+        raise ValueError('items must be at least 1')
+    return paths, horizon_days, items
+
+def _round(value, digits=2):
+    return round(float(value), digits)
+
+def simulate_catalog(params=None, product_ids=None, reorder_point=None, order_quantity=None, paths=1000,
+                     horizon_days=30, distribution='empirical', seed=None, items=50):
+    """Stockout risk of the optimizer's reorder policy (or the given one) for the catalog or some products.
+
+    reorder_point and order_quantity replace the optimizer's values for every
+    simulated product, e.g. to try a policy for one product.
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    values = validate_parameters(params or {})
+    paths, horizon_days, items = validate_simulation(paths, horizon_days, distribution, items)
+
+    snapshot = get_catalog_snapshot()
+    mean, std = demand_statistics(snapshot)
+    policy = optimize(snapshot, mean, std, **values)
+
+    if product_ids is None:
+        rows = np.arange(snapshot.size)
+    else:
+        unknown = [product_id for product_id in product_ids if product_id not in snapshot.index]
+        if unknown:
+            raise ValueError(f"Unknown products: {', '.join(unknown[:10])}")
+        rows = np.array([snapshot.index[product_id] for product_id in product_ids], dtype=np.int64)
+
+    limit = current_app.config.get('SIMULATION_MAX_CELLS', 500_000_000)
+    if len(rows) * paths * horizon_days > limit:
+        raise ValueError(f'{len(rows)} products x {paths} paths x {horizon_days} days is more than '
+                         f'{limit} simulated days; simulate fewer products, paths or days')
+
+    ids = [snapshot.ids[row] for row in rows]
+    points = policy['reorder_point'][rows] if reorder_point is None else np.full(len(rows), float(reorder_point))
+    # EOQ batches, but never smaller than a day's demand over the review period
+    quantities = (np.maximum(policy['eoq'], mean * values['review_days'])[rows] if order_quantity is None
+                  else np.full(len(rows), float(order_quantity)))
+
+    outcome = simulate(demand_matrix(ids, DEMAND_WINDOW_DAYS), snapshot.current_stock[rows],
+                       snapshot.lead_time[rows], points, quantities, paths, horizon_days, distribution,
+                       seed, _workers())
+    if not len(rows):
+        outcome = {'stockout_probability': np.zeros(0), 'expected_lost_sales': np.zeros(0),
+                   'fill_rate': np.zeros(0)}
+
+    lost_value = outcome['expected_lost_sales'] * snapshot.selling_price[rows]
+    riskiest = np.argsort(-outcome['stockout_probability'], kind='stable')[:items]
+    return {
+        'parameters': {**values, 'paths': paths, 'horizon_days': horizon_days, 'distribution': distribution},
+        'summary': {
+            'products': len(rows),
+            'at_risk': int(np.count_nonzero(outcome['stockout_probability'] > 1 - values['service_level'])),
+            'mean_stockout_probability': _round(outcome['stockout_probability'].mean() if len(rows) else 0, 4),
+            'expected_lost_units': _round(outcome['expected_lost_sales'].sum()),
+            'expected_lost_revenue': _round(lost_value.sum()),
+        },
+        'products': [{
+            'id': ids[row],
+            'name': snapshot.names[rows[row]],
+            'current_stock': int(snapshot.current_stock[rows[row]]),
+            'reorder_point': _round(points[row], 1),
+            'order_quantity': int(np.ceil(max(quantities[row], 1))),
+            'stockout_probability': _round(outcome['stockout_probability'][row], 4),
+            'expected_lost_sales': _round(outcome['expected_lost_sales'][row]),
+            'expected_lost_revenue': _round(lost_value[row]),
+            'fill_rate': _round(outcome['fill_rate'][row], 4),
+            'stockout_days': _round(outcome['stockout_days'][row]),
+            'expected_orders': _round(outcome['expected_orders'][row]),
+            'expected_ending_stock': _round(outcome['expected_ending_stock'][row], 1),
+            'ending_stock_p5': _round(outcome['ending_stock_p5'][row], 1)
+        } for row in riskiest.tolist()],
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -0,0 +1,176 @@
+"""
+Demand trend detection for the whole catalog.
+
+Each product's last RECENT_DAYS of sales are compared with the BASELINE_DAYS
+before them in one NumPy pass over the products x days demand matrix: the
+least-squares slope of the recent window, its acceleration (second half slope
+minus first half slope), and a z-score of the recent mean against the baseline
+mean and variability. Products whose recent demand sits TREND_ZSCORE standard
+errors above or below their baseline are trending up or down.
+
+Results are stored in product_trends. The first refresh of a day recomputes
+every product; later ones only recompute products sold since the last refresh.
+"""
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select
+
+from app.extensions import db
+from app.models.inventory import Product, Transaction
+from app.models.rollups import ProductTrend, TrendRefresh
+from app.services.sales_store import demand_matrix
+
+RECENT_DAYS = 14
+BASELINE_DAYS = 42
+TREND_ZSCORE = 2.0
+# Fewer units than this over both windows is too little to call a trend
+MIN_TREND_UNITS = 5
+METRICS = ('recent_mean', 'baseline_mean', 'slope', 'acceleration', 'zscore')
+
+_last_refresh = None
+
+def _slopes(block):
+    """Least-squares slope of every row of a products x days block."""
+    import numpy as np
+
+    x = np.arange(block.shape[1]) - (block.shape[1] - 1) / 2
+    return block @ x / (x @ x)
+
+def trend_metrics(matrix, recent_days=RECENT_DAYS):
+    """Trend arrays for a products x days matrix whose last `recent_days` columns are the recent window."""
+    import numpy as np
+
+    matrix = matrix.astype(np.float64)
+    baseline, recent = matrix[:, :-recent_days], matrix[:, -recent_days:]
+    half = recent_days // 2
+
+    # Days before a product's first sale are not part of its baseline
+    sold = baseline > 0
+    first = np.where(sold.any(axis=1), sold.argmax(axis=1), baseline.shape[1])
+    days = np.maximum(baseline.shape[1] - first, 1)
+    baseline_total = baseline.sum(axis=1)
+    baseline_mean = baseline_total / days
+    variance = (np.square(baseline).sum(axis=1) - baseline_total * baseline_mean) / np.maximum(days - 1, 1)
+
+    # Poisson-like floor, so a product that sold exactly the same every day is not infinitely sensitive
+    noise = np.maximum.reduce([np.sqrt(np.maximum(variance, 0)), np.sqrt(baseline_mean), np.full(len(matrix), 0.5)])
+    recent_mean = recent.mean(axis=1)
+    zscore = (recent_mean - baseline_mean) / (noise / np.sqrt(recent_days))
+
+    enough = baseline_total + recent.sum(axis=1) >= MIN_TREND_UNITS
+    trend = np.where(enough & (zscore >= TREND_ZSCORE), 'up',
+                     np.where(enough & (zscore <= -TREND_ZSCORE), 'down', 'stable'))
+    return {
+        'trend': trend,
+        'recent_mean': recent_mean,
+        'baseline_mean': baseline_mean,
+        'slope': _slopes(recent),
+        'acceleration': (_slopes(recent[:, half:]) - _slopes(recent[:, :half])) / half,
+        'zscore': zscore
+    }
+
+def product_trend(product):
+    """Trend of a single product, computed from its current sales."""
+    matrix = demand_matrix([product.id], RECENT_DAYS + BASELINE_DAYS,
+                           {product.id: (product.historical_sales, product.created_at)})
+    metrics = trend_metrics(matrix)
+    return ProductTrend(product_id=product.id, trend=str(metrics['trend'][0]),
+                        **{name: float(metrics[name][0]) for name in METRICS}).to_dict()
+
+def _write_trends(ids, full):
+    """Recompute and store the trends of the given products."""
+    import numpy as np
+
+    metrics = trend_metrics(demand_matrix(ids, RECENT_DAYS + BASELINE_DAYS))
+    # Products without a sale in either window have nothing to store: no row reads as stable
+    rows = np.flatnonzero((metrics['recent_mean'] > 0) | (metrics['baseline_mean'] > 0))
+
+    if full:
+        db.session.execute(delete(ProductTrend))
+    else:
+        db.session.execute(delete(ProductTrend).where(ProductTrend.product_id.in_(ids)))
+    if len(rows):
+        db.session.execute(insert(ProductTrend), [
+            {'product_id': ids[row], 'trend': str(metrics['trend'][row]),
+             **{name: float(metrics[name][row]) for name in METRICS}}
+            for row in rows.tolist()
+        ])
+    return len(ids)
+
+def refresh_trends(force=False):
+    """Bring product_trends up to date and commit; returns how many products were recomputed.
+
+    Checks for new sales at most every TREND_REFRESH_SECONDS per process unless forced.
+    """
+    global _last_refresh
+
+    interval = current_app.config.get('TREND_REFRESH_SECONDS', 60)
+    if not force and _last_refresh and _last_refresh[1] is db.engine and time.monotonic() - _last_refresh[0] < interval:
+        return 0
+
+    today = datetime.utcnow().date()
+    state = db.session.get(TrendRefresh, 1)
+    # Sales still waiting for the write-behind are not in historical_sales yet; stop short of them
+    first_pending = select(func.min(Transaction.id)).where(Transaction.history_pending.is_(True)).scalar_subquery()
+    last_transaction_id, first_pending = db.session.execute(
+        select(func.coalesce(func.max(Transaction.id), 0), first_pending)).one()
+    if first_pending is not None:
+        last_transaction_id = min(last_transaction_id, first_pending - 1)
+
+    if force or state is None or state.as_of != today:
+        ids = db.session.execute(select(Product.id).order_by(Product.id)).scalars().all()
+        updated = _write_trends(ids, full=True)
+    elif last_transaction_id > state.last_transaction_id:
+        ids = db.session.execute(
+            select(Transaction.product_id)
+            .where(Transaction.id > state.last_transaction_id, Transaction.transaction_type == 'sale')
+            .distinct()
+        ).scalars().all()
+        updated = _write_trends(ids, full=False) if ids else 0
+    else:
+        _last_refresh = (time.monotonic(), db.engine)
+        return 0
+
+    if state is None:
+        state = TrendRefresh(id=1)
+        db.session.add(state)
+    state.as_of = today
+    state.last_transaction_id = last_transaction_id
+    db.session.commit()
+    _last_refresh = (time.monotonic(), db.engine)
+    return updated
+
+def trend_counts():
+    """{'up': n, 'down': n} over products that still exist."""
+    rows = db.session.execute(
+        select(ProductTrend.trend, func.count())
+        .join(Product, Product.id == ProductTrend.product_id)
+        .where(ProductTrend.trend != 'stable')
+        .group_by(ProductTrend.trend)
+    ).all()
+    return {'up': 0, 'down': 0, **dict(rows)}
+
+def trending_products(limit=5, direction='up', category=None):
+    """Products trending in `direction`, strongest first."""
+    strength = ProductTrend.zscore.desc() if direction == 'up' else ProductTrend.zscore.asc()
+    conditions = [ProductTrend.trend == direction]
+    if category is not None:
+        conditions.append(Product.category == category)
+    rows = db.session.execute(
+        select(ProductTrend, Product.name, Product.category)
+        .join(Product, Product.id == ProductTrend.product_id)
+        .where(*conditions)
+        .order_by(strength, ProductTrend.product_id)
+        .limit(limit)
+    ).all()
+    return [{'id': trend.product_id, 'name': name, 'category': category, **trend.to_dict()}
+            for trend, name, category in rows]
+
+def get_trends(ids):
+    """Stored trend dicts for the given product ids; products without a row are stable."""
+    stored = {trend.product_id: trend.to_dict()
+              for trend in ProductTrend.query.filter(ProductTrend.product_id.in_(ids))}
+    stable = ProductTrend(trend='stable', **{name: 0.0 for name in METRICS}).to_dict()
+    return {product_id: stored.get(product_id, stable) for product_id in ids}
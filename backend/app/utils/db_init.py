@@ -2,6 +2,8 @@ import pandas as pd
 from app.models.inventory import Product
 from app.extensions import db
 from main import create_app, init_db
+from app.services.rollup_service import rebuild_rollups
+from app.services.sales_store import rebuild_sales_store
 import json
 import os
 import ast
@@ -46,6 +48,11 @@ def init_inventory():
             
             # Commit all changes
             db.session.commit()
+
+            # Product.query.delete() bypasses change tracking, so rebuild the dashboard rollups
+            # and the sales store
+            rebuild_rollups()
+            rebuild_sales_store(db.session)
             print("Database initialized successfully with inventory data!")
             
         except Exception as e:
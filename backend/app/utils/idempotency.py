@@ -0,0 +1,157 @@
+"""
+Idempotency-Key support for write routes that clients retry.
+
+A client sends the same Idempotency-Key header with every retry of one
+logical request. The first request claims the key by inserting an
+IdempotencyKey row in the database transaction its write commits in, so the
+stock change and the claim commit together. A duplicate sent at the same
+time waits on the key's unique index and finds it taken. Once the route has
+answered, its response is stored with the key. Duplicates get that response
+back with an Idempotent-Replayed header instead of running the route again.
+Requests are compared by method, path and their JSON body in canonical form,
+so a retry that serialises the same body differently is still the same.
+
+A claim without a response is either in progress (duplicates get 409) or
+left by a worker that died between committing the write and storing the
+response. After IDEMPOTENCY_IN_PROGRESS_SECONDS it is taken to be the
+latter: the write is not run again, and a minimal success response is
+stored in its place.
+
+Recent responses are also kept in a per-process LRU, so a retry storm is
+answered without touching the database beyond authentication. Keys are
+scoped per user and forgotten after IDEMPOTENCY_TTL_SECONDS.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, jsonify, make_response, request
+from sqlalchemy import delete, inspect, update
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models.idempotency import IdempotencyKey
+from app.utils.instrumentation import metrics
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# (user_id, key) -> (request_hash, status_code, body, mimetype), most recently used last
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+_last_prune = [0.0]
+
+def _entry(record):
+    return record.request_hash, record.status_code, record.response, record.mimetype
+
+def _remember(ident, entry):
+    with _responses_lock:
+        _responses[ident] = entry
+        _responses.move_to_end(ident)
+        while len(_responses) > current_app.config.get('IDEMPOTENCY_CACHE_SIZE', 10000):
+            _responses.popitem(last=False)
+
+def _cached(ident):
+    with _responses_lock:
+        entry = _responses.get(ident)
+        if entry is not None:
+            _responses.move_to_end(ident)
+        return entry
+
+def _replay(request_hash, entry, source):
+    stored_hash, status_code, body, mimetype = entry
+    if stored_hash != request_hash:
+        metrics.inc('inventiq_idempotent_requests_total', labels={'outcome': 'mismatch'})
+        return jsonify({'message': 'Idempotency-Key was already used with a different request!'}), 422
+    metrics.inc('inventiq_idempotent_requests_total', labels={'outcome': f'replayed_{source}'})
+    return Response(body, status=status_code, mimetype=mimetype, headers={'Idempotent-Replayed': 'true'})
+
+def _request_hash():
+    body = request.get_json(silent=True)
+    body = request.get_data() if body is None else json.dumps(body, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(b'\n'.join([request.method.encode(), request.path.encode(), body])).hexdigest()
+
+def _abandoned_entry(record):
+    """Response to store for a claim whose write committed but whose response never was."""
+    body = json.dumps({'message': 'A request with this Idempotency-Key already succeeded; its response was not kept.'})
+    db.session.execute(update(IdempotencyKey).where(IdempotencyKey.user_id == record.user_id,
+                                                    IdempotencyKey.key == record.key)
+                       .values(status_code=200, response=body, mimetype='application/json'))
+    db.session.commit()
+    return record.request_hash, 200, body, 'application/json'
+
+def _prune_expired():
+    """Forget keys older than the TTL, at most every IDEMPOTENCY_PRUNE_SECONDS per process."""
+    now = time.monotonic()
+    if now - _last_prune[0] < current_app.config.get('IDEMPOTENCY_PRUNE_SECONDS', 300):
+        return
+    _last_prune[0] = now
+    ttl = timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < datetime.utcnow() - ttl))
+
+def idempotent(f):
+    """Honour an Idempotency-Key header on a route wrapped by token_required (it takes current_user first)."""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return f(current_user, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'message': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters!'}), 400
+
+        user_id = current_user.id
+        ident = (user_id, key)
+        request_hash = _request_hash()
+        entry = _cached(ident)
+        if entry is not None:
+            return _replay(request_hash, entry, 'memory')
+
+        # Claim the key; the route's own commit makes the claim permanent together with its write
+        _prune_expired()
+        claim = IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash)
+        db.session.add(claim)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            record = db.session.get(IdempotencyKey, ident)
+            in_progress = timedelta(seconds=current_app.config.get('IDEMPOTENCY_IN_PROGRESS_SECONDS', 30))
+            if record is None or (record.status_code is None
+                                  and record.created_at >= datetime.utcnow() - in_progress):
+                # Being processed right now: don't run it again
+                metrics.inc('inventiq_idempotent_requests_total', labels={'outcome': 'in_progress'})
+                response = jsonify({'message': 'A request with this Idempotency-Key is still being processed!'})
+                return response, 409, {'Retry-After': '1'}
+            # Its request died after committing: the write happened, only the response is missing
+            entry = _entry(record) if record.status_code is not None else _abandoned_entry(record)
+            _remember(ident, entry)
+            return _replay(request_hash, entry, 'database')
+
+        response = make_response(f(current_user, *args, **kwargs))
+
+        # Whatever the route left uncommitted is not part of its result
+        db.session.rollback()
+        entry = (request_hash, response.status_code, response.get_data(as_text=True), response.mimetype)
+        stored = {'status_code': entry[1], 'response': entry[2], 'mimetype': entry[3]}
+        if inspect(claim).persistent:
+            db.session.execute(update(IdempotencyKey).where(IdempotencyKey.user_id == user_id,
+                                                            IdempotencyKey.key == key).values(**stored))
+        elif response.status_code >= 500:
+            # Rolled back with the route's changes: nothing was committed, so a retry may run it again
+            return response
+        else:
+            db.session.add(IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash, **stored))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A duplicate claimed the key after this request rolled back; it answers for itself
+            db.session.rollback()
+            return response
+        _remember(ident, entry)
+        metrics.inc('inventiq_idempotent_requests_total', labels={'outcome': 'executed'})
+        return response
+    return decorated
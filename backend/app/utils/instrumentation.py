@@ -0,0 +1,301 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.query_counter import get_query_budget, query_budget
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Histogram buckets (seconds) shared by all latency metrics
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Set in the environ of a batch's sub-requests (routes/batch.py), which run
+# nested in the batch request and share its g
+SUBREQUEST_ENVIRON_KEY = 'inventiq.subrequest'
+_PARKED_TIMER_KEY = 'inventiq.parked_timer'
+
+class MetricsRegistry:
+    """Thread-safe in-process counters, gauges and histograms in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((labels or {}).items()))
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, labels=None):
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def set_gauge(self, name, value, labels=None):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': buckets, 'counts': [0] * len(buckets),
+                                                     'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(histogram['buckets']):
+                if value <= bound:
+                    histogram['counts'][i] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        items = list(labels) + list(extra or [])
+        if not items:
+            return ''
+        escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in items]
+        return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            sections = [('counter', self._counters), ('gauge', self._gauges)]
+            for metric_type, values in sections:
+                for name in sorted({name for name, _ in values}):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    for (metric, labels), value in sorted(values.items()):
+                        if metric == name:
+                            lines.append(f"{name}{self._format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, labels), histogram in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram['buckets'], histogram['counts']):
+                        lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {histogram['sum']}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {histogram['count']}")
+
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('inventiq_http_requests_total', 'HTTP requests by endpoint, method and status.')
+metrics.describe('inventiq_http_request_duration_seconds', 'End-to-end request latency by endpoint.')
+metrics.describe('inventiq_request_phase_seconds', 'Time spent per phase (db, serialize, forecast, llm) by endpoint.')
+metrics.describe('inventiq_db_queries_total', 'SQL statements executed by endpoint.')
+metrics.describe('inventiq_query_budget_exceeded_total', 'Requests that ran more queries than their route budget.')
+metrics.describe('inventiq_assistant_queries_total',
+                 'Assistant questions by intent and whether they were answered directly, by the LLM or by fallback.')
+metrics.describe('inventiq_llm_prompt_tokens_total', 'Prompt tokens Ollama evaluated (tokens served from its prompt cache excluded).')
+metrics.describe('inventiq_llm_generated_tokens_total', 'Tokens Ollama generated.')
+metrics.describe('inventiq_assistant_fallbacks_total',
+                 'LLM questions answered from inventory data instead, by reason (circuit_open, timeout, error).')
+metrics.describe('inventiq_sales_history_flush_seconds', 'Duration of write-behind flushes of sales into historical_sales.')
+metrics.describe('inventiq_sales_history_flushed_total', 'Sales folded into historical_sales by write-behind flushes.')
+metrics.describe('inventiq_idempotent_requests_total',
+                 'Requests with an Idempotency-Key by outcome (executed, replayed from memory or database, '
+                 'in_progress, mismatch).')
+metrics.describe('inventiq_batch_subrequests_total', 'Sub-requests run through POST /api/batch by mode (sequential, parallel).')
+metrics.describe('inventiq_circuit_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open.')
+metrics.describe('inventiq_circuit_transitions_total', 'Circuit breaker state changes by the state entered.')
+metrics.describe('inventiq_circuit_call_seconds', 'Duration of calls through a circuit breaker by outcome (ok, slow, error).')
+
+def _request_timings():
+    """Return the phase -> [seconds, count] map for the current request, if any."""
+    if not has_request_context():
+        return None
+    timings = g.get('_timings')
+    if timings is None:
+        timings = g._timings = defaultdict(lambda: [0.0, 0])
+    return timings
+
+def record_phase(phase, seconds):
+    """Add time spent in a phase to the current request's breakdown."""
+    timings = _request_timings()
+    if timings is not None:
+        timings[phase][0] += seconds
+        timings[phase][1] += 1
+
+@contextmanager
+def timed(phase):
+    """Time a block (or, used as a decorator, a function) as one request phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_query_start')
+    if starts:
+        record_phase('db', time.perf_counter() - starts.pop())
+
+class StackSampler:
+    """Samples the stacks of request threads from a single background thread.
+
+    Stacks are kept in collapsed form ("outer;inner;leaf count") so a slow
+    request's profile can be fed straight to flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+def _write_profile(app, stacks, endpoint, duration_ms):
+    output_dir = app.config.get('PROFILE_OUTPUT_DIR', 'profiles')
+    os.makedirs(output_dir, exist_ok=True)
+
+    timestamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    safe_endpoint = (endpoint or 'unmatched').replace('.', '_')
+    path = os.path.join(output_dir, f"{timestamp}-{safe_endpoint}-{int(duration_ms)}ms.folded")
+    with open(path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    return path
+
+def init_instrumentation(app):
+    """Register per-request timing, Server-Timing headers and metrics collection."""
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+
+    sampler = None
+    if app.config.get('PROFILE_SLOW_REQUESTS', False):
+        sampler = StackSampler(app.config.get('PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000.0)
+
+    @app.before_request
+    def start_request_timer():
+        subrequest = request.environ.get(SUBREQUEST_ENVIRON_KEY, False)
+        if subrequest:
+            # Put the batch's timer aside until the sub-request is torn down
+            request.environ[_PARKED_TIMER_KEY] = (g.pop('_request_start', None), g.pop('_timings', None))
+        g._request_start = time.perf_counter()
+        g._timings = defaultdict(lambda: [0.0, 0])
+        # The batch is sampled as a whole
+        if sampler is not None and not subrequest:
+            sampler.start(threading.get_ident())
+
+    @app.after_request
+    def record_request_timings(response):
+        start = g.pop('_request_start', None)
+        if start is None:
+            return response
+
+        duration = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        timings = _request_timings()
+
+        # Server-Timing: one entry per phase plus the total
+        entries = []
+        for phase, (seconds, count) in sorted(timings.items()):
+            entry = f"{phase};dur={seconds * 1000:.2f}"
+            if phase == 'db':
+                entry += f';desc="{count} queries"'
+            entries.append(entry)
+            metrics.observe('inventiq_request_phase_seconds', seconds,
+                            labels={'endpoint': endpoint, 'phase': phase})
+        entries.append(f"total;dur={duration * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(entries)
+
+        metrics.inc('inventiq_http_requests_total',
+                    labels={'endpoint': endpoint, 'method': request.method, 'status': response.status_code})
+        metrics.observe('inventiq_http_request_duration_seconds', duration, labels={'endpoint': endpoint})
+        queries = timings['db'][1] if 'db' in timings else 0
+        if queries:
+            metrics.inc('inventiq_db_queries_total', queries, labels={'endpoint': endpoint})
+
+        # Routes declare a query budget; going over it usually means an N+1
+        budget = get_query_budget(app.view_functions.get(request.endpoint))
+        if budget is not None and queries > budget:
+            metrics.inc('inventiq_query_budget_exceeded_total', labels={'endpoint': endpoint})
+            current_app.logger.warning(f"{request.method} {request.path} ran {queries} queries "
+                                       f"(budget {budget})")
+
+        if sampler is not None and not request.environ.get(SUBREQUEST_ENVIRON_KEY, False):
+            stacks = sampler.stop(threading.get_ident())
+            duration_ms = duration * 1000
+            if stacks and duration_ms >= app.config.get('PROFILE_SLOW_THRESHOLD_MS', 500):
+                path = _write_profile(app, stacks, request.endpoint, duration_ms)
+                current_app.logger.warning(f"Slow request {request.method} {request.path} "
+                                           f"took {duration_ms:.0f}ms, profile written to {path}")
+
+        return response
+
+    @app.teardown_request
+    def stop_request_sampler(exc):
+        if SUBREQUEST_ENVIRON_KEY in request.environ:
+            if _PARKED_TIMER_KEY not in request.environ:
+                return
+            start, timings = request.environ.pop(_PARKED_TIMER_KEY)
+            g.pop('_request_start', None)
+            g.pop('_timings', None)
+            if start is not None:
+                g._request_start = start
+            if timings is not None:
+                g._timings = timings
+            return
+        # after_request is skipped on unhandled errors, so make sure sampling stops
+        if sampler is not None:
+            sampler.stop(threading.get_ident())
+
+@metrics_bp.route('/metrics', methods=['GET'])
+@query_budget(0)
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
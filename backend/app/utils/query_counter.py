@@ -0,0 +1,68 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+class QueryCounter:
+    """Collects the SQL statements executed while it is active."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def repeated(self, threshold=2):
+        """Statements executed at least `threshold` times - the signature of an N+1."""
+        counts = Counter(self.statements)
+        return {statement: n for statement, n in counts.items() if n >= threshold}
+
+    def report(self):
+        lines = [f"{self.count} queries executed:"]
+        lines.extend(f"  {statement}" for statement in self.statements)
+        return '\n'.join(lines)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_local, 'counters', ()):
+        counter.statements.append(statement)
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed by this thread inside the block.
+
+    with count_queries() as counter:
+        client.get('/api/inventory/')
+    assert counter.count <= 2
+    """
+    counter = QueryCounter()
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL statements a route may execute.
+
+    Budgets include the query made by token_required and must not grow with
+    the size of the catalog. Tests enforce them, and instrumentation logs a
+    warning when a live request goes over.
+    """
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+def get_query_budget(view_function):
+    """Return the budget declared on a view function, or None."""
+    return getattr(view_function, 'query_budget', None)
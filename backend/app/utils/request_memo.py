@@ -0,0 +1,22 @@
+"""
+Memoization for the length of one request.
+
+The memo lives in g, so the sub-requests of a batch (routes/batch.py), which
+share the batch request's g, share it too. Keys must include whatever the
+memoized value depends on, since a write earlier in the batch may have
+changed it.
+"""
+from flask import g, has_request_context
+
+def request_memo():
+    """The current request's memo dict, or None outside a request."""
+    if not has_request_context():
+        return None
+    memo = g.get('_memo')
+    if memo is None:
+        memo = g._memo = {}
+    return memo
+
+def share_request_memo(memo):
+    """Use another request's memo in this one (a batch's sub-requests on worker threads)."""
+    g._memo = memo
@@ -0,0 +1,17 @@
+"""
+ASGI entry point, for deployments that front the app with an ASGI server.
+
+    uvicorn asgi:app --workers 4
+
+The adapter runs each request on a worker thread, so blocking calls such as
+Ollama or forecasts overlap the same way they do under gunicorn's threads.
+Needs asgiref (and an ASGI server), which are not in requirements.txt.
+"""
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:
+    raise ImportError("asgi.py needs asgiref: pip install asgiref uvicorn") from e
+
+from wsgi import app as wsgi_app
+
+app = WsgiToAsgi(wsgi_app)
@@ -0,0 +1,346 @@
+"""
+End-to-end API latency and throughput benchmark.
+
+Seeds a throwaway SQLite database with a configurable catalog and transaction
+history, then drives the API through login, listing, single-product reads,
+transactions, forecast, restock and insights calls. The insights route talks to
+a local Ollama stub, so no model has to be running.
+
+Reports p50/p95/p99 latency and throughput per endpoint as JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.api_load --products 200 --requests 200
+    python -m benchmarks.api_load --products 200000 --mode server --concurrency 8
+    python -m benchmarks.api_load --products 200000 --baseline load.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlalchemy import insert
+
+from config import Config
+
+CATEGORIES = ['Toys', 'Electronics', 'Home & Kitchen', 'Clothing', 'Books', 'Groceries']
+SUPPLIERS = ['Supplier A', 'Supplier B', 'Supplier C', 'Supplier D', 'Supplier E']
+
+ENDPOINTS = [
+    'login',
+    'list_products',
+    'get_product',
+    'transaction_sale',
+    'transaction_restock',
+    'forecast',
+    'restock',
+    'insights',
+]
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate and /api/chat like Ollama, after an optional artificial delay."""
+    delay = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        if self.delay:
+            time.sleep(self.delay)
+
+        if self.path == '/api/chat':
+            reply = {'message': {'role': 'assistant', 'content': 'Stubbed insight.'}, 'done': True}
+        else:
+            reply = {'response': 'Stubbed insight.', 'done': True}
+        body = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_ollama_stub(delay_ms=0):
+    """Start the Ollama stub on a free local port and return (server, base_url)."""
+    handler = type('Handler', (OllamaStubHandler,), {'delay': delay_ms / 1000.0})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def make_config(db_path, ollama_url):
+    """Build a config class pointing at the benchmark database and Ollama stub."""
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+        USE_OLLAMA = True
+        OLLAMA_BASE_URL = ollama_url
+
+    return BenchmarkConfig
+
+def seed_catalog(app, n_products, history_days, n_transactions, seed=42):
+    """Bulk-insert products and transaction history, returning the product IDs."""
+    from main import db, init_db
+    from app.models.inventory import Product, Transaction
+
+    rng = random.Random(seed)
+    init_db(app)
+    product_ids = [f"P{i:06d}" for i in range(1, n_products + 1)]
+
+    with app.app_context():
+        batch_size = 5000
+        now = datetime.utcnow()
+
+        for start in range(0, n_products, batch_size):
+            rows = []
+            for product_id in product_ids[start:start + batch_size]:
+                purchase_price = round(rng.uniform(5, 200), 2)
+                sales = {f"Day-{day}": rng.randint(0, 50) for day in range(1, history_days + 1)}
+                rows.append({
+                    'id': product_id,
+                    'name': f"Product {product_id[1:].lstrip('0')}",
+                    'category': rng.choice(CATEGORIES),
+                    'supplier': rng.choice(SUPPLIERS),
+                    'current_stock': rng.randint(0, 500) + 1000000,
+                    'reorder_level': rng.randint(10, 100),
+                    'purchase_price': purchase_price,
+                    'selling_price': round(purchase_price * rng.uniform(1.1, 1.8), 2),
+                    'lead_time': rng.randint(1, 14),
+                    'historical_sales': json.dumps(sales),
+                    'created_at': now,
+                    'updated_at': now,
+                })
+            db.session.execute(insert(Product), rows)
+
+        for start in range(0, n_transactions, batch_size):
+            rows = []
+            for _ in range(min(batch_size, n_transactions - start)):
+                rows.append({
+                    'product_id': rng.choice(product_ids),
+                    'transaction_type': rng.choice(['sale', 'sale', 'sale', 'restock']),
+                    'quantity': rng.randint(1, 20),
+                    'transaction_date': now - timedelta(minutes=rng.randint(0, history_days * 1440)),
+                })
+            db.session.execute(insert(Transaction), rows)
+
+        db.session.commit()
+
+    return product_ids
+
+class FlaskClientDriver:
+    """Sends requests through the Flask test client (no network)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, json=json_body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpDriver:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip('/')
+        self.requests = requests
+        self.local = threading.local()
+
+    def request(self, method, path, json_body=None, headers=None):
+        if not hasattr(self.local, 'session'):
+            self.local.session = self.requests.Session()
+        response = self.local.session.request(method, self.base_url + path, json=json_body, headers=headers)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+def start_local_server(app):
+    """Serve the app with the threaded werkzeug server on a free local port."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+def build_request(endpoint, product_ids, rng):
+    """Return (method, path, json_body) for one call to the given endpoint."""
+    product_id = rng.choice(product_ids)
+
+    if endpoint == 'login':
+        return 'POST', '/api/auth/login', {'username': 'admin', 'password': 'admin123', 'role': 'admin'}
+    if endpoint == 'list_products':
+        return 'GET', '/api/inventory/', None
+    if endpoint == 'get_product':
+        return 'GET', f"/api/inventory/{product_id}", None
+    if endpoint == 'transaction_sale':
+        return 'POST', '/api/inventory/transaction', {
+            'product_id': product_id, 'transaction_type': 'sale', 'quantity': rng.randint(1, 5)}
+    if endpoint == 'transaction_restock':
+        return 'POST', '/api/inventory/transaction', {
+            'product_id': product_id, 'transaction_type': 'restock', 'quantity': rng.randint(10, 50)}
+    if endpoint == 'forecast':
+        return 'GET', f"/api/predictions/forecast/{product_id}?days=30", None
+    if endpoint == 'restock':
+        return 'GET', f"/api/predictions/restock/{product_id}", None
+    if endpoint == 'insights':
+        return 'POST', '/api/predictions/insights', {'query': 'What is low on stock?', 'product_id': product_id}
+
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def run_endpoint(driver, endpoint, n_requests, concurrency, token, product_ids, seed):
+    """Fire n_requests at one endpoint and summarize the latencies."""
+    headers = {'Authorization': token}
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(seed + worker_id)
+        count = n_requests // concurrency + (1 if worker_id < n_requests % concurrency else 0)
+        for _ in range(count):
+            method, path, body = build_request(endpoint, product_ids, rng)
+            start = time.perf_counter()
+            status, _ = driver.request(method, path, body, headers)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': to_ms(percentile(latencies, 50)),
+        'p95_ms': to_ms(percentile(latencies, 95)),
+        'p99_ms': to_ms(percentile(latencies, 99)),
+        'mean_ms': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        'throughput_rps': round(len(latencies) / wall, 2) if wall else None,
+    }
+
+def compare_to_baseline(report, baseline, tolerance):
+    """Return a list of p95 latency regressions against a previous report."""
+    regressions = []
+    for name, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or not previous.get('p95_ms') or current['p95_ms'] is None:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark API latency and throughput per endpoint.')
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--history-days', type=int, default=30)
+    parser.add_argument('--transactions', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+    parser.add_argument('--list-requests', type=int, default=20,
+                        help='Requests for the full-catalog endpoints (listing, insights)')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--mode', choices=['client', 'server'], default='client',
+                        help='Use the Flask test client or a local threaded server')
+    parser.add_argument('--endpoints', nargs='*', choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument('--ollama-delay-ms', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='Compare p95 latency against a previous JSON report')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    from main import create_app
+
+    workdir = tempfile.mkdtemp(prefix='inventiq-bench-')
+    stub, ollama_url = start_ollama_stub(args.ollama_delay_ms)
+    server = None
+
+    try:
+        app = create_app(make_config(os.path.join(workdir, 'bench.db'), ollama_url))
+
+        seed_start = time.perf_counter()
+        product_ids = seed_catalog(app, args.products, args.history_days, args.transactions, seed=args.seed)
+        seed_seconds = time.perf_counter() - seed_start
+        print(f"Seeded {args.products} products and {args.transactions} transactions in {seed_seconds:.2f}s",
+              file=sys.stderr)
+
+        if args.mode == 'server':
+            server, base_url = start_local_server(app)
+            driver = HttpDriver(base_url)
+        else:
+            driver = FlaskClientDriver(app)
+
+        status, body = driver.request('POST', '/api/auth/login',
+                                      {'username': 'admin', 'password': 'admin123', 'role': 'admin'})
+        if status != 200:
+            raise RuntimeError(f"Login failed with status {status}: {body}")
+        token = body['token']
+
+        report = {
+            'products': args.products,
+            'transactions': args.transactions,
+            'mode': args.mode,
+            'concurrency': args.concurrency,
+            'seed_seconds': round(seed_seconds, 3),
+            'endpoints': {},
+        }
+        for endpoint in args.endpoints:
+            n_requests = args.list_requests if endpoint in ('list_products', 'insights') else args.requests
+            report['endpoints'][endpoint] = run_endpoint(
+                driver, endpoint, n_requests, args.concurrency, token, product_ids, args.seed)
+            print(f"{endpoint}: {report['endpoints'][endpoint]}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.shutdown()
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Rolling-origin backtest of every forecasting method in ml_service.
+
+Runs each method in ml_service.FORECAST_METHODS over the whole catalog at once
+(products x days matrix) and reports MAPE, MASE and bias together with the
+wall-clock time and peak memory each method needed.
+
+Usage (from the backend directory):
+    python -m benchmarks.forecast_backtest --products 100000 --days 730
+    python -m benchmarks.forecast_backtest --source db --output backtest.json
+    python -m benchmarks.forecast_backtest --source store --days 365
+    python -m benchmarks.forecast_backtest --baseline backtest.json
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.services.ml_service import FORECAST_METHODS, parse_sales_history
+
+def generate_sales_matrix(n_products, n_days, seed=42, chunk_size=10000):
+    """Generate a synthetic products x days int32 sales matrix.
+
+    Each product gets a log-normal base level, a weekly pattern, a linear
+    trend and Poisson noise. Rows are generated in chunks so 100k SKUs x
+    2 years stays within a few hundred MB.
+    """
+    rng = np.random.default_rng(seed)
+    sales = np.empty((n_products, n_days), dtype=np.int32)
+    day_index = np.arange(n_days, dtype=np.float64)
+
+    for start in range(0, n_products, chunk_size):
+        stop = min(start + chunk_size, n_products)
+        rows = stop - start
+
+        level = rng.lognormal(mean=1.5, sigma=1.0, size=(rows, 1))
+        weekly_amplitude = rng.uniform(0.0, 0.4, size=(rows, 1))
+        phase = rng.uniform(0, 2 * np.pi, size=(rows, 1))
+        trend = rng.normal(0.0, 0.5 / n_days, size=(rows, 1))
+
+        rate = level * (1 + weekly_amplitude * np.sin(2 * np.pi * day_index / 7 + phase))
+        rate *= np.clip(1 + trend * day_index, 0.1, None)
+        sales[start:stop] = rng.poisson(rate)
+
+    return sales
+
+def load_catalog_matrix():
+    """Build a products x days sales matrix from the live product catalog."""
+    from main import create_app
+    from app.models.inventory import Product
+
+    app = create_app()
+    with app.app_context():
+        rows = Product.query.with_entities(Product.historical_sales).all()
+
+    series = [[quantity for _, quantity in parse_sales_history(row.historical_sales)] for row in rows]
+    n_days = max((len(s) for s in series), default=0)
+
+    # Right-align the histories so every product ends on the same day
+    sales = np.zeros((len(series), n_days), dtype=np.int32)
+    for i, s in enumerate(series):
+        if s:
+            sales[i, n_days - len(s):] = s
+
+    return sales
+
+def load_store_matrix(n_days):
+    """Last n_days of the memory-mapped sales store, dated so every product ends today."""
+    from main import create_app
+    from app.services.sales_store import get_sales_store
+
+    app = create_app()
+    with app.app_context():
+        store = get_sales_store()
+    if store is None:
+        raise SystemExit("Sales store not built; run rebuild_sales_store.py first")
+
+    # Pages in lazily from the shared mapping instead of parsing JSON per product
+    return store.matrix(n_days)
+
+def rolling_origins(n_days, horizon, folds):
+    """Return the forecast origins for a rolling-origin evaluation."""
+    origins = [n_days - horizon * (folds - i) for i in range(folds)]
+    return [origin for origin in origins if origin >= 2]
+
+def naive_scales(sales, origins):
+    """In-sample one-step naive MAE per product for each origin (the MASE denominator)."""
+    step_error = np.abs(np.diff(sales, axis=1)).astype(np.float64)
+    cumulative = np.cumsum(step_error, axis=1)
+    return {origin: cumulative[:, origin - 2] / (origin - 1) for origin in origins}
+
+def evaluate_method(method, sales, origins, horizon, scales):
+    """Backtest one method across all origins and return its metrics."""
+    abs_pct_error_sum = 0.0
+    abs_pct_error_count = 0
+    error_sum = 0.0
+    actual_sum = 0.0
+    mase_sum = 0.0
+    mase_count = 0
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    for origin in origins:
+        train = sales[:, :origin]
+        actual = sales[:, origin:origin + horizon].astype(np.float64)
+        forecast = method(train, horizon)
+
+        error = forecast - actual
+        abs_error = np.abs(error)
+
+        # MAPE is undefined on zero-demand days, so those are skipped
+        nonzero = actual > 0
+        abs_pct_error_sum += float((abs_error[nonzero] / actual[nonzero]).sum())
+        abs_pct_error_count += int(nonzero.sum())
+
+        error_sum += float(error.sum())
+        actual_sum += float(actual.sum())
+
+        # MASE scales by the in-sample one-step naive error of each product
+        scale = scales[origin]
+        scaled = scale > 0
+        mase_sum += float((abs_error.mean(axis=1)[scaled] / scale[scaled]).sum())
+        mase_count += int(scaled.sum())
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    forecasts = sales.shape[0] * len(origins)
+    return {
+        'mape': round(100 * abs_pct_error_sum / abs_pct_error_count, 4) if abs_pct_error_count else None,
+        'mase': round(mase_sum / mase_count, 4) if mase_count else None,
+        'bias_pct': round(100 * error_sum / actual_sum, 4) if actual_sum else None,
+        'seconds': round(elapsed, 4),
+        'forecasts_per_second': round(forecasts / elapsed, 1) if elapsed else None,
+        'peak_memory_mb': round(peak / (1024 * 1024), 2),
+    }
+
+def run_backtest(sales, horizon=14, folds=4, methods=None):
+    """Run every requested method over the sales matrix."""
+    origins = rolling_origins(sales.shape[1], horizon, folds)
+    if not origins:
+        raise ValueError('Not enough history for the requested horizon and folds')
+
+    # Computed once up front so it doesn't count against any method's time or memory
+    scales = naive_scales(sales, origins)
+
+    methods = methods or list(FORECAST_METHODS)
+    results = {}
+    for name in methods:
+        results[name] = evaluate_method(FORECAST_METHODS[name], sales, origins, horizon, scales)
+
+    return {
+        'products': int(sales.shape[0]),
+        'days': int(sales.shape[1]),
+        'horizon': horizon,
+        'origins': origins,
+        'methods': results,
+    }
+
+def compare_to_baseline(report, baseline, tolerance):
+    """Return a list of regressions against a previous report."""
+    regressions = []
+    for name, current in report['methods'].items():
+        previous = baseline.get('methods', {}).get(name)
+        if not previous:
+            continue
+
+        # Accuracy regressions: MASE going up
+        if current['mase'] is not None and previous.get('mase'):
+            if current['mase'] > previous['mase'] * (1 + tolerance):
+                regressions.append(f"{name}: MASE {previous['mase']} -> {current['mase']}")
+
+        # Throughput regressions: wall-clock time going up
+        if previous.get('seconds'):
+            if current['seconds'] > previous['seconds'] * (1 + tolerance):
+                regressions.append(f"{name}: time {previous['seconds']}s -> {current['seconds']}s")
+
+    return regressions
+
+def print_report(report):
+    """Print a human-readable summary table."""
+    print(f"Backtest: {report['products']} products x {report['days']} days, "
+          f"horizon {report['horizon']}, origins {report['origins']}")
+    print(f"{'method':<16}{'MAPE %':>10}{'MASE':>10}{'bias %':>10}{'seconds':>10}{'peak MB':>10}")
+    for name, m in report['methods'].items():
+        print(f"{name:<16}{str(m['mape']):>10}{str(m['mase']):>10}{str(m['bias_pct']):>10}"
+              f"{m['seconds']:>10}{m['peak_memory_mb']:>10}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest forecasting methods across the catalog.')
+    parser.add_argument('--source', choices=['synthetic', 'db', 'store'], default='synthetic')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--horizon', type=int, default=14)
+    parser.add_argument('--folds', type=int, default=4)
+    parser.add_argument('--methods', nargs='*', choices=list(FORECAST_METHODS))
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='Compare against a previous JSON report')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Allowed relative regression against the baseline')
+    args = parser.parse_args(argv)
+
+    if args.source == 'synthetic':
+        start = time.perf_counter()
+        sales = generate_sales_matrix(args.products, args.days, seed=args.seed)
+        print(f"Generated {sales.shape[0]}x{sales.shape[1]} sales matrix in {time.perf_counter() - start:.2f}s")
+    elif args.source == 'store':
+        sales = load_store_matrix(args.days)
+    else:
+        sales = load_catalog_matrix()
+
+    report = run_backtest(sales, horizon=args.horizon, folds=args.folds, methods=args.methods)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
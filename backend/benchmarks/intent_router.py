@@ -0,0 +1,148 @@
+"""
+Routing accuracy and latency of the assistant's intent router.
+
+Seeds an in-memory catalog, runs a labelled set of questions through
+intent_router.classify and answer, and reports, for a sweep of confidence
+thresholds, how many structured questions were answered directly with the
+right intent, how many were wrongly answered directly, and how many
+open-ended questions were correctly left to the LLM. Latency is the time
+to classify and answer a question (the LLM path takes seconds).
+
+Usage (from the backend directory):
+    python -m benchmarks.intent_router --thresholds 0.3 0.5 0.7
+"""
+import argparse
+import json
+import sys
+import time
+
+from config import Config
+from main import create_app, db, init_db
+from app.models.inventory import Product
+from app.services.intent_router import answer, classify
+
+PRODUCTS = [
+    ('G0001', 'Blue Garden Chair', 'Garden', 4), ('G0002', 'Garden Hose', 'Garden', 60),
+    ('G0003', 'Steel Rake', 'Garden', 0), ('T0001', 'Red Kite', 'Toys', 35), ('T0002', 'Wooden Train', 'Toys', 2),
+    ('T0003', 'Puzzle Box', 'Toys', 80), ('K0001', 'Electric Kettle', 'Kitchen', 12),
+    ('K0002', 'Chef Knife', 'Kitchen', 0), ('K0003', 'Coffee Mug', 'Kitchen', 150),
+    ('B0001', 'Travel Guide', 'Books', 40), ('B0002', 'Cookbook', 'Books', 9),
+]
+
+# (question, expected intent); None means the question should go to the LLM
+LABELLED = [
+    ("What's low on stock?", 'low_stock'),
+    ('what is low on stock?', 'low_stock'),
+    ('Which items are running low?', 'low_stock'),
+    ('Show me products below their reorder level', 'low_stock'),
+    ('What needs restocking?', 'low_stock'),
+    ('What should we restock?', 'low_stock'),
+    ('Which garden products are low on stock?', 'low_stock'),
+    ('Any toys running out?', 'low_stock'),
+    ('What is out of stock?', 'out_of_stock'),
+    ('Which products are sold out?', 'out_of_stock'),
+    ('Do we have any stockouts in kitchen?', 'out_of_stock'),
+    ("What's trending?", 'trending'),
+    ('Show me the top 3 trending products', 'trending'),
+    ('Which products are popular right now?', 'trending'),
+    ('What are our best sellers?', 'trending'),
+    ('Which products are declining?', 'trending'),
+    ('What is trending down in toys?', 'trending'),
+    ('What is selling fast?', 'trending'),
+    ('How much Garden Hose do we have?', 'stock_level'),
+    ('How many red kites are left?', 'stock_level'),
+    ('How many units of the electric kettle are in stock?', 'stock_level'),
+    ('What is the stock level of T0002?', 'stock_level'),
+    ('How many toys do we have?', 'stock_level'),
+    ('Current stock for chef knife', 'stock_level'),
+    ('How much of P9999 do we have?', 'stock_level'),
+    ('How many coffee mugs should we order?', 'restock'),
+    ('Restock recommendation for G0001', 'restock'),
+    ('How much should I reorder for the wooden train?', 'restock'),
+    ('What quantity of cookbook should we buy?', 'restock'),
+    ('Reorder quantity for K0001', 'restock'),
+    ('Forecast demand for the red kite next 14 days', 'forecast'),
+    ('How many garden hoses will we sell next week?', 'forecast'),
+    ('Predict sales of T0003 for 30 days', 'forecast'),
+    ('What is the expected demand for coffee mug?', 'forecast'),
+    ('What sells like G0002?', 'similar'),
+    ('Show products similar to the electric kettle', 'similar'),
+    ('Which products are similar to K0003?', 'similar'),
+    ('How many products do we have?', 'overview'),
+    ('Give me an inventory summary', 'overview'),
+    ('What categories do we carry?', 'overview'),
+    ('Why are garden sales dropping this month?', None),
+    ('Explain why the red kite is trending', None),
+    ('What strategy should we use for the holiday season?', None),
+    ('How can we improve our inventory turnover?', None),
+    ('Should we discontinue slow-moving books?', None),
+    ('Write a short note to the supplier about late deliveries', None),
+    ('What if the kettle supplier doubles its lead time?', None),
+    ('Compare the kitchen and garden categories for me', None),
+    ('Which low stock items are trending?', None),
+    ('Hello!', None),
+    ('What do you think about our pricing?', None),
+    ('Can you give advice on reducing dead stock?', None),
+]
+
+class BenchmarkConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SALES_STORE_ENABLED = False
+    TREND_REFRESH_SECONDS = 0
+
+def seed():
+    for product_id, name, category, stock in PRODUCTS:
+        history = {f'Day-{day}': (day % 7 + 1) * (3 if product_id == 'T0001' and day > 76 else 1)
+                   for day in range(1, 91)}
+        db.session.add(Product(id=product_id, name=name, category=category, supplier='Acme', current_stock=stock,
+                               reorder_level=10, purchase_price=5.0, selling_price=9.0, lead_time=5,
+                               historical_sales=json.dumps(history)))
+    db.session.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure intent routing accuracy and latency.')
+    parser.add_argument('--thresholds', type=float, nargs='*', default=[0.15, 0.3, 0.4, 0.5, 0.6, 0.7])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    app = create_app(BenchmarkConfig)
+    init_db(app)
+    with app.app_context():
+        seed()
+        routes = [classify(question) for question, _ in LABELLED]
+        if args.verbose:
+            for (question, expected), route in zip(LABELLED, routes):
+                print(f'{str(expected):13} {str(route.intent):13} {route.confidence:5.2f}  {question}  {route.slots}')
+
+        structured = sum(1 for _, expected in LABELLED if expected)
+        open_ended = len(LABELLED) - structured
+        print(f'{len(LABELLED)} questions: {structured} structured, {open_ended} open-ended')
+        print('threshold  answered correctly  answered wrongly  open-ended left to LLM')
+        for threshold in args.thresholds:
+            correct = wrong = deferred = 0
+            for (_, expected), route in zip(LABELLED, routes):
+                direct = route.intent is not None and route.confidence >= threshold
+                if direct and route.intent == expected:
+                    correct += 1
+                elif direct:
+                    wrong += 1
+                elif expected is None:
+                    deferred += 1
+            print(f'{threshold:9.2f}  {correct:>8}/{structured:<9} {wrong:>16}  {deferred:>14}/{open_ended}')
+
+        timings = []
+        for _ in range(args.repeat):
+            for question, _ in LABELLED:
+                started = time.perf_counter()
+                route = classify(question)
+                if route.intent:
+                    answer(route)
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f'classify + answer: median {timings[len(timings) // 2] * 1000:.2f} ms, '
+              f'p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
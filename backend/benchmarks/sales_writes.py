@@ -0,0 +1,114 @@
+"""
+Cost of recording sales with and without the sales-history write-behind.
+
+Seeds a throwaway SQLite database whose products carry --history-days of
+sales history, then has --threads threads record --sales sales through the
+transaction endpoint, once writing historical_sales inline and once through
+the write-behind buffer. Reports throughput and latency percentiles, and
+counts the sales missing from historical_sales at the end: writing the JSON
+inline, concurrent sales of the same product can overwrite each other.
+
+Usage (from the backend directory):
+    python -m benchmarks.sales_writes --products 2000 --sales 4000 --threads 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select
+
+from config import Config
+from main import create_app, db, init_db
+from app.models.inventory import Product
+from app.services import sales_history
+
+def seed(count, history_days):
+    start = date.today() - timedelta(days=history_days)
+    history = json.dumps({(start + timedelta(days=day)).isoformat(): day % 9 for day in range(history_days)})
+    db.session.execute(insert(Product), [{
+        'id': f'P{number:06d}', 'name': f'Product {number}', 'category': 'Toys', 'supplier': 'Acme',
+        'current_stock': 10 ** 9, 'reorder_level': 10, 'purchase_price': 1.0, 'selling_price': 2.0,
+        'lead_time': 5, 'historical_sales': history,
+    } for number in range(count)])
+    db.session.commit()
+
+def missing(product_ids, histories):
+    """Sales recorded today that the products' historical_sales do not show."""
+    today = date.today().isoformat()
+    sold = {}
+    for product_id in product_ids:
+        sold[product_id] = sold.get(product_id, 0) + 1
+    return sum(count - json.loads(histories[product_id]).get(today, 0) for product_id, count in sold.items())
+
+def run(write_behind, args):
+    rng = random.Random(0)
+    # Sales skew towards a few hot products, as they do in a real shop
+    product_ids = [f'P{min(int(rng.paretovariate(1.2)) - 1, args.products - 1):06d}' for _ in range(args.sales)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchmarkConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(directory, 'sales.db')
+            USE_OLLAMA = False
+            SALES_STORE_ENABLED = False
+            PROFILE_SLOW_REQUESTS = False
+            SALES_HISTORY_WRITE_BEHIND = write_behind
+
+        app = create_app(BenchmarkConfig)
+        init_db(app)
+        with app.app_context():
+            seed(args.products, args.history_days)
+        token = app.test_client().post('/api/auth/login', json={
+            'username': 'admin', 'password': 'admin123', 'role': 'admin'}).get_json()['token']
+
+        local = threading.local()
+
+        def sell(product_id):
+            if not hasattr(local, 'client'):
+                local.client = app.test_client()
+            started = time.perf_counter()
+            response = local.client.post('/api/inventory/transaction', headers={'Authorization': token}, json={
+                'product_id': product_id, 'transaction_type': 'sale', 'quantity': 1})
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            results = list(pool.map(sell, product_ids))
+        elapsed = time.perf_counter() - started
+        sales_history.buffer.flush()
+
+        with app.app_context():
+            histories = dict(db.session.execute(select(Product.id, Product.historical_sales)).all())
+            db.session.remove()
+            db.engine.dispose()
+
+    timings = sorted(duration for duration, _ in results)
+    failed = sum(1 for _, status in results if status != 201)
+    return {
+        'sales_per_second': round(len(results) / elapsed, 1),
+        'p50_ms': round(timings[len(timings) // 2] * 1000, 2),
+        'p99_ms': round(timings[int(len(timings) * 0.99)] * 1000, 2),
+        'failed': failed,
+        'missing_from_history': missing(product_ids, histories),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare inline and write-behind sales history updates.')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--history-days', type=int, default=730)
+    parser.add_argument('--sales', type=int, default=4000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    for label, write_behind in (('inline', False), ('write-behind', True)):
+        print(f'{label:13}', json.dumps(run(write_behind, args)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Latency of product search on a large synthetic catalog.
+
+Builds a throwaway SQLite database with --products products (names drawn from
+a small vocabulary so common words match many rows), indexes it, and times
+search_products for a few typical queries.
+
+Usage (from the backend directory):
+    python -m benchmarks.search --products 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from config import Config
+from main import create_app, db
+from app.models.inventory import Product
+from app.services.search_service import rebuild_search_index, search_products
+
+ADJECTIVES = ['Blue', 'Red', 'Green', 'Large', 'Small', 'Wooden', 'Steel', 'Classic', 'Deluxe', 'Compact',
+              'Garden', 'Kitchen', 'Outdoor', 'Travel', 'Smart']
+NOUNS = ['Chair', 'Table', 'Lamp', 'Kettle', 'Hose', 'Train', 'Kite', 'Backpack', 'Speaker', 'Blanket',
+         'Notebook', 'Puzzle', 'Drill', 'Mug', 'Watch', 'Helmet', 'Rake', 'Shelf', 'Pillow', 'Camera']
+CATEGORIES = ['Toys', 'Books', 'Garden', 'Kitchen', 'Electronics', 'Sports', 'Office', 'Home']
+QUERIES = ['blue chair', 'p0123', 'kit', 'garden hose', 'deluxe steel ca', 'supplier 7']
+
+def populate(count, seed=0):
+    rng = random.Random(seed)
+    batch = []
+    for number in range(count):
+        batch.append({
+            'id': f'P{number:07d}',
+            'name': f'{rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {number % 1000}',
+            'category': rng.choice(CATEGORIES),
+            'supplier': f'Supplier {rng.randrange(200)}',
+            'current_stock': 10, 'reorder_level': 5, 'purchase_price': 1.0, 'selling_price': 2.0,
+            'lead_time': 5, 'historical_sales': '{}',
+        })
+        if len(batch) == 50000:
+            db.session.execute(Product.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Product.__table__.insert(), batch)
+    db.session.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time FTS5 product search.')
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        class BenchmarkConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(directory, 'search.db')
+
+        app = create_app(BenchmarkConfig)
+        with app.app_context():
+            db.create_all()
+            started = time.perf_counter()
+            populate(args.products)
+            print(f'inserted {args.products} products in {time.perf_counter() - started:.1f}s')
+            started = time.perf_counter()
+            rebuild_search_index(db.session)
+            print(f'built the index in {time.perf_counter() - started:.1f}s')
+
+            for query in QUERIES:
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    products, total, exact = search_products(query, per_page=20)
+                    timings.append(time.perf_counter() - started)
+                timings.sort()
+                print(f'{query!r:<20} {total:>8}{" " if exact else "+"} matches  median {timings[len(timings) // 2] * 1000:7.2f} ms  '
+                      f'max {timings[-1] * 1000:7.2f} ms')
+            db.session.remove()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
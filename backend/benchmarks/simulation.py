@@ -0,0 +1,50 @@
+"""
+Throughput of the Monte Carlo restock simulation.
+
+Simulates a synthetic catalog (see forecast_backtest.generate_sales_matrix)
+under a simple (s, Q) policy and reports wall-clock time per worker count.
+
+Usage (from the backend directory):
+    python -m benchmarks.simulation --products 2000 --paths 10000 --workers 1 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.services.restock_optimizer import DEFAULTS
+from app.services.ml_service import safety_stock
+from app.services.simulation_service import simulate
+from benchmarks.forecast_backtest import generate_sales_matrix
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the Monte Carlo stockout simulation.')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--paths', type=int, default=10000)
+    parser.add_argument('--horizon', type=int, default=30)
+    parser.add_argument('--distribution', choices=['empirical', 'fitted'], default='empirical')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args(argv)
+
+    history = generate_sales_matrix(args.products, 90)
+    rng = np.random.default_rng(0)
+    lead_time = rng.integers(1, 15, args.products)
+    mean, std = history.mean(axis=1), history.std(axis=1)
+    reorder_point = mean * lead_time + safety_stock(std, lead_time, DEFAULTS['service_level'])
+    order_quantity = np.maximum(mean * 14, 1)
+    stock = np.round(reorder_point + order_quantity / 2).astype(np.int64)
+
+    cells = args.products * args.paths * args.horizon
+    for workers in args.workers:
+        started = time.perf_counter()
+        outcome = simulate(history, stock, lead_time, reorder_point, order_quantity, args.paths,
+                           args.horizon, args.distribution, seed=1, workers=workers)
+        elapsed = time.perf_counter() - started
+        print(f"workers={workers:<3} {elapsed:8.2f}s  {cells / elapsed / 1e6:8.1f}M product-path-days/s  "
+              f"mean stockout probability {outcome['stockout_probability'].mean():.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
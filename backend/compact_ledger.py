@@ -0,0 +1,34 @@
+"""
+Fold old sale/restock transactions into the daily sales aggregates.
+
+Run it from cron (daily is plenty):
+
+    python compact_ledger.py                  # keep LEDGER_RETENTION_DAYS of raw rows
+    python compact_ledger.py --retention-days 90 --dry-run
+"""
+import argparse
+
+from main import create_app
+from app.services.ledger_service import compact_ledger
+
+def main():
+    app = create_app()
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--retention-days', type=int, default=app.config['LEDGER_RETENTION_DAYS'],
+                        help='days of raw transactions to keep')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be compacted')
+    args = parser.parse_args()
+
+    with app.app_context():
+        result = compact_ledger(args.retention_days, dry_run=args.dry_run)
+
+    if result['dry_run']:
+        print(f"Would compact {result['transactions']} transactions before {result['compacted_before']}")
+    elif result['previous_watermark'] and result['compacted_before'] <= result['previous_watermark']:
+        print(f"Nothing to do, already compacted up to {result['previous_watermark']}")
+    else:
+        print(f"Compacted {result['transactions']} transactions before {result['compacted_before']}")
+
+if __name__ == '__main__':
+    main()
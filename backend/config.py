@@ -17,4 +17,89 @@ class Config:
     USE_OLLAMA = os.environ.get('USE_OLLAMA', 'True').lower() in ('true', '1', 't')
     OLLAMA_BASE_URL = os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434')
     OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'llama3')
+    OLLAMA_TIMEOUT = float(os.environ.get('OLLAMA_TIMEOUT', 60))
+    OLLAMA_CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', 2.0))
+    # The LLM circuit opens after this many failed (or slower than LLM_SLOW_CALL_SECONDS) calls in a row,
+    # and questions are answered from inventory data until a probe succeeds LLM_BREAKER_RESET_SECONDS later
+    LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 3))
+    LLM_BREAKER_RESET_SECONDS = float(os.environ.get('LLM_BREAKER_RESET_SECONDS', 30))
+    LLM_SLOW_CALL_SECONDS = float(os.environ.get('LLM_SLOW_CALL_SECONDS', 20))
+    # How long Ollama keeps the model and its prompt cache loaded between questions (seconds or '30m');
+    # OLLAMA_WARM_UP loads the model when the app starts instead of on the first question
+    OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')
+    OLLAMA_WARM_UP = os.environ.get('OLLAMA_WARM_UP', 'True').lower() in ('true', '1', 't')
 
+    # Assistant conversations: idle expiry, sessions kept per user, exchanges kept per session,
+    # and how old the inventory summary in a session's system prompt may get before it is refreshed
+    ASSISTANT_SESSION_TTL_SECONDS = int(os.environ.get('ASSISTANT_SESSION_TTL_SECONDS', 1800))
+    ASSISTANT_SESSIONS_PER_USER = int(os.environ.get('ASSISTANT_SESSIONS_PER_USER', 20))
+    ASSISTANT_SESSION_MAX_TURNS = int(os.environ.get('ASSISTANT_SESSION_MAX_TURNS', 10))
+    ASSISTANT_SUMMARY_MAX_AGE_SECONDS = int(os.environ.get('ASSISTANT_SUMMARY_MAX_AGE_SECONDS', 300))
+
+    # Assistant questions the intent router is at least this confident about are answered without the LLM;
+    # with USE_OLLAMA off the lower fallback threshold applies
+    ROUTER_CONFIDENCE = float(os.environ.get('ROUTER_CONFIDENCE', 0.5))
+    ROUTER_FALLBACK_CONFIDENCE = float(os.environ.get('ROUTER_FALLBACK_CONFIDENCE', 0.15))
+
+    # Instrumentation and profiling
+    INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', 'True').lower() in ('true', '1', 't')
+    PROFILE_SLOW_REQUESTS = os.environ.get('PROFILE_SLOW_REQUESTS', 'False').lower() in ('true', '1', 't')
+    PROFILE_SLOW_THRESHOLD_MS = int(os.environ.get('PROFILE_SLOW_THRESHOLD_MS', 500))
+    PROFILE_SAMPLE_INTERVAL_MS = int(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5))
+    PROFILE_OUTPUT_DIR = os.environ.get('PROFILE_OUTPUT_DIR', 'profiles')
+
+    # Dashboard aggregates (top movers, trends) are cached for this many seconds
+    DASHBOARD_CACHE_SECONDS = int(os.environ.get('DASHBOARD_CACHE_SECONDS', 30))
+
+    # Stock alert stream
+    ALERT_HEARTBEAT_SECONDS = int(os.environ.get('ALERT_HEARTBEAT_SECONDS', 15))
+    ALERT_STREAM_MAX_SECONDS = int(os.environ.get('ALERT_STREAM_MAX_SECONDS', 300))
+    ALERT_BATCH_LIMIT = int(os.environ.get('ALERT_BATCH_LIMIT', 100))
+    # Lifetime of the stream-only tokens event streams pass in the query string
+    STREAM_TOKEN_SECONDS = int(os.environ.get('STREAM_TOKEN_SECONDS', 60))
+
+    # Readiness probes (/api/ready) are re-run at most this often
+    READINESS_CACHE_SECONDS = int(os.environ.get('READINESS_CACHE_SECONDS', 5))
+    READINESS_OLLAMA_TIMEOUT = float(os.environ.get('READINESS_OLLAMA_TIMEOUT', 1.0))
+
+    # Raw sale/restock transactions older than this are folded into daily aggregates by compact_ledger.py
+    LEDGER_RETENTION_DAYS = int(os.environ.get('LEDGER_RETENTION_DAYS', 365))
+
+    # In-memory catalog snapshot checks the database for other processes' writes at most this often
+    CATALOG_SNAPSHOT_CHECK_SECONDS = float(os.environ.get('CATALOG_SNAPSHOT_CHECK_SECONDS', 1))
+    # Stock changed by other workers is read back from products updated this long before the last one seen
+    CATALOG_SNAPSHOT_LAG_SECONDS = float(os.environ.get('CATALOG_SNAPSHOT_LAG_SECONDS', 5))
+
+    # Memory-mapped products x days sales matrix shared by all workers (relative to the instance folder)
+    SALES_STORE_ENABLED = os.environ.get('SALES_STORE_ENABLED', 'true').lower() == 'true'
+    SALES_STORE_DIR = os.environ.get('SALES_STORE_DIR', 'sales_store')
+
+    # Idempotency-Key responses are kept this long in the database, and the most recent ones in memory per worker
+    IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 86400))
+    IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10000))
+    IDEMPOTENCY_PRUNE_SECONDS = int(os.environ.get('IDEMPOTENCY_PRUNE_SECONDS', 300))
+    # A key claimed this long ago without a stored response belongs to a worker that died after its write committed
+    IDEMPOTENCY_IN_PROGRESS_SECONDS = int(os.environ.get('IDEMPOTENCY_IN_PROGRESS_SECONDS', 30))
+    # POST /api/batch runs at most BATCH_MAX_REQUESTS sub-requests, parallel ones on BATCH_WORKERS threads
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+
+    # Sales reach Product.historical_sales in batches: every SALES_HISTORY_FLUSH_MS or SALES_HISTORY_FLUSH_EVENTS
+    # sales per worker; sales pending longer than SALES_HISTORY_REPLAY_SECONDS (a worker died) are swept up too
+    SALES_HISTORY_WRITE_BEHIND = os.environ.get('SALES_HISTORY_WRITE_BEHIND', 'true').lower() == 'true'
+    SALES_HISTORY_FLUSH_MS = int(os.environ.get('SALES_HISTORY_FLUSH_MS', 500))
+    SALES_HISTORY_FLUSH_EVENTS = int(os.environ.get('SALES_HISTORY_FLUSH_EVENTS', 200))
+    SALES_HISTORY_REPLAY_SECONDS = int(os.environ.get('SALES_HISTORY_REPLAY_SECONDS', 60))
+
+    # Product trends (app/services/trend_service.py) check for new sales at most this often
+    TREND_REFRESH_SECONDS = int(os.environ.get('TREND_REFRESH_SECONDS', 60))
+
+    # Processes for Monte Carlo restock simulations on the whole host (0: one per CPU), shared out between the
+    # WEB_CONCURRENCY web workers (set by gunicorn.conf.py to its worker count) so their pools together stay within it
+    SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', 0))
+    WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+    # Largest simulation accepted, in products x paths x horizon days
+    SIMULATION_MAX_CELLS = int(os.environ.get('SIMULATION_MAX_CELLS', 500_000_000))
+
+    # Similar-product index is rebuilt from scratch at least this often (it follows local writes in between)
+    SIMILARITY_REBUILD_SECONDS = int(os.environ.get('SIMILARITY_REBUILD_SECONDS', 3600))
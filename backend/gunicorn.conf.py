@@ -0,0 +1,78 @@
+"""
+Gunicorn settings for serving the API.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment (GUNICORN_WORKERS, etc.).
+Processes spread forecasts and other CPU work across cores, while threads in
+each worker keep serving other requests while one waits on Ollama.
+"""
+import importlib
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+# The app shares per-host pools (simulation processes) out between this many workers
+os.environ['WEB_CONCURRENCY'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# LLM answers can take a while; keep this above OLLAMA_TIMEOUT
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# On SIGTERM workers stop accepting and get this long to finish in-flight requests
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Create tables and build rollups once in the master instead of once per worker
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() in ('true', '1', 't')
+
+# The app imports these lazily so it starts fast; with preload_app the master
+# imports them up front and forked workers share the already-loaded pages
+preload_modules = [name for name in os.environ.get('GUNICORN_PRELOAD_MODULES', 'numpy,pandas,requests').split(',')
+                   if name]
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def _dispose_engine():
+    # Nothing to do until the app has been loaded (preload, or after the worker imports it)
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is None:
+        return
+
+    from main import db
+    with wsgi.app.app_context():
+        db.engine.dispose()
+
+def on_starting(server):
+    if preload_app:
+        for name in preload_modules:
+            importlib.import_module(name)
+        server.log.info(f"Preloaded {', '.join(preload_modules)}")
+
+def post_fork(server, worker):
+    # Connections opened in the master before the fork must not be shared between workers
+    _dispose_engine()
+
+def _flush_sales_history(server):
+    # Sales this worker buffered but has not folded into historical_sales yet
+    if sys.modules.get('wsgi') is None:
+        return
+
+    from app.services.sales_history import buffer
+    flushed = buffer.flush()
+    if flushed:
+        server.log.info(f"Flushed {flushed} buffered sales")
+
+def worker_exit(server, worker):
+    _flush_sales_history(server)
+    _dispose_engine()
+    server.log.info(f"Worker {worker.pid} exited")
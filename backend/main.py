@@ -15,16 +15,41 @@ def create_app(config_class=Config):
     from app.routes.auth import auth_bp
     from app.routes.inventory import inventory_bp
     from app.routes.predictions import predictions_bp
+    from app.routes.alerts import alerts_bp
+    from app.routes.health import health_bp
+    from app.routes.locations import locations_bp
+    from app.routes.batch import batch_bp
+    from app.services import product_changes
+    from app.services.sales_store import append_committed_sales
+    from app.utils.instrumentation import metrics_bp, init_instrumentation
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(inventory_bp, url_prefix='/api/inventory')
     app.register_blueprint(predictions_bp, url_prefix='/api/predictions')
+    app.register_blueprint(alerts_bp, url_prefix='/api/alerts')
+    app.register_blueprint(health_bp, url_prefix='/api')
+    app.register_blueprint(locations_bp, url_prefix='/api/locations')
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp)
+    
+    init_instrumentation(app)
+    # The sales store follows committed sales and new products
+    product_changes.on_commit(append_committed_sales)
     
     return app
 
 def init_db(app):
+    from app.services.rollup_service import rebuild_rollups
+    from app.services.sales_history import replay_pending_sales
+    from app.services.sales_store import ensure_sales_store
+    from app.services.search_service import ensure_search_index
+
     with app.app_context():
         db.create_all()
+        replay_pending_sales(db.session)
+        rebuild_rollups()
+        ensure_sales_store(db.session)
+        ensure_search_index(db.session)
         
         # Create default admin user if it doesn't exist
         admin = User.query.filter_by(username='admin').first()
@@ -39,6 +64,8 @@ def init_db(app):
             db.session.commit()
 
 if __name__ == '__main__':
+    from app.services.ollama_service import warm_up_ollama
     app = create_app()
     init_db(app)
+    warm_up_ollama(app)
     app.run(debug=True)
\ No newline at end of file
@@ -3,6 +3,7 @@ from config import Config
 from app.extensions import db
 import sqlite3
 from app.models.user import User
+from app.services.search_service import ensure_search_index
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -33,7 +34,50 @@ def migrate_db():
         else:
             print("'last_login' column already exists.")
         
+        # Ledger range queries filter transactions by product and date
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_transactions_product_date "
+                       "ON transactions (product_id, transaction_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_transactions_date ON transactions (transaction_date)")
+        # Catalog snapshots catch up on other workers' stock changes by updated_at
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_products_updated_at ON products (updated_at)")
+        
+        # Full-text search keys products on their own column, which VACUUM leaves alone (ensure_search_index
+        # below then re-creates the index keyed on it)
+        cursor.execute("PRAGMA table_info(products)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if columns and 'search_rowid' not in columns:
+            print("Adding 'search_rowid' column to products table...")
+            cursor.execute("ALTER TABLE products ADD COLUMN search_rowid INTEGER")
+        if columns:
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_products_search_rowid ON products (search_rowid)")
+        
+        # Daily aggregates gained a restock column alongside units sold
+        cursor.execute("PRAGMA table_info(daily_sales)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if columns and 'restocked' not in columns:
+            print("Adding 'restocked' column to daily_sales table...")
+            cursor.execute("ALTER TABLE daily_sales ADD COLUMN restocked INTEGER NOT NULL DEFAULT 0")
+        
+        # Transactions can name the location they happened at (stock_levels itself comes from create_all)
+        cursor.execute("PRAGMA table_info(transactions)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if columns and 'location_id' not in columns:
+            print("Adding 'location_id' column to transactions table...")
+            cursor.execute("ALTER TABLE transactions ADD COLUMN location_id VARCHAR(10) REFERENCES locations (id)")
+        
+        # Sales are folded into historical_sales in batches; pending ones are flagged until then
+        if columns and 'history_pending' not in columns:
+            print("Adding 'history_pending' column to transactions table...")
+            cursor.execute("ALTER TABLE transactions ADD COLUMN history_pending BOOLEAN NOT NULL DEFAULT 0")
+        if columns:
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_transactions_history_pending "
+                           "ON transactions (history_pending) WHERE history_pending = 1")
+        conn.commit()
+        
         conn.close()
+        
+        # Full-text product search (a no-op when the index exists or SQLite lacks FTS5)
+        ensure_search_index(db.session)
 
 if __name__ == '__main__':
     migrate_db()
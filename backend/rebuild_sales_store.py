@@ -0,0 +1,19 @@
+"""
+Rebuild the memory-mapped sales store from the products' sales histories.
+
+Needed after bulk imports or edits that bypass the ORM, or after backdated sales:
+
+    python rebuild_sales_store.py
+"""
+from main import create_app, db
+from app.services.sales_store import rebuild_sales_store, store_directory
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        meta = rebuild_sales_store(db.session)
+        print(f"Wrote {meta['products']} products x {meta['days']} days from {meta['start']} to {store_directory()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Tests run from the backend directory layout, like the scripts in it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from main import create_app, db, init_db
+from app.models.inventory import Product, Transaction
+from app.utils.query_counter import count_queries, get_query_budget
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    USE_OLLAMA = False
+    PROFILE_SLOW_REQUESTS = False
+    DASHBOARD_CACHE_SECONDS = 0
+    ALERT_STREAM_MAX_SECONDS = 0
+    READINESS_CACHE_SECONDS = 0
+    CATALOG_SNAPSHOT_CHECK_SECONDS = 0
+    SALES_STORE_ENABLED = False
+    SALES_HISTORY_WRITE_BEHIND = False
+    TREND_REFRESH_SECONDS = 0
+    SIMULATION_WORKERS = 1
+
+def product_fields(product_id, **overrides):
+    """A new product as POST /api/inventory/ takes it: no sales history."""
+    fields = {
+        'id': product_id,
+        'name': f"Product {product_id}",
+        'category': 'Toys',
+        'supplier': 'Supplier A',
+        'current_stock': 100,
+        'reorder_level': 20,
+        'purchase_price': 10.0,
+        'selling_price': 15.0,
+        'lead_time': 5,
+    }
+    fields.update(overrides)
+    return fields
+
+def make_product(product_id, **overrides):
+    fields = product_fields(product_id,
+                            historical_sales=json.dumps({f"Day-{day}": day % 7 + 1 for day in range(1, 31)}))
+    fields.update(overrides)
+    return Product(**fields)
+
+def sell(client, headers, product_id, quantity):
+    return client.post('/api/inventory/transaction', headers=headers,
+                       json={'product_id': product_id, 'transaction_type': 'sale', 'quantity': quantity})
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    init_db(app)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def file_app(tmp_path):
+    """An app on a database file: the in-memory one is a single connection threads would share."""
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'inventiq.db'}"
+
+    app = create_app(FileConfig)
+    init_db(app)
+    with app.app_context():
+        db.session.add(make_product('P0002'))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123', 'role': 'admin'})
+    return {'Authorization': response.get_json()['token']}
+
+@pytest.fixture
+def catalog(app):
+    """Seed a catalog large enough that per-product queries stand out."""
+    with app.app_context():
+        for i in range(1, 41):
+            product_id = f"P{i:04d}"
+            db.session.add(make_product(product_id, category='Toys' if i % 2 else 'Books'))
+            db.session.add(Transaction(product_id=product_id, transaction_type='sale', quantity=1))
+        for i in range(1, 11):
+            db.session.add(make_product(f"S{i:04d}", supplier='Supplier Bulk'))
+        db.session.commit()
+
+@pytest.fixture
+def query_counter():
+    """Yield count_queries so tests can wrap the calls they want to measure."""
+    return count_queries
+
+@pytest.fixture
+def assert_within_budget(app, client, query_counter):
+    """Call a route and fail if it runs more queries than its declared budget."""
+    def check(method, path, **kwargs):
+        with query_counter() as counter:
+            response = client.open(path, method=method, **kwargs)
+
+        adapter = app.url_map.bind('localhost')
+        endpoint, _ = adapter.match(path.split('?')[0], method=method)
+        budget = get_query_budget(app.view_functions[endpoint])
+
+        assert budget is not None, f"{endpoint} does not declare a query budget"
+        assert counter.count <= budget, (
+            f"{method} {path} ran {counter.count} queries, budget is {budget}\n"
+            f"Repeated statements: {counter.repeated()}\n{counter.report()}"
+        )
+        return response
+    return check
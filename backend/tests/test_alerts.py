@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from conftest import sell
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def parse_events(body):
+    events = []
+    for block in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'data' in fields:
+            events.append((fields.get('event'), fields.get('id'), json.loads(fields['data'])))
+    return events
+
+def test_crossings_raise_alerts(client, auth_headers):
+    sell(client, auth_headers, 'P0001', 50)  # 100 -> 50, still above the reorder level
+    sell(client, auth_headers, 'P0001', 40)  # 50 -> 10, low
+    sell(client, auth_headers, 'P0001', 5)   # still low, no new alert
+    sell(client, auth_headers, 'P0001', 5)   # out of stock
+    client.put('/api/inventory/P0001', json={'current_stock': 80}, headers=auth_headers)
+
+    alerts = client.get('/api/alerts/?since=0', headers=auth_headers).get_json()['alerts']
+    assert [(a['product_id'], a['alert_type']) for a in alerts] == [
+        ('P0001', 'low_stock'), ('P0001', 'out_of_stock'), ('P0001', 'restocked')
+    ]
+
+def test_cursor_delivers_only_new_alerts(client, auth_headers):
+    client.put('/api/inventory/P0002', json={'current_stock': 0}, headers=auth_headers)
+
+    first = client.get('/api/alerts/', headers=auth_headers).get_json()
+    assert [a['product_id'] for a in first['active']] == ['P0002']
+    assert first['alerts'] == []
+
+    sell(client, auth_headers, 'P0003', 90)
+    second = client.get('/api/alerts/', headers=auth_headers).get_json()
+    assert 'active' not in second
+    assert [a['product_id'] for a in second['alerts']] == ['P0003']
+    assert client.get('/api/alerts/', headers=auth_headers).get_json()['alerts'] == []
+
+def stream_token(client, auth_headers):
+    return client.post('/api/auth/stream-token', headers=auth_headers).get_json()['token']
+
+def test_stream(client, auth_headers):
+    client.put('/api/inventory/P0004', json={'current_stock': 5}, headers=auth_headers)
+    stream_headers = {'Accept': 'text/event-stream'}
+    token = stream_token(client, auth_headers)
+
+    response = client.get(f'/api/alerts/stream?token={token}', headers=stream_headers)
+    assert response.mimetype == 'text/event-stream'
+    (event, cursor, data), = parse_events(response.get_data(as_text=True))
+    assert event == 'snapshot'
+    assert [a['product_id'] for a in data] == ['P0004']
+
+    sell(client, auth_headers, 'P0005', 85)
+    sell(client, auth_headers, 'P0006', 100)
+    events = parse_events(client.get(f'/api/alerts/stream?token={token}', headers=stream_headers)
+                          .get_data(as_text=True))
+    assert [(e, d['product_id'], d['alert_type']) for e, _, d in events] == [
+        ('alert', 'P0005', 'low_stock'), ('alert', 'P0006', 'out_of_stock')
+    ]
+
+    # Last-Event-ID replays what came after it, regardless of the stored cursor
+    resumed = parse_events(client.get(f'/api/alerts/stream?token={token}',
+                                      headers={**stream_headers, 'Last-Event-ID': events[0][1]})
+                           .get_data(as_text=True))
+    assert [d['product_id'] for _, _, d in resumed] == ['P0006']
+
+def test_query_token_only_for_event_streams(client, auth_headers):
+    token = stream_token(client, auth_headers)
+    assert client.get(f'/api/alerts/?token={token}').status_code == 401
+    assert client.get(f'/api/alerts/stream?token={token}', headers={'Accept': 'text/event-stream'}).status_code == 200
+
+def test_session_token_stays_out_of_urls(app, client, auth_headers):
+    stream_headers = {'Accept': 'text/event-stream'}
+    session_token = auth_headers['Authorization']
+    assert client.get(f'/api/alerts/stream?token={session_token}', headers=stream_headers).status_code == 401
+
+    # Stream tokens open streams only, and not for long
+    token = stream_token(client, auth_headers)
+    assert client.get('/api/alerts/', headers={'Authorization': f'Bearer {token}'}).status_code == 401
+    app.config['STREAM_TOKEN_SECONDS'] = -1
+    expired = stream_token(client, auth_headers)
+    assert client.get(f'/api/alerts/stream?token={expired}', headers=stream_headers).status_code == 401
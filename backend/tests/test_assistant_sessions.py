@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from main import db
+from app.models.assistant import AssistantSession
+from app.services import ollama_service
+from app.services.assistant_sessions import open_session, record_turn, session_messages
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture
+def ollama(app, monkeypatch):
+    """Record the messages each chat request would send to Ollama."""
+    sent = []
+
+    def chat(self, messages, temperature=0.7, max_tokens=500):
+        sent.append(messages)
+        return f'answer {len(sent)}'
+
+    monkeypatch.setattr(ollama_service.OllamaService, 'chat', chat)
+    app.config['USE_OLLAMA'] = True
+    return sent
+
+def test_follow_ups_extend_the_same_prompt(client, auth_headers, ollama):
+    def ask(query, session_id=None):
+        return client.post('/api/predictions/insights', headers=auth_headers,
+                           json={'query': query, 'session_id': session_id}).get_json()
+
+    first = ask('Why are toy sales slowing down?')
+    second = ask('And what about books?', first['session_id'])
+    assert second['session_id'] == first['session_id'] and second['insights'] == 'answer 2'
+
+    # The follow-up resends the first request unchanged, so Ollama reuses its evaluated prefix
+    assert ollama[1][:2] == ollama[0][:2]
+    assert ollama[1][2] == {'role': 'assistant', 'content': 'answer 1'}
+    assert ollama[1][3]['content'].count('And what about books?') == 1
+
+    # A structured question is answered directly but still becomes part of the conversation
+    ask('What is out of stock?', first['session_id'])
+    ask('Why?', first['session_id'])
+    assert [message['role'] for message in ollama[2]] == ['system'] + ['user', 'assistant'] * 3 + ['user']
+
+    # An unknown session id starts a new conversation
+    assert ask('Hello there', 'nope')['session_id'] != first['session_id']
+
+def test_only_saved_sessions_are_handed_out(app, client, auth_headers):
+    # Without Ollama the default answer still goes into the session
+    body = client.post('/api/predictions/insights', headers=auth_headers, json={'query': 'Hello there'}).get_json()
+    with app.app_context():
+        assert session_messages(db.session.get(AssistantSession, body['session_id']))[1]['content'] == body['insights']
+
+def test_sessions_are_bounded_and_expire(app):
+    app.config.update(ASSISTANT_SESSION_MAX_TURNS=4, ASSISTANT_SESSIONS_PER_USER=3)
+    with app.app_context():
+        session = open_session(None, user_id=1)
+        for turn in range(5):
+            record_turn(session, f'q{turn}', f'a{turn}')
+        # Past the limit the oldest half goes at once
+        assert [message['content'] for message in session_messages(session)] == ['q3', 'a3', 'q4', 'a4']
+
+        # Another user can't continue it, and it expires once idle for longer than the TTL
+        assert open_session(session.id, user_id=2).id != session.id
+        db.session.rollback()
+        assert open_session(session.id, user_id=1) is session
+        session.updated_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+        assert open_session(session.id, user_id=1).id != session.id
+        db.session.commit()
+        assert db.session.get(AssistantSession, session.id) is None
+
+        for _ in range(5):
+            record_turn(open_session(None, user_id=1), 'q', 'a')
+        assert AssistantSession.query.filter_by(user_id=1).count() == 3
@@ -0,0 +1,57 @@
+import pytest
+
+PRODUCT_PAGE = [
+    {'method': 'GET', 'path': '/api/inventory/P0003'},
+    {'method': 'GET', 'path': '/api/predictions/forecast/P0003?days=30'},
+    {'method': 'GET', 'path': '/api/predictions/restock/P0003'},
+]
+
+@pytest.mark.usefixtures('catalog')
+def test_product_page_in_one_request(client, auth_headers, query_counter):
+    with query_counter() as separate:
+        for item in PRODUCT_PAGE:
+            assert client.get(item['path'], headers=auth_headers).status_code == 200
+
+    with query_counter() as batched:
+        response = client.post('/api/batch', headers=auth_headers, json={'requests': PRODUCT_PAGE})
+    assert response.status_code == 200
+    product, forecast, restock = response.get_json()['responses']
+    assert [product['status'], forecast['status'], restock['status']] == [200, 200, 200]
+    assert product['body']['id'] == 'P0003' and len(forecast['body']['forecast']) == 30
+    assert restock['body']['current_stock'] == product['body']['current_stock']
+
+    # One authentication, and the product is loaded once for all three
+    assert batched.count <= separate.count - 4, batched.report()
+    assert 'subrequests;dur=' in response.headers['Server-Timing']
+
+@pytest.mark.usefixtures('catalog')
+def test_sub_requests_run_in_order_with_their_own_status(client, auth_headers):
+    response = client.post('/api/batch', headers=auth_headers, json={'requests': [
+        {'method': 'POST', 'path': '/api/inventory/transaction',
+         'body': {'product_id': 'P0001', 'transaction_type': 'sale', 'quantity': 4}},
+        {'method': 'GET', 'path': '/api/inventory/P0001'},
+        {'method': 'GET', 'path': '/api/inventory/MISSING'},
+        {'method': 'POST', 'path': '/api/inventory/transaction', 'body': {'product_id': 'P0001'}},
+    ]})
+    sale, product, missing, invalid = response.get_json()['responses']
+    assert sale['status'] == 201 and product['body']['current_stock'] == 96
+    assert missing['status'] == 404 and invalid['status'] == 400
+
+    assert client.post('/api/batch', json={'requests': PRODUCT_PAGE}).status_code == 401
+    for body in ({'requests': []}, {'requests': [{'path': '/api/batch'}]}, {'requests': [{'path': 'nowhere'}]},
+                 {'requests': PRODUCT_PAGE * 7}):
+        assert client.post('/api/batch', headers=auth_headers, json=body).status_code == 400
+
+def test_parallel_reads(file_app):
+    client = file_app.test_client()
+    token = client.post('/api/auth/login', json={
+        'username': 'admin', 'password': 'admin123', 'role': 'admin'}).get_json()['token']
+    requests = [{'path': '/api/inventory/P0002'}, {'path': '/api/predictions/forecast/P0002?days=7'},
+                {'path': '/api/predictions/restock/P0002'}, {'path': '/api/inventory/MISSING'}]
+
+    parallel = client.post('/api/batch', headers={'Authorization': token},
+                           json={'requests': requests, 'parallel': True}).get_json()['responses']
+    sequential = client.post('/api/batch', headers={'Authorization': token},
+                             json={'requests': requests}).get_json()['responses']
+    assert [item['status'] for item in parallel] == [200, 200, 200, 404]
+    assert parallel[0] == sequential[0] and parallel[2]['body']['product_id'] == 'P0002'
@@ -0,0 +1,64 @@
+import pytest
+
+from main import db
+from app.models.inventory import Product, Transaction
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def test_bulk_delete_dry_run_counts_without_deleting(app, client, auth_headers):
+    response = client.delete('/api/inventory/bulk?supplier=Supplier Bulk&dry_run=true', headers=auth_headers)
+    assert response.get_json() == {'dry_run': True, 'matched': 10}
+
+    with app.app_context():
+        assert Product.query.filter_by(supplier='Supplier Bulk').count() == 10
+
+def test_bulk_delete_removes_products_and_their_transactions(app, client, auth_headers):
+    response = client.delete('/api/inventory/bulk?category=Books', headers=auth_headers)
+    assert response.get_json()['deleted'] == 20
+
+    with app.app_context():
+        assert Product.query.filter_by(category='Books').count() == 0
+        remaining_ids = {p.id for p in Product.query.all()}
+        assert all(t.product_id in remaining_ids for t in Transaction.query.all())
+
+def test_bulk_delete_requires_a_filter(client, auth_headers):
+    assert client.delete('/api/inventory/bulk', headers=auth_headers).status_code == 400
+
+def test_delete_product_with_transactions(app, client, auth_headers):
+    assert client.delete('/api/inventory/P0001', headers=auth_headers).status_code == 200
+    with app.app_context():
+        assert db.session.get(Product, 'P0001') is None
+
+def test_bulk_update_adjusts_prices_and_reorder_levels(app, client, auth_headers):
+    response = client.patch('/api/inventory/bulk', headers=auth_headers, json={
+        'filter': {'supplier': 'Supplier Bulk'},
+        'set': {'category': 'Clearance'},
+        'adjust': {'selling_price_pct': -10, 'reorder_level_delta': -25},
+    })
+    assert response.get_json()['updated'] == 10
+
+    with app.app_context():
+        for product in Product.query.filter_by(supplier='Supplier Bulk'):
+            assert product.category == 'Clearance'
+            assert product.selling_price == 13.5
+            assert product.reorder_level == 0
+        assert Product.query.filter_by(category='Clearance').count() == 10
+
+def test_bulk_update_dry_run_and_validation(app, client, auth_headers):
+    response = client.patch('/api/inventory/bulk', headers=auth_headers, json={
+        'filter': {'ids': ['P0001', 'P0002']}, 'set': {'lead_time': 9}, 'dry_run': True})
+    assert response.get_json() == {'dry_run': True, 'matched': 2}
+
+    bad_field = client.patch('/api/inventory/bulk', headers=auth_headers, json={
+        'filter': {'category': 'Toys'}, 'set': {'current_stock': 0}})
+    assert bad_field.status_code == 400
+
+    conflict = client.patch('/api/inventory/bulk', headers=auth_headers, json={
+        'filter': {'category': 'Toys'}, 'set': {'reorder_level': 5}, 'adjust': {'reorder_level_delta': 1}})
+    assert conflict.status_code == 400
+
+    # Literals must fit their column: the wrong type, None or a negative number is refused
+    for update in ({'reorder_level': '5'}, {'reorder_level': -5}, {'selling_price': None}, {'category': ''}, ['x']):
+        response = client.patch('/api/inventory/bulk', headers=auth_headers, json={
+            'filter': {'category': 'Toys'}, 'set': update})
+        assert response.status_code == 400, update
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import update
+
+from main import db
+from app.models.inventory import Product
+from app.services import catalog_snapshot, product_changes
+from app.services.catalog_snapshot import CatalogSnapshot, get_catalog_snapshot, inventory_summary
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def as_rows(snapshot):
+    return sorted(
+        (snapshot.ids[row], snapshot.names[row], snapshot.categories[snapshot.category_codes[row]],
+         snapshot.suppliers[snapshot.supplier_codes[row]],
+         *(column[row].item() for column in snapshot.columns().values()))
+        for row in range(snapshot.size)
+    )
+
+def test_snapshot_is_read_only(app):
+    with app.app_context():
+        snapshot = get_catalog_snapshot()
+        assert snapshot.size == 50
+        assert set(snapshot.categories) == {'Toys', 'Books'}
+        with pytest.raises(ValueError):
+            snapshot.current_stock[0] = 1
+
+def test_own_writes_are_applied_incrementally(app, client, auth_headers, query_counter):
+    with app.app_context():
+        before = get_catalog_snapshot()
+
+    product = {'id': 'N0001', 'name': 'New', 'category': 'Garden', 'supplier': 'Supplier B', 'current_stock': 3,
+               'reorder_level': 5, 'purchase_price': 1.0, 'selling_price': 2.0, 'lead_time': 4}
+    client.post('/api/inventory/', json=product, headers=auth_headers)
+    client.put('/api/inventory/P0001', json={'current_stock': 7, 'category': 'Garden'}, headers=auth_headers)
+    client.delete('/api/inventory/P0002', headers=auth_headers)
+
+    with app.app_context():
+        with query_counter() as counter:
+            snapshot = get_catalog_snapshot()
+        assert counter.count == 2  # version check and catch-up, no reload
+        assert snapshot is not before and before.size == 50
+
+        assert as_rows(snapshot) == as_rows(CatalogSnapshot.load(db.session))
+
+def test_missed_writes_trigger_reload(app, client, auth_headers):
+    with app.app_context():
+        get_catalog_snapshot()
+
+        # A write from another process: the rows and version change but this process sees no commit event
+        db.session.execute(update(Product).where(Product.id == 'P0003').values(current_stock=0))
+        product_changes._bump_catalog_version(db.session)
+        db.session.commit()
+        snapshot = get_catalog_snapshot()
+        assert snapshot.current_stock[snapshot.index['P0003']] == 0
+
+    client.patch('/api/inventory/bulk', headers=auth_headers,
+                 json={'filter': {'category': 'Books'}, 'set': {'reorder_level': 500}})
+    with app.app_context():
+        snapshot = get_catalog_snapshot()
+        assert as_rows(snapshot) == as_rows(CatalogSnapshot.load(db.session))
+
+def test_stock_changes_leave_the_version_alone(app, client, auth_headers, query_counter):
+    with app.app_context():
+        before = get_catalog_snapshot()
+        version = product_changes.catalog_version(db.session)
+
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0005', 'transaction_type': 'sale', 'quantity': 4})
+    with app.app_context():
+        assert product_changes.catalog_version(db.session) == version
+
+        # Another process's sale: the row changes, the version does not, and no commit event reaches us
+        db.session.execute(update(Product).where(Product.id == 'P0007').values(current_stock=1))
+        db.session.commit()
+        with query_counter() as counter:
+            snapshot = get_catalog_snapshot()
+        assert counter.count == 2 and snapshot.version == before.version
+        assert snapshot.current_stock[snapshot.index['P0005']] == 96
+        assert snapshot.current_stock[snapshot.index['P0007']] == 1
+        assert as_rows(snapshot) == as_rows(CatalogSnapshot.load(db.session))
+
+def test_inventory_summary(app, client, auth_headers):
+    client.put('/api/inventory/P0004', json={'current_stock': 0}, headers=auth_headers)
+    client.put('/api/inventory/P0006', json={'current_stock': 10}, headers=auth_headers)
+
+    with app.app_context():
+        catalog_snapshot._snapshot = None
+        summary = inventory_summary()
+
+    assert summary['total_products'] == 50
+    assert summary['categories'] == {'Toys': 30, 'Books': 20}
+    assert summary['out_of_stock_count'] == 1
+    assert [item['id'] for item in summary['low_stock_items']] == ['P0004', 'P0006']
+    # Every product sells the same weekly pattern: nothing is trending
+    assert summary['trending_products'] == []
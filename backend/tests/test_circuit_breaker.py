@@ -0,0 +1,106 @@
+import pytest
+
+from app.services import circuit_breaker, ollama_service
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    circuit_breaker._breakers.clear()
+    yield
+    circuit_breaker._breakers.clear()
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+def fail():
+    raise ConnectionError('refused')
+
+def test_breaker_opens_probes_and_closes(clock):
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_seconds=30)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == 'open'
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(calls.append, 'skipped')
+    assert calls == []
+
+    # After the reset period one probe goes through; a failed probe reopens at once
+    clock[0] += 30
+    assert breaker.state == 'half_open'
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == 'open'
+
+    clock[0] += 30
+    assert breaker.call(lambda: 'back') == 'back'
+    assert breaker.state == 'closed'
+
+def test_slow_calls_count_as_failures(clock, monkeypatch):
+    breaker = CircuitBreaker('test', failure_threshold=1, slow_call_seconds=5)
+    elapsed = iter([0.0, 6.0])
+    monkeypatch.setattr(circuit_breaker.time, 'perf_counter', lambda: next(elapsed))
+
+    # The slow answer is still returned, but the next caller falls back
+    assert breaker.call(lambda: 'late') == 'late'
+    assert breaker.state == 'open'
+
+@pytest.mark.usefixtures('catalog')
+def test_assistant_falls_back_while_ollama_is_down(app, client, auth_headers, monkeypatch):
+    import requests
+
+    attempts = []
+
+    def chat(self, messages, temperature=0.7, max_tokens=500):
+        attempts.append(messages)
+        raise requests.ConnectionError('connection refused')
+
+    monkeypatch.setattr(ollama_service.OllamaService, 'chat', chat)
+    app.config.update(USE_OLLAMA=True, LLM_BREAKER_FAILURES=2)
+
+    def ask(query):
+        return client.post('/api/predictions/insights', headers=auth_headers, json={'query': query}).get_json()['insights']
+
+    # Open-ended questions get the overview; a weakly matched one gets its own deterministic answer
+    assert 'You have 50 products across 2 categories' in ask('Why are sales so slow lately?')
+    assert 'out of stock' in ask('Tell me about things that are gone and out of stock, and why')
+    assert len(attempts) == 2
+
+    # The circuit is open now: no more waiting on Ollama
+    assert 'You have 50 products' in ask('What strategy should we use for the holidays?')
+    assert len(attempts) == 2
+
+    exported = client.get('/metrics').get_data(as_text=True)
+    assert 'inventiq_circuit_state{breaker="llm"} 2' in exported
+    assert 'inventiq_assistant_fallbacks_total{reason="circuit_open"} 1' in exported
+
+@pytest.mark.usefixtures('catalog')
+def test_only_the_ollama_call_counts_for_the_breaker(app, client, auth_headers, monkeypatch):
+    from main import db
+    from app.models.assistant import AssistantSession
+    from app.models.inventory import Product
+    from app.services.assistant_sessions import session_messages
+
+    def broken_prompt():
+        # Leaves the db session needing a rollback, as a failed flush does
+        db.session.add(Product(id='BROKEN'))
+        db.session.flush()
+
+    monkeypatch.setattr(ollama_service, '_system_prompt', broken_prompt)
+    app.config.update(USE_OLLAMA=True, LLM_BREAKER_FAILURES=1)
+
+    response = client.post('/api/predictions/insights', headers=auth_headers,
+                           json={'query': 'Why are sales so slow lately?'})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert 'You have 50 products' in body['insights']
+    # The fallback answer is still recorded, in a session that was saved
+    with app.app_context():
+        assert session_messages(db.session.get(AssistantSession, body['session_id']))[1]['content'] == body['insights']
+        assert circuit_breaker.llm_breaker().state == 'closed'
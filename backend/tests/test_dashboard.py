@@ -0,0 +1,90 @@
+import pytest
+
+from main import db
+from app.models.rollups import DailySales, StockRollup
+from app.services.rollup_service import rebuild_rollups
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def rollup_snapshot():
+    rollups = {(r.dimension, r.key): (r.product_count, r.total_units, round(r.stock_value, 2),
+                                      r.low_stock_count, r.out_of_stock_count)
+               for r in StockRollup.query.all()}
+    sales = {(s.product_id, str(s.sales_date)): s.quantity for s in DailySales.query.all()}
+    # Keys left at zero by incremental updates are equivalent to missing ones
+    return {key: value for key, value in rollups.items() if value[0]}, sales
+
+def assert_matches_rebuild(app):
+    with app.app_context():
+        incremental = rollup_snapshot()
+        rebuild_rollups()
+        assert rollup_snapshot() == incremental
+        db.session.remove()
+
+def test_dashboard_summary(client, auth_headers):
+    summary = client.get('/api/predictions/dashboard', headers=auth_headers).get_json()
+
+    assert summary['totalProducts'] == 50
+    assert summary['totalCategories'] == 2
+    assert summary['totalUnits'] == 5000
+    assert summary['lowStockItems'] == 0
+    assert {c['name']: c['products'] for c in summary['categories']} == {'Books': 20, 'Toys': 30}
+    assert len(summary['topMovers']['7']) == 5
+
+def test_rollups_follow_writes(app, client, auth_headers):
+    product = {
+        'id': 'N0001', 'name': 'New', 'category': 'Garden', 'supplier': 'Supplier B', 'current_stock': 5,
+        'reorder_level': 10, 'purchase_price': 2.5, 'selling_price': 4.0, 'lead_time': 3,
+    }
+    client.post('/api/inventory/', json=product, headers=auth_headers)
+    assert_matches_rebuild(app)
+
+    client.put('/api/inventory/P0001', json={'current_stock': 0, 'category': 'Garden'}, headers=auth_headers)
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 7})
+    assert_matches_rebuild(app)
+
+    client.delete('/api/inventory/N0001', headers=auth_headers)
+    client.delete('/api/inventory/S0001?delete_supplier=true', headers=auth_headers)
+    client.patch('/api/inventory/bulk', headers=auth_headers,
+                 json={'filter': {'category': 'Toys'}, 'adjust': {'reorder_level_delta': 100}})
+    assert_matches_rebuild(app)
+
+    summary = client.get('/api/predictions/dashboard', headers=auth_headers).get_json()
+    assert summary['totalProducts'] == 40
+    assert summary['outOfStockItems'] == 1
+    assert summary['lowStockItems'] == 19
+
+def test_trends(client, auth_headers):
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0003', 'transaction_type': 'sale', 'quantity': 9})
+    trends = client.get('/api/predictions/trends', headers=auth_headers).get_json()
+
+    assert trends['topSellingProducts'][0]['id'] == 'P0003'
+    # One extra sale is within P0003's usual week-to-week swing
+    assert trends['topSellingProducts'][0]['trend'] == 'stable'
+    assert len(trends['salesTrend']) == 7
+    assert trends['salesTrend'][-1]['sales'] == 49
+    assert trends['trendingUp'] == 0
+    assert trends['stableProducts'] == 50
+
+def test_writes_leave_no_catalog_wide_hotspot(app, client, auth_headers):
+    client.get('/api/predictions/dashboard', headers=auth_headers)
+    with app.app_context():
+        marker = StockRollup.query.get(('all', ''))
+        before = (marker.product_count, marker.total_units, marker.updated_at)
+        db.session.remove()
+
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 7})
+    client.put('/api/inventory/P0004', json={'current_stock': 0}, headers=auth_headers)
+
+    with app.app_context():
+        marker = StockRollup.query.get(('all', ''))
+        assert (marker.product_count, marker.total_units, marker.updated_at) == before
+        db.session.remove()
+
+    app.config['DASHBOARD_CACHE_SECONDS'] = 0
+    summary = client.get('/api/predictions/dashboard', headers=auth_headers).get_json()
+    assert summary['totalUnits'] == 5000 - 7 - 100
+    assert summary['outOfStockItems'] == 1
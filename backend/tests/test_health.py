@@ -0,0 +1,45 @@
+import pytest
+
+from app.routes import health
+from app.services.ollama_service import OllamaService
+
+@pytest.fixture(autouse=True)
+def clear_probe_cache():
+    health._probe_cache.clear()
+    yield
+    health._probe_cache.clear()
+
+def test_health_touches_no_database(assert_within_budget):
+    response = assert_within_budget('GET', '/api/health')
+    assert response.get_json() == {'status': 'ok'}
+
+def test_ready(client):
+    body = client.get('/api/ready').get_json()
+    assert body['status'] == 'ready'
+    assert body['checks']['database']['ok']
+    assert body['checks']['ollama']['detail'] == 'disabled'
+
+def test_ollama_outage_degrades(app, client, monkeypatch):
+    def unreachable(self, timeout=1.0):
+        raise ConnectionError('connection refused')
+
+    app.config['USE_OLLAMA'] = True
+    monkeypatch.setattr(OllamaService, 'is_available', unreachable)
+
+    response = client.get('/api/ready')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'degraded'
+    assert 'refused' in response.get_json()['checks']['ollama']['detail']
+
+def test_probe_results_are_cached(app, client, query_counter, monkeypatch):
+    app.config['READINESS_CACHE_SECONDS'] = 60
+    client.get('/api/ready')
+
+    monkeypatch.setitem(health.PROBES, 'database', (lambda: {'ok': False}, True))
+    with query_counter() as counter:
+        response = client.get('/api/ready')
+    assert response.status_code == 200
+    assert counter.count == 0
+
+    health._probe_cache.clear()
+    assert client.get('/api/ready').status_code == 503
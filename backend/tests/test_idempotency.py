@@ -0,0 +1,98 @@
+import threading
+from datetime import timedelta
+
+import pytest
+
+from main import db
+from app.models.idempotency import IdempotencyKey
+from app.models.inventory import Product, Transaction
+from app.utils import idempotency
+from conftest import sell
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    idempotency._responses.clear()
+    yield
+    idempotency._responses.clear()
+
+def keyed(headers, key):
+    return {**headers, 'Idempotency-Key': key}
+
+def stock_and_sales(app, product_id='P0001'):
+    with app.app_context():
+        return (db.session.get(Product, product_id).current_stock,
+                Transaction.query.filter_by(product_id=product_id, transaction_type='sale').count())
+
+def test_retries_replay_the_first_response(app, client, auth_headers, query_counter):
+    first = sell(client, keyed(auth_headers, 'sale-1'), 'P0001', 5)
+    assert first.status_code == 201 and first.get_json()['updated_stock'] == 95
+    before = stock_and_sales(app)
+
+    # Served from memory: only the authentication query runs
+    with query_counter() as counter:
+        retry = sell(client, keyed(auth_headers, 'sale-1'), 'P0001', 5)
+    assert counter.count == 1
+    assert retry.status_code == 201 and retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+
+    # Another worker (an empty cache) finds it in the database
+    idempotency._responses.clear()
+    assert sell(client, keyed(auth_headers, 'sale-1'), 'P0001', 5).get_json() == first.get_json()
+    assert stock_and_sales(app) == before
+
+    # Same key with a different body is refused; errors are remembered too
+    assert sell(client, keyed(auth_headers, 'sale-1'), 'P0001', 6).status_code == 422
+    assert sell(client, keyed(auth_headers, 'too-many'), 'P0001', 1000).status_code == 400
+    assert sell(client, keyed(auth_headers, 'too-many'), 'P0001', 1000).headers['Idempotent-Replayed'] == 'true'
+    assert sell(client, keyed(auth_headers, 'sale-2'), 'P0001', 5).get_json()['updated_stock'] == 90
+
+def test_simultaneous_duplicates_run_once(file_app):
+    token = file_app.test_client().post('/api/auth/login', json={
+        'username': 'admin', 'password': 'admin123', 'role': 'admin'}).get_json()['token']
+    responses = []
+
+    def post():
+        responses.append(sell(file_app.test_client(), keyed({'Authorization': token}, 'storm'), 'P0002', 1))
+
+    threads = [threading.Thread(target=post) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One sale went through; the duplicates were replayed or told to retry
+    assert stock_and_sales(file_app, 'P0002') == (99, 1)
+    assert {response.status_code for response in responses} <= {201, 409}
+    assert sum(1 for response in responses
+               if response.status_code == 201 and 'Idempotent-Replayed' not in response.headers) == 1
+
+def test_bodies_compare_as_json_and_abandoned_claims_expire(app, client, auth_headers):
+    sale = {'product_id': 'P0001', 'transaction_type': 'sale', 'quantity': 5}
+    first = client.post('/api/inventory/transaction', headers=keyed(auth_headers, 'json'), json=sale)
+    idempotency._responses.clear()
+    # Same body, other key order and spacing
+    retry = client.post('/api/inventory/transaction', headers={**keyed(auth_headers, 'json'),
+                                                               'Content-Type': 'application/json'},
+                        data='{"quantity": 5,  "transaction_type": "sale", "product_id": "P0001"}')
+    assert retry.headers['Idempotent-Replayed'] == 'true' and retry.get_json() == first.get_json()
+
+    # A worker died between committing the sale with its claim and storing the response
+    with app.app_context():
+        record = db.session.get(IdempotencyKey, (1, 'json'))
+        record.status_code = record.response = record.mimetype = None
+        db.session.commit()
+    idempotency._responses.clear()
+    before = stock_and_sales(app)
+    assert sell(client, keyed(auth_headers, 'json'), 'P0001', 5).status_code == 409
+
+    with app.app_context():
+        record = db.session.get(IdempotencyKey, (1, 'json'))
+        record.created_at -= timedelta(seconds=app.config['IDEMPOTENCY_IN_PROGRESS_SECONDS'] + 1)
+        db.session.commit()
+    expired = sell(client, keyed(auth_headers, 'json'), 'P0001', 5)
+    assert expired.status_code == 200 and expired.headers['Idempotent-Replayed'] == 'true'
+    assert stock_and_sales(app) == before
+    with app.app_context():
+        assert db.session.get(IdempotencyKey, (1, 'json')).status_code == 200
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use by the code that needs them, never by create_app()
+DEFERRED_MODULES = ('numpy', 'pandas', 'sklearn', 'scipy', 'matplotlib', 'requests')
+
+# Generous enough for a slow CI box; the heavy imports alone used to take well over a second
+IMPORT_BUDGET_MS = int(os.environ.get('IMPORT_BUDGET_MS', 1000))
+
+def import_times():
+    """{module: cumulative microseconds} from `python -X importtime` building the app."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'from main import create_app; create_app()'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def test_create_app_defers_heavy_imports():
+    times = import_times()
+
+    loaded = sorted({name.split('.')[0] for name in times} & set(DEFERRED_MODULES))
+    assert not loaded, f"create_app() imported {loaded}; import them inside the functions that use them"
+
+    total_ms = times['main'] / 1000
+    assert total_ms < IMPORT_BUDGET_MS, f"Importing main took {total_ms:.0f} ms (budget {IMPORT_BUDGET_MS} ms)"
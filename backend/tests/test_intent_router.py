@@ -0,0 +1,44 @@
+import pytest
+
+from main import db
+from conftest import make_product
+from app.services import ollama_service
+from app.services.intent_router import classify
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture
+def named(app):
+    with app.app_context():
+        db.session.add(make_product('G0001', name='Garden Hose', category='Garden', current_stock=7))
+        db.session.add(make_product('G0002', name='Red Kite', current_stock=0))
+        db.session.commit()
+
+def test_classify_finds_intents_and_slots(app, named):
+    with app.app_context():
+        assert classify('Which toys are running low?')[::2] == ('low_stock', {'category': 'Toys'})
+        assert classify('How many red kites are left?').slots == {'product_id': 'G0002'}
+        assert classify('forecast for p0003 over the next 14 days')[::2] == (
+            'forecast', {'days': 14, 'product_id': 'P0003'})
+        # Without a product, "what should we restock" is about the whole catalog
+        assert classify('What should we restock?').intent == 'low_stock'
+
+        for question in ('Why are garden sales dropping?', 'Which low stock items are trending?',
+                         'How can we improve turnover?', 'Hello!'):
+            assert classify(question).confidence < app.config['ROUTER_CONFIDENCE'], question
+
+def test_structured_questions_skip_the_llm(app, client, auth_headers, named, monkeypatch):
+    asked = []
+    monkeypatch.setattr(ollama_service.OllamaService, 'chat', lambda self, messages: asked.append(messages[-1]['content']) or 'LLM')
+    app.config['USE_OLLAMA'] = True
+
+    def insights(query):
+        return client.post('/api/predictions/insights', headers=auth_headers, json={'query': query}).get_json()['insights']
+
+    assert insights('How much garden hose do we have?').startswith('We have 7 units of Garden Hose (G0001)')
+    assert insights('What is out of stock?') == '1 product is out of stock: Red Kite'
+    assert insights('How much of P9999 do we have?') == "I couldn't find a product with ID P9999."
+    assert asked == []
+
+    assert insights('Explain why the garden hose is trending') == 'LLM'
+    assert len(asked) == 1 and 'User Query: Explain why the garden hose is trending' in asked[0]
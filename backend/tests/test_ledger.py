@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from main import db
+from app.models.inventory import Transaction
+from app.models.rollups import DailySales
+from app.services.ledger_service import compact_ledger
+from app.services.ml_service import parse_sales_history
+from app.services.rollup_service import rebuild_rollups
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture
+def history(app):
+    """Sales of P0001 spread over two years, plus a restock."""
+    now = datetime.utcnow()
+    with app.app_context():
+        for days_ago, quantity in ((0, 2), (1, 3), (40, 5), (400, 7), (401, 11)):
+            db.session.add(Transaction(product_id='P0001', transaction_type='sale', quantity=quantity,
+                                       transaction_date=now - timedelta(days=days_ago)))
+        db.session.add(Transaction(product_id='P0001', transaction_type='restock', quantity=50,
+                                   transaction_date=now - timedelta(days=400)))
+        db.session.commit()
+    return now.date()
+
+def test_sales_history_keys_are_dates(client, auth_headers):
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 4})
+    sales = client.get('/api/inventory/P0002', headers=auth_headers).get_json()['historical_sales']
+    assert sales[datetime.utcnow().strftime('%Y-%m-%d')] == 4
+
+    # Legacy Day-N keys sort before dated keys, dated keys sort by date across years
+    history = json.dumps({'2025-01-02': 1, 'Day-10': 2, '2024-12-31': 3, 'Day-2': 4})
+    assert [day for day, _ in parse_sales_history(history)] == ['Day-2', 'Day-10', '2024-12-31', '2025-01-02']
+
+def test_sales_range(client, auth_headers, history):
+    params = {'product_id': 'P0001', 'start': (history - timedelta(days=1)).isoformat(), 'end': history.isoformat()}
+    body = client.get('/api/inventory/sales', query_string=params, headers=auth_headers).get_json()
+    assert [point['sold'] for point in body['series']] == [3, 3]  # the catalog fixture sold 1 today
+    assert body['total_sold'] == 6
+
+    params.update(start=(history - timedelta(days=500)).isoformat(), granularity='month')
+    body = client.get('/api/inventory/sales', query_string=params, headers=auth_headers).get_json()
+    assert body['total_sold'] == 29
+    assert sum(point['restocked'] for point in body['series']) == 50
+    assert all(len(point['period']) == 7 for point in body['series'])
+
+    assert client.get('/api/inventory/sales?granularity=week', headers=auth_headers).status_code == 400
+    assert client.get('/api/inventory/sales?start=2025-02-30', headers=auth_headers).status_code == 400
+
+def test_transactions_range(client, auth_headers, history):
+    params = {'product_id': 'P0001', 'start': (history - timedelta(days=401)).isoformat(),
+              'end': (history - timedelta(days=400)).isoformat()}
+    transactions = client.get('/api/inventory/transactions', query_string=params,
+                              headers=auth_headers).get_json()['transactions']
+    assert sorted(t['quantity'] for t in transactions) == [7, 11, 50]
+
+    for paging in ({'limit': -1}, {'limit': 0}, {'limit': 1001}, {'offset': -1}):
+        assert client.get('/api/inventory/transactions', query_string=paging,
+                          headers=auth_headers).status_code == 400
+
+def test_compaction_keeps_daily_totals(app, client, auth_headers, history):
+    params = {'product_id': 'P0001', 'start': (history - timedelta(days=500)).isoformat()}
+
+    def total_sold():
+        return client.get('/api/inventory/sales', query_string=params, headers=auth_headers).get_json()['total_sold']
+
+    before = total_sold()
+    with app.app_context():
+        assert compact_ledger(365, dry_run=True)['transactions'] == 3
+        assert compact_ledger(365)['transactions'] == 3
+        assert Transaction.query.filter_by(product_id='P0001').count() == 4
+
+        # Rebuilding from raw transactions must not drop the compacted days
+        rebuild_rollups()
+        assert DailySales.query.filter(DailySales.sales_date < history - timedelta(days=365)).count() == 2
+
+        assert compact_ledger(365)['transactions'] == 0
+
+    assert total_sold() == before
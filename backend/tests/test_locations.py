@@ -0,0 +1,124 @@
+import pytest
+
+from main import db
+from app.models.inventory import Product, Transaction
+from app.models.locations import StockLevel
+from app.models.rollups import DailySales, StockRollup
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture
+def warehouses(client, auth_headers, assert_within_budget):
+    """Two warehouses; everything starts in WH1, then 30 units of P0001 move to WH2."""
+    response = assert_within_budget('POST', '/api/locations/', headers=auth_headers,
+                                    json={'id': 'WH1', 'name': 'North', 'adopt_stock': True})
+    assert response.get_json()['adopted_products'] == 50
+    assert_within_budget('POST', '/api/locations/', headers=auth_headers, json={'id': 'WH2', 'name': 'South'})
+    response = assert_within_budget('POST', '/api/locations/transfer', headers=auth_headers, json={
+        'product_id': 'P0001', 'from_location': 'WH1', 'to_location': 'WH2', 'quantity': 30})
+    assert response.get_json()['levels'] == {'WH1': 70, 'WH2': 30}
+
+def stock(client, auth_headers, product_id):
+    return client.get(f'/api/locations/products/{product_id}', headers=auth_headers).get_json()
+
+def test_sales_touch_only_their_location(app, client, auth_headers, assert_within_budget, warehouses):
+    response = assert_within_budget('POST', '/api/inventory/transaction', headers=auth_headers, json={
+        'product_id': 'P0001', 'location_id': 'WH2', 'transaction_type': 'sale', 'quantity': 25})
+    assert response.status_code == 201
+    assert response.get_json()['location_stock'] == 5
+    assert response.get_json()['updated_stock'] == 75
+
+    # WH2 cannot sell more than it holds, even though WH1 has plenty
+    response = client.post('/api/inventory/transaction', headers=auth_headers, json={
+        'product_id': 'P0001', 'location_id': 'WH2', 'transaction_type': 'sale', 'quantity': 6})
+    assert response.status_code == 400
+
+    client.post('/api/inventory/transaction', headers=auth_headers, json={
+        'product_id': 'P0001', 'location_id': 'WH1', 'transaction_type': 'restock', 'quantity': 10})
+    assert stock(client, auth_headers, 'P0001') == {
+        'product_id': 'P0001', 'total_stock': 85, 'locations': {'WH1': 80, 'WH2': 5}}
+
+    with app.app_context():
+        assert sum(level.quantity for level in StockLevel.query.filter_by(product_id='P0001')) == 85
+        sale = Transaction.query.filter_by(location_id='WH2', transaction_type='sale').one()
+        history = db.session.get(Product, 'P0001').to_dict()['historical_sales']
+        assert history[sale.transaction_date.strftime('%Y-%m-%d')] == 25
+
+        # Rollups and daily sales follow in the step that updates the total
+        category = db.session.get(Product, 'P0001').category
+        units = sum(p.current_stock for p in Product.query.filter_by(category=category))
+        assert db.session.get(StockRollup, ('category', category)).total_units == units
+        assert db.session.get(DailySales, ('P0001', sale.transaction_date.date())).quantity >= 25
+
+def test_location_managed_products_need_a_location(client, auth_headers, warehouses):
+    response = client.post('/api/inventory/transaction', headers=auth_headers,
+                           json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 1})
+    assert response.status_code == 400
+    response = client.put('/api/inventory/P0002', json={'current_stock': 1}, headers=auth_headers)
+    assert response.status_code == 400
+
+    response = client.post('/api/inventory/transaction', headers=auth_headers, json={
+        'product_id': 'P0002', 'location_id': 'WH2', 'transaction_type': 'sale', 'quantity': 1})
+    assert response.get_json()['message'] == 'Product P0002 is not stocked at location WH2'
+
+def test_transfers_and_stock_takes(client, auth_headers, assert_within_budget, warehouses):
+    response = client.post('/api/locations/transfer', headers=auth_headers, json={
+        'product_id': 'P0001', 'from_location': 'WH2', 'to_location': 'WH1', 'quantity': 31})
+    assert response.status_code == 400
+    assert stock(client, auth_headers, 'P0001')['locations'] == {'WH1': 70, 'WH2': 30}
+
+    response = assert_within_budget('PUT', '/api/locations/WH2/stock/P0001', headers=auth_headers,
+                                    json={'quantity': 12})
+    assert response.get_json()['total_stock'] == 82
+    assert client.put('/api/locations/WH9/stock/P0001', headers=auth_headers,
+                      json={'quantity': 1}).status_code == 400
+
+    summaries = assert_within_budget('GET', '/api/locations/', headers=auth_headers).get_json()
+    assert [(s['id'], s['products'], s['units']) for s in summaries] == [('WH1', 50, 70 + 49 * 100), ('WH2', 1, 12)]
+    levels = assert_within_budget('GET', '/api/locations/WH2/stock', headers=auth_headers).get_json()
+    assert [(level['product_id'], level['quantity']) for level in levels] == [('P0001', 12)]
+
+def test_location_restock(client, auth_headers, assert_within_budget, warehouses):
+    for location_id, quantity in (('WH1', 10), ('WH2', 30)):
+        client.post('/api/inventory/transaction', headers=auth_headers, json={
+            'product_id': 'P0001', 'location_id': location_id, 'transaction_type': 'sale', 'quantity': quantity})
+
+    body = assert_within_budget('GET', '/api/predictions/restock/P0001/locations?trending=false', headers=auth_headers).get_json()
+    locations = {item['location_id']: item for item in body['locations']}
+    assert locations['WH2']['demand_share'] == 0.75 and locations['WH2']['current_stock'] == 0
+
+    # WH2 sells most and is empty: WH1's surplus is moved there before anything is ordered for it
+    wh1, wh2 = locations['WH1'], locations['WH2']
+    moved = sum(transfer['quantity'] for transfer in wh2['transfers'])
+    assert all(transfer['from_location'] == 'WH1' for transfer in wh2['transfers'])
+    assert moved == min(wh2['target_stock'], wh1['current_stock'] - wh1['target_stock'])
+    assert abs(moved + wh2['order_quantity'] - wh2['target_stock']) <= 1
+    assert wh1['order_quantity'] == 0
+
+    response = client.get('/api/predictions/restock/P0002/locations', headers=auth_headers)
+    assert len(response.get_json()['locations']) == 1
+
+def test_location_sales_commit_without_the_product_row(app, client, auth_headers, monkeypatch, warehouses):
+    from app.services import location_service
+
+    def fail(*args):
+        raise RuntimeError('total update failed')
+
+    monkeypatch.setattr(location_service, 'add_to_sales_history', fail)
+    response = client.post('/api/inventory/transaction', headers=auth_headers, json={
+        'product_id': 'P0001', 'location_id': 'WH2', 'transaction_type': 'sale', 'quantity': 5})
+    assert response.status_code == 201
+
+    # The sale committed on its own; the product row, rollups and daily sales are a separate step
+    with app.app_context():
+        assert db.session.get(StockLevel, ('P0001', 'WH2')).quantity == 25
+        assert Transaction.query.filter_by(location_id='WH2', transaction_type='sale').count() == 1
+        assert db.session.get(Product, 'P0001').current_stock == 100
+        assert db.session.get(StockRollup, ('category', 'Toys')).total_units == 30 * 100
+        assert not DailySales.query.filter(DailySales.product_id == 'P0001', DailySales.quantity == 5).count()
+
+def test_stock_takes_need_located_stock(client, auth_headers):
+    client.post('/api/locations/', headers=auth_headers, json={'id': 'WH1', 'name': 'North'})
+    response = client.put('/api/locations/WH1/stock/P0001', headers=auth_headers, json={'quantity': 12})
+    assert response.status_code == 400
+    assert client.get('/api/inventory/P0001', headers=auth_headers).get_json()['current_stock'] == 100
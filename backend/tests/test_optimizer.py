@@ -0,0 +1,82 @@
+import json
+from datetime import datetime, timedelta
+from statistics import NormalDist
+
+import pytest
+
+from main import db
+from app.models.inventory import Product
+from app.services.ml_service import recommend_restock
+from conftest import make_product
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture
+def suppliers(app):
+    """Supplier X has one product below its reorder point and one due in a few days; Y only the latter."""
+    today = datetime.utcnow().date()
+    # 20 days ending today, mean 8, std ~2.05
+    history = json.dumps({str(today - timedelta(days=20 - day)): 10 if day % 2 else 6 for day in range(1, 21)})
+    with app.app_context():
+        for product_id, supplier, stock in (('X0001', 'X', 10), ('X0002', 'X', 60), ('Y0001', 'Y', 60)):
+            db.session.add(make_product(product_id, supplier=supplier, current_stock=stock, lead_time=4,
+                                        purchase_price=20.0, historical_sales=history))
+        db.session.commit()
+
+def test_policy_for_one_product(client, auth_headers, suppliers):
+    plan = client.get('/api/predictions/optimize?supplier=X&ordering_cost=40&holding_rate=0.2',
+                      headers=auth_headers).get_json()
+    item = next(item for item in plan['suppliers'][0]['items'] if item['id'] == 'X0001')
+
+    std = (sum((q - 8) ** 2 for q in [10, 6] * 10) / 19) ** 0.5
+    safety = NormalDist().inv_cdf(0.95) * std * 2
+    assert item['daily_demand'] == 8
+    assert item['safety_stock'] == round(safety, 1)
+    assert item['reorder_point'] == round(8 * 4 + safety, 1)
+    assert item['eoq'] == round((2 * 8 * 365 * 40 / (0.2 * 20)) ** 0.5, 1)
+    assert item['order_quantity'] == int(item['eoq']) + 1
+    assert item['days_of_cover'] == 1.2
+
+def test_orders_are_consolidated_per_supplier(client, auth_headers, suppliers):
+    plan = client.get('/api/predictions/optimize', headers=auth_headers).get_json()
+    orders = {order['supplier']: order for order in plan['suppliers']}
+
+    # X0002 is due within the review period and rides along on X's order; Y gets no order yet
+    assert [(item['id'], item['consolidated']) for item in orders['X']['items']] == [('X0001', False),
+                                                                                      ('X0002', True)]
+    assert 'Y' not in orders
+    assert plan['summary']['ordering_cost_saved'] == 50.0
+    assert plan['summary']['purchase_orders'] == len(plan['suppliers'])
+
+def test_what_if_parameters(client, auth_headers, assert_within_budget, suppliers):
+    def x0001(**params):
+        plan = assert_within_budget('GET', '/api/predictions/optimize', query_string=params,
+                                    headers=auth_headers).get_json()
+        return next(item for order in plan['suppliers'] for item in order['items'] if item['id'] == 'X0001')
+
+    assert x0001(service_level=0.99)['safety_stock'] > x0001(service_level=0.9)['safety_stock']
+    assert x0001(ordering_cost=200)['eoq'] == pytest.approx(2 * x0001(ordering_cost=50)['eoq'], abs=0.1)
+
+    for params in ({'service_level': 1}, {'holding_rate': 0}, {'ordering_cost': 'lots'}, {'review_days': -1}):
+        assert client.get('/api/predictions/optimize', query_string=params, headers=auth_headers).status_code == 400
+
+def test_optimizer_reads_the_sales_store(app, client, auth_headers, suppliers, tmp_path):
+    from app.services.sales_store import rebuild_sales_store
+
+    app.config.update(SALES_STORE_ENABLED=True, SALES_STORE_DIR=str(tmp_path))
+    with app.app_context():
+        rebuild_sales_store(db.session)
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'Y0001', 'transaction_type': 'sale', 'quantity': 55})
+
+    # Today's large sale is read from the store and puts Y0001 below its reorder point
+    plan = client.get('/api/predictions/optimize?supplier=Y', headers=auth_headers).get_json()
+    assert [item['id'] for item in plan['suppliers'][0]['items']] == ['Y0001']
+
+def test_restock_recommendation_uses_lead_time(app):
+    with app.app_context():
+        product = db.session.get(Product, 'P0001')
+        short = recommend_restock(product)
+        product.lead_time = 30
+        assert recommend_restock(product) > short
+        db.session.rollback()
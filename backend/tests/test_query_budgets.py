@@ -0,0 +1,95 @@
+import pytest
+
+from app.utils import idempotency
+from app.utils.query_counter import get_query_budget
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def test_every_route_declares_a_budget(app):
+    missing = [
+        rule.rule for rule in app.url_map.iter_rules()
+        if rule.endpoint != 'static' and get_query_budget(app.view_functions[rule.endpoint]) is None
+    ]
+    assert not missing, f"Routes without a query budget: {missing}"
+
+def test_auth_routes(client, assert_within_budget, auth_headers):
+    assert_within_budget('POST', '/api/auth/register',
+                         json={'username': 'new', 'email': 'new@inventiq.com', 'password': 'secret'})
+    assert_within_budget('POST', '/api/auth/login',
+                         json={'username': 'admin', 'password': 'admin123', 'role': 'admin'})
+    assert_within_budget('GET', '/api/auth/status', headers=auth_headers)
+
+def test_product_reads(assert_within_budget, auth_headers):
+    response = assert_within_budget('GET', '/api/inventory/', headers=auth_headers)
+    assert len(response.get_json()) == 50
+
+    response = assert_within_budget('GET', '/api/inventory/P0001', headers=auth_headers)
+    assert response.status_code == 200
+
+    assert assert_within_budget('GET', '/api/inventory/sales?granularity=month', headers=auth_headers).status_code == 200
+    assert assert_within_budget('GET', '/api/inventory/transactions', headers=auth_headers).status_code == 200
+
+def test_product_writes(assert_within_budget, auth_headers):
+    product = {
+        'id': 'N0001', 'name': 'New', 'category': 'Toys', 'supplier': 'Supplier A', 'current_stock': 5,
+        'reorder_level': 2, 'purchase_price': 1.0, 'selling_price': 2.0, 'lead_time': 3,
+    }
+    assert assert_within_budget('POST', '/api/inventory/', json=product, headers=auth_headers).status_code == 201
+    assert assert_within_budget('PUT', '/api/inventory/N0001', json={'name': 'Renamed'},
+                                headers=auth_headers).status_code == 200
+    assert assert_within_budget('DELETE', '/api/inventory/N0001', headers=auth_headers).status_code == 200
+
+def test_transactions(assert_within_budget, auth_headers):
+    for transaction_type in ('sale', 'restock'):
+        response = assert_within_budget('POST', '/api/inventory/transaction', headers=auth_headers,
+                                        json={'product_id': 'P0002', 'transaction_type': transaction_type,
+                                              'quantity': 3})
+        assert response.status_code == 201
+
+    # With an Idempotency-Key: claiming it, storing the response and, now and then, pruning old keys
+    idempotency._last_prune[0] = 0.0
+    response = assert_within_budget('POST', '/api/inventory/transaction',
+                                    headers={**auth_headers, 'Idempotency-Key': 'budget'},
+                                    json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 3})
+    assert response.status_code == 201
+
+def test_supplier_delete(assert_within_budget, auth_headers):
+    response = assert_within_budget('DELETE', '/api/inventory/S0001?delete_supplier=true', headers=auth_headers)
+    assert response.status_code == 200
+
+def test_bulk_routes(assert_within_budget, auth_headers):
+    assert assert_within_budget('DELETE', '/api/inventory/bulk?category=Books&dry_run=true',
+                                headers=auth_headers).status_code == 200
+    assert assert_within_budget('PATCH', '/api/inventory/bulk', headers=auth_headers,
+                                json={'filter': {'category': 'Toys'}, 'adjust': {'selling_price_pct': 5}}
+                                ).status_code == 200
+    assert assert_within_budget('DELETE', '/api/inventory/bulk?category=Books',
+                                headers=auth_headers).status_code == 200
+
+def test_predictions(assert_within_budget, auth_headers):
+    assert assert_within_budget('GET', '/api/predictions/forecast/P0003', headers=auth_headers).status_code == 200
+    assert assert_within_budget('GET', '/api/predictions/restock/P0003', headers=auth_headers).status_code == 200
+    assert assert_within_budget('POST', '/api/predictions/insights', json={'query': 'what is low on stock?'},
+                                headers=auth_headers).status_code == 200
+
+def test_dashboard(assert_within_budget, auth_headers):
+    assert assert_within_budget('GET', '/api/predictions/dashboard', headers=auth_headers).status_code == 200
+    assert assert_within_budget('GET', '/api/predictions/trends', headers=auth_headers).status_code == 200
+
+def test_alerts(assert_within_budget, auth_headers):
+    assert assert_within_budget('GET', '/api/alerts/', headers=auth_headers).status_code == 200
+    assert assert_within_budget('GET', '/api/alerts/stream', headers=auth_headers).status_code == 200
+
+def test_metrics(assert_within_budget):
+    assert assert_within_budget('GET', '/metrics').status_code == 200
+
+def test_counter_flags_repeated_statements(app, query_counter):
+    from app.models.inventory import Product
+
+    with app.app_context():
+        with query_counter() as counter:
+            for product in Product.query.limit(5).all():
+                product.transactions  # lazy backref, one query per product
+
+    assert counter.count == 6
+    assert max(counter.repeated().values()) == 5
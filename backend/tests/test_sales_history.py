@@ -0,0 +1,96 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from main import db
+from app.models.inventory import Product, Transaction
+from app.models.rollups import TrendRefresh
+from app.services import sales_history
+from app.services.ml_service import sales_key
+from app.services.sales_history import replay_pending_sales
+from app.services.trend_service import refresh_trends
+from conftest import sell
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture
+def write_behind(app):
+    # A long interval so only the explicit flushes below run
+    app.config.update(SALES_HISTORY_WRITE_BEHIND=True, SALES_HISTORY_FLUSH_MS=60000, SALES_HISTORY_FLUSH_EVENTS=1000)
+    sales_history.buffer._swept_at = 0.0
+    yield sales_history.buffer
+    with sales_history.buffer._lock:
+        sales_history.buffer._ids.clear()
+
+def sold_today(app, product_id):
+    with app.app_context():
+        history = json.loads(db.session.get(Product, product_id).historical_sales)
+        return history.get(sales_key(datetime.utcnow()), 0)
+
+def test_sales_are_folded_in_batches(app, client, auth_headers, write_behind):
+    assert sell(client, auth_headers, 'P0001', 2).get_json()['updated_stock'] == 98
+    sell(client, auth_headers, 'P0001', 3)
+    sell(client, auth_headers, 'P0002', 1)
+
+    # Stock moves at once; the history waits for the flush, and trends wait for the history
+    assert write_behind.pending() == 3 and sold_today(app, 'P0001') == 0
+    with app.app_context():
+        refresh_trends()
+        first_pending = db.session.execute(
+            select(func.min(Transaction.id)).where(Transaction.history_pending.is_(True))).scalar()
+        assert db.session.get(TrendRefresh, 1).last_transaction_id < first_pending
+    assert write_behind.flush() == 3
+    assert (sold_today(app, 'P0001'), sold_today(app, 'P0002')) == (5, 1)
+    assert write_behind.flush() == 0
+    with app.app_context():
+        assert Transaction.query.filter_by(history_pending=True).count() == 0
+
+def test_unflushed_sales_are_replayed_once(app, client, auth_headers, write_behind):
+    lost = sell(client, auth_headers, 'P0003', 4).get_json()['transaction']['id']
+    # The worker dies before flushing: its buffer is gone but the row is still pending
+    write_behind._ids.clear()
+    with app.app_context():
+        assert replay_pending_sales(db.session) == 1
+        assert replay_pending_sales(db.session) == 0
+    assert sold_today(app, 'P0003') == 4
+
+    # Another worker's flush picks up sales left pending for too long, even with nothing of its own to flush
+    sell(client, auth_headers, 'P0004', 1)
+    write_behind._ids.clear()
+    with app.app_context():
+        stale = Transaction.query.filter_by(history_pending=True).one()
+        stale.transaction_date -= timedelta(minutes=5)
+        db.session.commit()
+    assert write_behind.flush() == 1
+    # Idle flushes sweep once per SALES_HISTORY_REPLAY_SECONDS, busy ones every time
+    assert write_behind.flush() == 0
+    sell(client, auth_headers, 'P0005', 2)
+    assert write_behind.flush() == 1
+    with app.app_context():
+        assert json.loads(db.session.get(Product, 'P0004').historical_sales).get(
+            sales_key(datetime.utcnow() - timedelta(minutes=5))) == 1
+        assert db.session.get(Transaction, lost).history_pending is False
+
+def test_failed_flushes_keep_a_bounded_retry(app, client, auth_headers, write_behind, monkeypatch):
+    monkeypatch.setattr(sales_history, 'CLAIM_CHUNK', 2)
+    for _ in range(5):
+        sell(client, auth_headers, 'P0006', 1)
+    write_behind._ids.extend(range(10**6, 10**6 + 5000))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('database is locked')
+
+    with monkeypatch.context() as patched:
+        patched.setattr(sales_history, 'apply_pending_sales', fail)
+        assert write_behind.flush() == 0
+    assert write_behind.pending() == app.config['SALES_HISTORY_FLUSH_EVENTS']
+
+    # The dropped ids are still pending in the table; claimed two at a time, they are all folded in
+    write_behind._ids.clear()
+    with app.app_context():
+        ids = [row.id for row in Transaction.query.filter_by(product_id='P0006', history_pending=True)]
+    write_behind._ids.extend(ids)
+    assert write_behind.flush() == 5
+    assert sold_today(app, 'P0006') == 5
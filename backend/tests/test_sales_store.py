@@ -0,0 +1,114 @@
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from main import db
+from app.models.inventory import Product
+from app.services import sales_history
+from app.services.sales_store import add_sales, demand_matrix, get_sales_store, product_history, rebuild_sales_store
+from conftest import make_product
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+@pytest.fixture
+def store(app, tmp_path):
+    app.config.update(SALES_STORE_ENABLED=True, SALES_STORE_DIR=str(tmp_path))
+    with app.app_context():
+        rebuild_sales_store(db.session, chunk_size=7)
+    return tmp_path
+
+def test_legacy_history_ends_before_creation():
+    history = product_history('{"Day-1": 4, "Day-2": 5, "2025-03-03": 6}', datetime(2025, 3, 10))
+    assert {date.fromordinal(day): quantity for day, quantity in history.items()} == {
+        date(2025, 3, 1): 4, date(2025, 3, 2): 5, date(2025, 3, 3): 6}
+
+def test_demand_without_the_store_follows_the_calendar(app):
+    today = datetime.utcnow().date()
+    history = json.dumps({str(today - timedelta(days=9)): 2, str(today - timedelta(days=5)): 4,
+                          str(today - timedelta(days=1)): 7})
+    with app.app_context():
+        db.session.add(make_product('G0001', historical_sales=history))
+        db.session.commit()
+
+        # Days without an entry are days without sales, not gaps to close up
+        assert demand_matrix(['G0001', 'missing'], 7).tolist() == [[0, 4, 0, 0, 0, 7, 0], [0] * 7]
+        product = db.session.get(Product, 'G0001')
+        histories = {'G0001': (product.historical_sales, product.created_at)}
+        assert demand_matrix(['G0001'], 7, histories).tolist() == [[0, 4, 0, 0, 0, 7, 0]]
+
+def test_rebuild_matches_database(app, store):
+    with app.app_context():
+        loaded = get_sales_store()
+        assert loaded.products == 50
+        for product_id in ('P0001', 'S0010'):
+            product = db.session.get(Product, product_id)
+            expected = product_history(product.historical_sales, product.created_at)
+            row = loaded.history(product_id)
+            assert {loaded.start.toordinal() + day: int(row[day]) for day in row.nonzero()[0]} == expected
+
+        assert loaded.history('missing') is None
+        with pytest.raises(ValueError):
+            loaded.matrix()[0, 0] = 1
+
+def test_sales_and_new_products_are_appended(app, client, auth_headers, store):
+    with app.app_context():
+        opened = get_sales_store()
+        before = int(opened.history('P0002', days=1)[0])
+
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 4})
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0002', 'transaction_type': 'restock', 'quantity': 40})
+    client.post('/api/inventory/', headers=auth_headers, json={
+        'id': 'N0001', 'name': 'New', 'category': 'Garden', 'supplier': 'Supplier B', 'current_stock': 3,
+        'reorder_level': 5, 'purchase_price': 1.0, 'selling_price': 2.0, 'lead_time': 4,
+        'historical_sales': {'Day-1': 2, 'Day-2': 3}})
+
+    with app.app_context():
+        # Same generation: the open store takes in the new row instead of reopening
+        loaded = get_sales_store()
+        assert loaded is opened
+        assert int(loaded.history('P0002', days=1)[0]) == before + 4
+        assert list(loaded.history('N0001', days=3)) == [2, 3, 0]
+
+def test_write_behind_sales_are_appended_by_the_flush(app, client, auth_headers, store):
+    app.config.update(SALES_HISTORY_WRITE_BEHIND=True, SALES_HISTORY_FLUSH_MS=60000, SALES_HISTORY_FLUSH_EVENTS=1000)
+    with app.app_context():
+        loaded = get_sales_store()
+        before = int(loaded.history('P0002', days=1)[0])
+    meta = (store / 'meta.json').read_text()
+
+    for _ in range(3):
+        client.post('/api/inventory/transaction', headers=auth_headers,
+                    json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 2})
+    with app.app_context():
+        assert int(get_sales_store().history('P0002', days=1)[0]) == before
+    assert sales_history.buffer.flush() == 3
+
+    with app.app_context():
+        assert get_sales_store() is loaded and int(loaded.history('P0002', days=1)[0]) == before + 6
+    # Known product, existing day: the data file changes, meta.json does not
+    assert (store / 'meta.json').read_text() == meta
+
+def test_store_grows_past_its_capacity(app, store):
+    with app.app_context():
+        loaded = get_sales_store()
+        capacity = loaded.meta['day_capacity']
+        later = loaded.start + timedelta(days=capacity + 10)
+        assert add_sales({('P0003', later): 9, ('X0001', loaded.start): 1})
+
+        grown = get_sales_store()
+        assert grown.meta['generation'] == loaded.meta['generation'] + 1
+        assert grown.meta['day_capacity'] > capacity
+        assert int(grown.history('P0003', end=later)[-1]) == 9
+        assert int(grown.history('X0001', end=later)[0]) == 1
+        assert list(grown.history('P0001', end=loaded.end)) == list(loaded.history('P0001', end=loaded.end))
+        assert sorted(path.name for path in store.glob('*.i32')) == [f"sales.{grown.meta['generation']}.i32"]
+
+def test_disabled_store_is_left_alone(app, client, auth_headers, store):
+    app.config['SALES_STORE_ENABLED'] = False
+    meta = (store / 'meta.json').read_text()
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0002', 'transaction_type': 'sale', 'quantity': 4})
+    assert (store / 'meta.json').read_text() == meta
@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import text
+
+from main import db
+from app.models.inventory import Product
+from app.services import search_service
+from app.services.search_service import search_products
+from conftest import product_fields
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def new_product(product_id, name, **overrides):
+    return product_fields(product_id, name=name, **{'category': 'Garden', 'supplier': 'Greenleaf', **overrides})
+
+def ids(response):
+    return [product['id'] for product in response.get_json()['products']]
+
+def test_prefix_search_ranks_and_paginates(client, auth_headers, assert_within_budget, monkeypatch):
+    client.post('/api/inventory/', json=new_product('G0001', 'Blue Garden Chair'), headers=auth_headers)
+    client.post('/api/inventory/', json=new_product('G0002', 'Garden Hose', category='Toys'), headers=auth_headers)
+    client.post('/api/inventory/', json=new_product('G0003', 'Rake'), headers=auth_headers)
+
+    response = assert_within_budget('GET', '/api/inventory/search?q=blu%20cha', headers=auth_headers)
+    assert ids(response) == ['G0001']
+    # Name and category beat name alone, which beats category alone
+    assert ids(client.get('/api/inventory/search?q=garden', headers=auth_headers)) == ['G0001', 'G0002', 'G0003']
+    # Product ids are searchable too, and FTS syntax in the query is treated as text
+    assert ids(client.get('/api/inventory/search?q=p0012', headers=auth_headers)) == ['P0012']
+    assert ids(client.get('/api/inventory/search?q="p0012" OR*', headers=auth_headers)) == []
+
+    first = client.get('/api/inventory/search?q=product&per_page=15', headers=auth_headers).get_json()
+    last = client.get('/api/inventory/search?q=product&per_page=15&page=4', headers=auth_headers).get_json()
+    assert first['total'] == 50 and first['total_exact'] and len(first['products']) == 15 and len(last['products']) == 5
+    # Past the ranked candidates the remaining matches follow, each exactly once
+    monkeypatch.setattr(search_service, 'RANK_CANDIDATES', 10)
+    monkeypatch.setattr(search_service, 'COUNT_LIMIT', 40)
+    responses = [client.get(f'/api/inventory/search?q=product&per_page=15&page={page}', headers=auth_headers)
+                 for page in range(1, 5)]
+    pages = [ids(response) for response in responses]
+    assert {(response.get_json()['total'], response.get_json()['total_exact']) for response in responses} == \
+        {(40, False)}
+    assert sorted(sum(pages, [])) == sorted(ids(client.get('/api/inventory/search?q=product&per_page=100',
+                                                           headers=auth_headers)))
+    books = client.get('/api/inventory/search?q=product&category=Books', headers=auth_headers).get_json()
+    assert books['total'] == 20
+
+    assert client.get('/api/inventory/search?q=', headers=auth_headers).status_code == 400
+    assert client.get('/api/inventory/search?q=x&per_page=500', headers=auth_headers).status_code == 400
+
+def test_index_follows_every_kind_of_write(app, client, auth_headers):
+    client.put('/api/inventory/P0003', json={'name': 'Wooden Train'}, headers=auth_headers)
+    client.delete('/api/inventory/P0005', headers=auth_headers)
+    client.patch('/api/inventory/bulk', headers=auth_headers,
+                 json={'filter': {'supplier': 'Supplier Bulk'}, 'set': {'supplier': 'Acme Wholesale'}})
+
+    with app.app_context():
+        assert [product.id for product in search_products('wood')[0]] == ['P0003']
+        assert search_products('p0005') == ([], 0, True)
+        assert search_products('acme')[1] == 10
+        assert search_products('bulk')[1] == 0
+
+        # Set-based statements outside the ORM are indexed by the triggers as well
+        db.session.execute(Product.__table__.update().where(Product.id == 'P0007').values(name='Red Kite'))
+        db.session.commit()
+        assert [product.id for product in search_products('kite')[0]] == ['P0007']
+
+def test_index_survives_renumbered_rowids(app, client, auth_headers):
+    client.put('/api/inventory/P0040', json={'name': 'Wooden Train'}, headers=auth_headers)
+
+    with app.app_context():
+        # What VACUUM or a dump and reload may do to a table with a string primary key
+        db.session.execute(text('UPDATE products SET rowid = rowid + 1000'))
+        db.session.commit()
+        assert [product.id for product in search_products('wood')[0]] == ['P0040']
+        assert [product.id for product in search_products('p0039')[0]] == ['P0039']
+
+    client.put('/api/inventory/P0039', json={'name': 'Kite'}, headers=auth_headers)
+    client.delete('/api/inventory/P0004', headers=auth_headers)
+    with app.app_context():
+        assert [product.id for product in search_products('kite')[0]] == ['P0039']
+        assert search_products('p0004') == ([], 0, True)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from sqlalchemy import update
+
+from main import db
+from app.models.inventory import Product
+from app.models.rollups import CatalogVersion
+from app.services import similarity_service
+from app.services.similarity_service import SimilarityIndex, get_similarity_index, mentioned_product
+from conftest import product_fields
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def test_blocked_search_matches_brute_force(monkeypatch):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((1000, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    index = SimilarityIndex([f'X{row}' for row in range(1000)], vectors, np.ones(1000), version=1)
+    index.alive[7] = False
+    monkeypatch.setattr(similarity_service, 'SEARCH_BLOCK_ROWS', 64)
+
+    rows, scores = index.search(vectors[3], k=10, exclude=3)
+    expected = np.argsort(-(vectors @ vectors[3]))
+    assert rows.tolist() == [row for row in expected.tolist() if row not in (3, 7)][:10]
+    assert np.all(np.diff(scores) <= 0)
+
+    # Approximate search finds the close neighbours that clustered profiles have
+    centres = rng.standard_normal((50, 16))
+    clustered = (np.repeat(centres, 20, axis=0) + 0.1 * rng.standard_normal((1000, 16))).astype(np.float32)
+    clustered /= np.linalg.norm(clustered, axis=1, keepdims=True)
+    index = SimilarityIndex([f'X{row}' for row in range(1000)], clustered, np.ones(1000), version=1)
+    exact, _ = index.search(clustered[3], k=5, exclude=3)
+    approximate, _ = index.search(clustered[3], k=5, exclude=3, approximate=True)
+    assert approximate.tolist() == exact.tolist()
+
+def test_similar_products_route(client, auth_headers, assert_within_budget):
+    body = assert_within_budget('GET', '/api/predictions/similar/P0001?k=5', headers=auth_headers).get_json()
+    neighbours = body['similar_products']
+    assert len(neighbours) == 5 and 'P0001' not in [item['id'] for item in neighbours]
+    # Same sales and price everywhere: category and supplier decide
+    assert {(item['category'], item['supplier']) for item in neighbours} == {('Toys', 'Supplier A')}
+
+    approximate = client.get('/api/predictions/similar/P0001?k=5&mode=approximate', headers=auth_headers).get_json()
+    assert approximate['similar_products'][0]['similarity'] == neighbours[0]['similarity']
+    assert client.get('/api/predictions/similar/NOPE', headers=auth_headers).status_code == 404
+    assert client.get('/api/predictions/similar/P0001?mode=fuzzy', headers=auth_headers).status_code == 400
+
+def test_index_follows_writes_and_gives_cold_start_prior(app, client, auth_headers, assert_within_budget):
+    with app.app_context():
+        before = get_similarity_index()
+
+    client.post('/api/inventory/', json=product_fields('N0001'), headers=auth_headers)
+    client.put('/api/inventory/P0003', json={'category': 'Books'}, headers=auth_headers)
+    client.delete('/api/inventory/P0005', headers=auth_headers)
+
+    with app.app_context():
+        index = get_similarity_index()
+        assert index.built_at == before.built_at  # caught up, not rebuilt
+        assert not index.alive[index.index['P0005']]
+        # A copy: requests still searching the old index see it unchanged
+        assert before.alive[before.index['P0005']] and 'N0001' not in before.index
+        row = before.index['P0001']
+        assert len(before.search(before.vectors[row], k=100, exclude=row)[0]) == len(before.ids) - 1
+    neighbours = client.get('/api/predictions/similar/P0001?k=100', headers=auth_headers).get_json()
+    ids = [item['id'] for item in neighbours['similar_products']]
+    assert 'P0005' not in ids and 'N0001' in ids
+    assert next(item for item in neighbours['similar_products'] if item['id'] == 'P0003')['category'] == 'Books'
+
+    # No sales of its own: forecast from what the catalog's Toys sell a day (weekly 1..7, mean 4)
+    forecast = assert_within_budget('GET', '/api/predictions/forecast/N0001?days=3', headers=auth_headers).get_json()
+    assert forecast['forecast'] == [4, 4, 4]
+
+def test_index_follows_other_processes_without_rebuilding(app):
+    with app.app_context():
+        before = get_similarity_index()
+        vector = before.vectors[before.index['P0003']].copy()
+        # Another worker's edit: straight to the database, the catalog version tells this process
+        db.session.execute(update(Product).where(Product.id == 'P0003').values(category='Books'))
+        db.session.execute(update(CatalogVersion).values(version=CatalogVersion.version + 1))
+        db.session.commit()
+
+        stale = before.snapshot
+        index = get_similarity_index()
+        assert index.built_at == before.built_at
+        assert not np.array_equal(index.vectors[index.index['P0003']], vector)
+        assert np.array_equal(before.vectors[before.index['P0003']], vector)
+
+        # A request holding a snapshot from before that catch-up does not take the index back to it
+        assert get_similarity_index(stale).snapshot is index.snapshot
+
+def test_mentioned_product_is_a_catalog_id(app):
+    with app.app_context():
+        assert mentioned_product('What sells like p0012?') == 'P0012'
+        assert mentioned_product('Is anything similar to P9999?') is None
+        assert mentioned_product('What sells like HOT cakes?') is None
+        assert mentioned_product('Show me something similar to THIS') is None
+
+def test_assistant_answers_what_sells_like(client, auth_headers):
+    response = client.post('/api/predictions/insights', headers=auth_headers,
+                           json={'query': 'What sells like p0012?'}).get_json()
+    assert response['insights'].startswith('Products that sell most like P0012 are:')
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.simulation_service import simulate
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def test_simulate_lost_sales_and_replenishment():
+    history = np.full((3, 30), 5, dtype=np.int32)
+    outcome = simulate(history,
+                       stock=np.array([1000, 0, 0]),
+                       lead_time=np.array([5, 5, 5]),
+                       reorder_point=np.array([0.0, 0.0, -1.0]),  # the last one never reorders
+                       order_quantity=np.array([50.0, 50.0, 50.0]),
+                       paths=200, horizon_days=20, seed=1)
+
+    assert outcome['stockout_probability'].tolist() == [0.0, 1.0, 1.0]
+    assert outcome['expected_orders'][0] == 0
+    # Empty for days 0-4 until the first order arrives; 50 units last to day 14, when the next is ordered,
+    # which arrives on day 19
+    assert outcome['expected_lost_sales'][1] == 5 * 5 + 4 * 5
+    assert outcome['expected_orders'][1] == 2
+    assert outcome['expected_lost_sales'][2] == 20 * 5
+    assert outcome['fill_rate'][2] == 0
+    assert outcome['expected_ending_stock'][0] == 1000 - 20 * 5
+
+def test_simulate_is_reproducible_and_varies_with_demand():
+    rng = np.random.default_rng(3)
+    history = rng.poisson(4, (20, 60)).astype(np.int32)
+    args = (history, np.full(20, 30), np.full(20, 7), np.full(20, 20.0), np.full(20, 40.0))
+
+    for distribution in ('empirical', 'fitted'):
+        first = simulate(*args, paths=500, distribution=distribution, seed=11)
+        again = simulate(*args, paths=500, distribution=distribution, seed=11)
+        assert np.array_equal(first['expected_lost_sales'], again['expected_lost_sales'])
+        assert 0 < first['stockout_probability'].mean() < 1
+
+def test_simulate_route(app, client, auth_headers, assert_within_budget):
+    body = {'product_ids': ['P0001', 'P0002'], 'paths': 300, 'horizon_days': 14, 'seed': 5}
+    response = assert_within_budget('POST', '/api/predictions/simulate', headers=auth_headers, json=body)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['summary']['products'] == 2
+    assert {item['id'] for item in result['products']} == {'P0001', 'P0002'}
+    assert result == {**client.post('/api/predictions/simulate', headers=auth_headers,
+                                    json=body).get_json(), 'elapsed_ms': result['elapsed_ms']}
+
+    # A policy that never reorders runs out of 100 units within the horizon
+    empty = client.post('/api/predictions/simulate', headers=auth_headers, json={
+        **body, 'product_ids': ['P0001'], 'reorder_point': -1, 'horizon_days': 60}).get_json()
+    assert empty['products'][0]['stockout_probability'] == 1.0
+
+    for bad in ({'paths': 0}, {'distribution': 'normal'}, {'product_ids': ['NOPE']}, {'service_level': 2},
+                {'items': 0}):
+        response = client.post('/api/predictions/simulate', headers=auth_headers, json={**body, **bad})
+        assert response.status_code == 400
+
+    # 2 products x 300 paths x 14 days
+    app.config['SIMULATION_MAX_CELLS'] = 2 * 300 * 14 - 1
+    assert client.post('/api/predictions/simulate', headers=auth_headers, json=body).status_code == 400
+
+def test_simulation_processes_are_shared_between_web_workers(app):
+    from app.services.simulation_service import _workers
+
+    with app.app_context():
+        app.config.update(SIMULATION_WORKERS=8, WEB_WORKERS=3)
+        assert _workers() == 2
+        app.config.update(WEB_WORKERS=16)
+        assert _workers() == 1
+
+def test_shipped_gunicorn_config_tells_the_app_its_worker_count(app):
+    from app.services.simulation_service import _workers
+
+    def web_workers(**environ):
+        env = {name: value for name, value in os.environ.items()
+               if name not in ('WEB_CONCURRENCY', 'GUNICORN_WORKERS')}
+        script = ("import runpy; runpy.run_path('gunicorn.conf.py'); "
+                  "from config import Config; print(Config.WEB_WORKERS)")
+        result = subprocess.run([sys.executable, '-c', script], cwd=Path(__file__).parent.parent,
+                                env={**env, **environ}, capture_output=True, text=True, check=True)
+        return int(result.stdout)
+
+    # One worker per core by default, so each gets one simulation process rather than all of them
+    assert web_workers() == os.cpu_count()
+    with app.app_context():
+        app.config.update(SIMULATION_WORKERS=0, WEB_WORKERS=web_workers())
+        assert _workers() == 1
+        app.config.update(SIMULATION_WORKERS=8, WEB_WORKERS=web_workers(GUNICORN_WORKERS='4'))
+        assert _workers() == 2
@@ -0,0 +1,70 @@
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from conftest import make_product
+from main import db
+from app.models.rollups import ProductTrend
+from app.services.ml_service import sales_key
+from app.services.trend_service import BASELINE_DAYS, RECENT_DAYS, refresh_trends, trend_metrics
+
+pytestmark = pytest.mark.usefixtures('catalog')
+
+def history(quantities):
+    """historical_sales JSON with one dated entry per quantity, the last one today."""
+    today = datetime.utcnow()
+    return json.dumps({sales_key(today - timedelta(days=len(quantities) - 1 - offset)): quantity
+                       for offset, quantity in enumerate(quantities)})
+
+def test_trend_metrics():
+    days = BASELINE_DAYS + RECENT_DAYS
+    weekly = [day % 7 + 1 for day in range(days)]
+    matrix = np.array([
+        weekly,
+        [4] * BASELINE_DAYS + [4 + day for day in range(RECENT_DAYS)],   # ramping up
+        [10] * BASELINE_DAYS + [3] * RECENT_DAYS,                        # collapsed
+        [0] * (days - 3) + [1, 0, 1],                                    # too few units to tell
+        [0] * (days - RECENT_DAYS) + [6] * RECENT_DAYS,                  # new product selling well
+    ], dtype=np.int32)
+
+    metrics = trend_metrics(matrix)
+    assert metrics['trend'].tolist() == ['stable', 'up', 'down', 'stable', 'up']
+    assert metrics['slope'][1] == pytest.approx(1.0)
+    assert metrics['slope'][2] == pytest.approx(0.0)
+    assert metrics['acceleration'][1] == pytest.approx(0.0)
+    assert metrics['baseline_mean'][0] == pytest.approx(4.0)
+
+def test_trends_drive_restock_and_summaries(app, client, auth_headers):
+    with app.app_context():
+        db.session.add(make_product('T0001', historical_sales=history([3] * 42 + [12] * 14)))
+        db.session.add(make_product('T0002', historical_sales=history([9] * 42 + [1] * 14)))
+        db.session.commit()
+
+    trends = client.get('/api/predictions/trends', headers=auth_headers).get_json()
+    assert (trends['trendingUp'], trends['trendingDown'], trends['stableProducts']) == (1, 1, 50)
+    assert [item['id'] for item in trends['trendingProducts']] == ['T0001']
+    assert [item['id'] for item in trends['decliningProducts']] == ['T0002']
+
+    # Detected trend adds the buffer; ?trending=false turns it off again (same seed: the forecast is noisy)
+    np.random.seed(0)
+    detected = client.get('/api/predictions/restock/T0001', headers=auth_headers).get_json()
+    assert detected['trend']['trend'] == 'up' and detected['is_trending']
+    np.random.seed(0)
+    plain = client.get('/api/predictions/restock/T0001?trending=false', headers=auth_headers).get_json()
+    assert detected['recommendation'] == round(plain['recommendation'] * 1.2)
+    forced = client.get('/api/predictions/restock/P0001?trending=yes', headers=auth_headers).get_json()
+    assert forced['trend']['trend'] == 'stable' and forced['is_trending']
+
+def test_incremental_refresh(app, client, auth_headers):
+    with app.app_context():
+        assert refresh_trends() == 50
+        assert refresh_trends() == 0
+
+    client.post('/api/inventory/transaction', headers=auth_headers,
+                json={'product_id': 'P0005', 'transaction_type': 'sale', 'quantity': 60})
+    with app.app_context():
+        assert refresh_trends() == 1
+        assert db.session.get(ProductTrend, 'P0005').trend == 'up'
+        assert db.session.get(ProductTrend, 'P0006').trend == 'stable'
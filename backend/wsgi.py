@@ -0,0 +1,13 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+main.py's app.run() is only for local development.
+"""
+from main import create_app, init_db
+from app.services.ollama_service import warm_up_ollama
+
+app = create_app()
+init_db(app)
+warm_up_ollama(app)
@@ -0,0 +1,125 @@
+import React, { useState, useEffect } from 'react';
+import { Box, Typography, Paper, Grid, Slider, Chip, Table, TableBody, TableCell, TableHead, TableRow } from '@mui/material';
+import { LocalShipping } from '@mui/icons-material';
+import { predictionService } from '../../services/api';
+
+// What-if view over the catalog-wide reorder optimizer: every slider change re-runs it on the server
+const RestockPlanner: React.FC = () => {
+  const [serviceLevel, setServiceLevel] = useState<number>(95);
+  const [orderingCost, setOrderingCost] = useState<number>(50);
+  const [holdingRate, setHoldingRate] = useState<number>(25);
+  const [plan, setPlan] = useState<any>(null);
+  const [risk, setRisk] = useState<any>(null);
+
+  useEffect(() => {
+    // Debounce slider drags so only the settled value is sent
+    const timer = setTimeout(async () => {
+      const params = {
+        service_level: serviceLevel / 100,
+        ordering_cost: orderingCost,
+        holding_rate: holdingRate / 100
+      };
+      setPlan(await predictionService.getRestockPlan(params));
+      // Slower than the plan itself: show it when it arrives
+      predictionService.simulateRestockPolicy(params).then(setRisk);
+    }, 250);
+    return () => clearTimeout(timer);
+  }, [serviceLevel, orderingCost, holdingRate]);
+
+  return (
+    <Paper elevation={3} className="p-6 mb-6 bg-white">
+      <Typography variant="h5" className="mb-4 font-bold flex items-center">
+        <LocalShipping className="mr-2 text-primary" />
+        Restock Planner
+      </Typography>
+
+      <Grid container spacing={4}>
+        <Grid item xs={12} md={4}>
+          <Typography gutterBottom>Service Level: {serviceLevel}%</Typography>
+          <Slider value={serviceLevel} onChange={(_, value) => setServiceLevel(value as number)}
+                  min={50} max={99.5} step={0.5} valueLabelDisplay="auto" />
+          <Typography gutterBottom>Cost per Order: ${orderingCost}</Typography>
+          <Slider value={orderingCost} onChange={(_, value) => setOrderingCost(value as number)}
+                  min={0} max={500} step={5} valueLabelDisplay="auto" />
+          <Typography gutterBottom>Yearly Holding Cost: {holdingRate}% of purchase price</Typography>
+          <Slider value={holdingRate} onChange={(_, value) => setHoldingRate(value as number)}
+                  min={1} max={60} step={1} valueLabelDisplay="auto" />
+        </Grid>
+
+        <Grid item xs={12} md={8}>
+          {!plan ? (
+            <Typography className="text-gray-600">The restock planner needs the backend to be running.</Typography>
+          ) : (
+            <>
+              <Box className="flex flex-wrap gap-2 mb-4">
+                <Chip label={`${plan.summary.due} products due`} color="warning" />
+                <Chip label={`${plan.summary.consolidated} consolidated`} color="info" />
+                <Chip label={`${plan.summary.purchase_orders} purchase orders`} color="primary" />
+                <Chip label={`Order value: $${plan.summary.order_value.toFixed(2)}`} color="secondary" />
+                <Chip label={`Safety stock value: $${plan.summary.safety_stock_value.toFixed(2)}`} />
+                <Chip label={`Yearly holding + ordering: $${(plan.summary.annual_holding_cost + plan.summary.annual_ordering_cost).toFixed(2)}`} />
+              </Box>
+
+              {risk && (
+                <Box className="mb-4">
+                  <Typography variant="subtitle1" className="font-bold mb-2">
+                    Stockout risk over the next {risk.parameters.horizon_days} days ({risk.parameters.paths} simulated paths)
+                  </Typography>
+                  <Box className="flex flex-wrap gap-2 mb-2">
+                    <Chip label={`${risk.summary.at_risk} products below target service level`}
+                          color={risk.summary.at_risk ? 'error' : 'success'} />
+                    <Chip label={`Expected lost units: ${risk.summary.expected_lost_units.toFixed(0)}`} />
+                    <Chip label={`Expected lost revenue: $${risk.summary.expected_lost_revenue.toFixed(2)}`} />
+                  </Box>
+                  <Table size="small">
+                    <TableHead>
+                      <TableRow>
+                        <TableCell>Product</TableCell>
+                        <TableCell align="right">Stockout probability</TableCell>
+                        <TableCell align="right">Expected lost sales</TableCell>
+                        <TableCell align="right">Fill rate</TableCell>
+                      </TableRow>
+                    </TableHead>
+                    <TableBody>
+                      {risk.products.slice(0, 5).map((item: any) => (
+                        <TableRow key={item.id}>
+                          <TableCell>{item.name}</TableCell>
+                          <TableCell align="right">{(item.stockout_probability * 100).toFixed(1)}%</TableCell>
+                          <TableCell align="right">{item.expected_lost_sales.toFixed(1)}</TableCell>
+                          <TableCell align="right">{(item.fill_rate * 100).toFixed(1)}%</TableCell>
+                        </TableRow>
+                      ))}
+                    </TableBody>
+                  </Table>
+                </Box>
+              )}
+
+              <Table size="small">
+                <TableHead>
+                  <TableRow>
+                    <TableCell>Supplier</TableCell>
+                    <TableCell align="right">Lines</TableCell>
+                    <TableCell align="right">Units</TableCell>
+                    <TableCell align="right">Value</TableCell>
+                  </TableRow>
+                </TableHead>
+                <TableBody>
+                  {plan.suppliers.slice(0, 10).map((order: any) => (
+                    <TableRow key={order.supplier}>
+                      <TableCell>{order.supplier}</TableCell>
+                      <TableCell align="right">{order.lines}</TableCell>
+                      <TableCell align="right">{order.units}</TableCell>
+                      <TableCell align="right">${order.value.toFixed(2)}</TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+            </>
+          )}
+        </Grid>
+      </Grid>
+    </Paper>
+  );
+};
+
+export default RestockPlanner;
@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect, ReactNode } from 'react';
-import { inventoryService } from '../services/api';
+import { alertService, inventoryService } from '../services/api';
 
 interface Notification {
   id: string;
@@ -19,6 +19,56 @@ interface NotificationContextType {
   clearSelectedNotifications: (ids: string[]) => void;
 }
 
+interface StockAlert {
+  product_id: string;
+  product_name: string;
+  alert_type: 'low_stock' | 'out_of_stock' | 'restocked';
+  current_stock: number;
+}
+
+const alertNotification = (alert: StockAlert): Notification => {
+  const messages = {
+    out_of_stock: { message: `${alert.product_name} is out of stock.`, type: 'error' as const },
+    low_stock: { message: `${alert.product_name} is running low (${alert.current_stock} left).`, type: 'warning' as const },
+    restocked: { message: `${alert.product_name} is back in stock (${alert.current_stock} units).`, type: 'success' as const }
+  };
+  return {
+    id: `product-${alert.product_id}-${alert.alert_type.replace(/_/g, '-')}`,
+    ...messages[alert.alert_type],
+    timestamp: new Date(),
+    read: false
+  };
+};
+
+// Summary plus one notification per product, from a list of current alerts
+const buildStockNotifications = (alerts: StockAlert[]): Notification[] => {
+  const notifications: Notification[] = [];
+  const outOfStock = alerts.filter(alert => alert.alert_type === 'out_of_stock');
+  const lowStock = alerts.filter(alert => alert.alert_type === 'low_stock');
+
+  if (outOfStock.length > 0) {
+    notifications.push({
+      id: `out-of-stock-${Date.now()}`,
+      message: `${outOfStock.length} products are out of stock!`,
+      type: 'error',
+      timestamp: new Date(),
+      read: false
+    });
+    notifications.push(...outOfStock.map(alertNotification));
+  }
+  if (lowStock.length > 0) {
+    notifications.push({
+      id: `low-stock-${Date.now()}`,
+      message: `${lowStock.length} products are running low!`,
+      type: 'warning',
+      timestamp: new Date(),
+      read: false
+    });
+    notifications.push(...lowStock.map(alertNotification));
+  }
+  return notifications;
+};
+
 const NotificationContext = createContext<NotificationContextType | undefined>(undefined);
 
 export const useNotifications = () => {
@@ -37,69 +87,40 @@ export const NotificationProvider: React.FC<NotificationProviderProps> = ({ chil
   const [notifications, setNotifications] = useState<Notification[]>([]);
   
   useEffect(() => {
-    // Generate initial notifications based on inventory status
+    const welcome: Notification = {
+      id: `welcome-${Date.now()}`,
+      message: 'Welcome to InventIQ! Your smart inventory management system.',
+      type: 'info',
+      timestamp: new Date(),
+      read: false
+    };
+
+    // Alerts stream from the server: a snapshot of low/out-of-stock products on
+    // first connect, then only the products that cross their reorder level.
+    const source = alertService.subscribe(
+      (alerts) => setNotifications(prev => [...buildStockNotifications(alerts), welcome, ...prev]),
+      (alert) => setNotifications(prev => [
+        alertNotification(alert),
+        ...prev.filter(notification => !notification.id.startsWith(`product-${alert.product_id}-`))
+      ])
+    );
+    if (source) {
+      return () => source.close();
+    }
+
+    // Mock data has no alert stream, so scan the product list instead
     const generateInitialNotifications = async () => {
       try {
         const products = await inventoryService.getAllProducts();
-        
-        const newNotifications: Notification[] = [];
-        
-        // Check for out of stock products
-        const outOfStockProducts = products.filter((p: any) => p.current_stock === 0);
-        if (outOfStockProducts.length > 0) {
-          newNotifications.push({
-            id: `out-of-stock-${Date.now()}`,
-            message: `${outOfStockProducts.length} products are out of stock!`,
-            type: 'error',
-            timestamp: new Date(),
-            read: false
-          });
-          
-          // Add individual notifications for each out of stock product
-          outOfStockProducts.forEach((product: any) => {
-            newNotifications.push({
-              id: `product-${product.id}-out-of-stock`,
-              message: `${product.name} is out of stock.`,
-              type: 'error',
-              timestamp: new Date(),
-              read: false
-            });
-          });
-        }
-        
-        // Check for low stock products
-        const lowStockProducts = products.filter((p: any) => p.current_stock > 0 && p.current_stock <= p.reorder_level);
-        if (lowStockProducts.length > 0) {
-          newNotifications.push({
-            id: `low-stock-${Date.now()}`,
-            message: `${lowStockProducts.length} products are running low!`,
-            type: 'warning',
-            timestamp: new Date(),
-            read: false
-          });
-          
-          // Add individual notifications for each low stock product
-          lowStockProducts.forEach((product: any) => {
-            newNotifications.push({
-              id: `product-${product.id}-low-stock`,
-              message: `${product.name} is running low (${product.current_stock} left).`,
-              type: 'warning',
-              timestamp: new Date(),
-              read: false
-            });
-          });
-        }
-        
-        // Add a welcome notification
-        newNotifications.push({
-          id: `welcome-${Date.now()}`,
-          message: 'Welcome to InventIQ! Your smart inventory management system.',
-          type: 'info',
-          timestamp: new Date(),
-          read: false
-        });
-        
-        setNotifications(newNotifications);
+        const alerts = products
+          .filter((p: any) => p.current_stock <= p.reorder_level)
+          .map((p: any) => ({
+            product_id: p.id,
+            product_name: p.name,
+            alert_type: p.current_stock === 0 ? 'out_of_stock' : 'low_stock',
+            current_stock: p.current_stock
+          }));
+        setNotifications([...buildStockNotifications(alerts), welcome]);
       } catch (error) {
         console.error('Failed to generate initial notifications:', error);
       }
@@ -1,4 +1,4 @@
-import React, { createContext, useState, useContext, useCallback } from 'react';
+import React, { createContext, useState, useContext, useCallback, useRef } from 'react';
 import { useSpeechRecognition } from 'react-speech-recognition';
 import { predictionService } from '../services/api';
 
@@ -18,6 +18,8 @@ const VoiceContext = createContext<VoiceContextProps>({} as VoiceContextProps);
 export const VoiceProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
   const [response, setResponse] = useState('');
   const [isProcessing, setIsProcessing] = useState(false);
+  // Follow-up questions continue the same assistant conversation
+  const sessionId = useRef<string | undefined>(undefined);
 
   const {
     transcript,
@@ -35,7 +37,8 @@ export const VoiceProvider: React.FC<{ children: React.ReactNode }> = ({ childre
   const processQuery = async (query: string) => {
     setIsProcessing(true);
     try {
-      const result = await predictionService.getLLMInsights(query);
+      const result = await predictionService.getLLMInsights(query, undefined, sessionId.current);
+      sessionId.current = result.session_id ?? sessionId.current;
       setResponse(result.insights);
       speak(result.insights);
     } catch (error) {
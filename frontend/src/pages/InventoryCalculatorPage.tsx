@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { PieChart, Pie, Cell, ResponsiveContainer, Tooltip, Legend, BarChart, Bar, XAxis, YAxis, CartesianGrid } from 'recharts';
 import { Box, Typography, Paper, Grid, Slider, TextField, Button, Divider, Chip } from '@mui/material';
 import { Calculate, TrendingUp, ShowChart, PieChartOutlined, BarChartOutlined, MonetizationOn } from '@mui/icons-material';
+import RestockPlanner from '../components/RestockPlanner/RestockPlanner';
 
 const COLORS = ['#0088FE', '#00C49F', '#FFBB28', '#FF8042', '#8884D8', '#82CA9D'];
 
@@ -286,6 +287,8 @@ const InventoryCalculatorPage: React.FC = () => {
           </Grid>
         </Grid>
       </Paper>
+      
+      <RestockPlanner />
     </Box>
   );
 };
@@ -22,6 +22,7 @@ const InventoryPage: React.FC = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [searchResults, setSearchResults] = useState<{ ids: string[]; total: number; exact: boolean } | null>(null);
   const [categoryFilter, setCategoryFilter] = useState('');
   const [stockFilter, setStockFilter] = useState('');
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false);
@@ -66,6 +67,36 @@ const InventoryPage: React.FC = () => {
     };
   }, []);
 
+  // Search on the server once typing pauses; results come back ranked
+  useEffect(() => {
+    if (!searchTerm.trim()) {
+      setSearchResults(null);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const data = await inventoryService.searchProducts(searchTerm, {
+          per_page: 100,
+          category: categoryFilter || undefined
+        });
+        if (!cancelled) {
+          setSearchResults({
+            ids: data.products.map((product: Product) => product.id),
+            total: data.total,
+            exact: data.total_exact
+          });
+        }
+      } catch (err) {
+        console.error('Search failed:', err);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, categoryFilter]);
+
   // Get unique categories for the filter
   const categories = Array.from(new Set(products.map(product => product.category)));
 
@@ -147,10 +178,13 @@ const InventoryPage: React.FC = () => {
     setProductToDelete(null);
   };
 
-  // Filter products based on search and filters
+  // Filter products based on search and filters, keeping the search ranking
+  const searchRank = new Map((searchResults?.ids || []).map((id, rank) => [id, rank]));
   const filteredProducts = products.filter(product => {
-    const matchesSearch = product.name.toLowerCase().includes(searchTerm.toLowerCase()) || 
-                        product.id.toLowerCase().includes(searchTerm.toLowerCase());
+    const matchesSearch = !searchTerm.trim() || (searchResults
+      ? searchRank.has(product.id)
+      : product.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
+        product.id.toLowerCase().includes(searchTerm.toLowerCase()));
     const matchesCategory = categoryFilter ? product.category === categoryFilter : true;
     const matchesStock = stockFilter === 'low' 
       ? product.current_stock <= product.reorder_level
@@ -162,6 +196,9 @@ const InventoryPage: React.FC = () => {
     
     return matchesSearch && matchesCategory && matchesStock;
   });
+  if (searchResults) {
+    filteredProducts.sort((a, b) => (searchRank.get(a.id) ?? 0) - (searchRank.get(b.id) ?? 0));
+  }
 
   if (loading) return <div className="flex justify-center items-center h-full">Loading...</div>;
   if (error) return <div className="text-red-500">Error: {error}</div>;
@@ -187,9 +224,14 @@ const InventoryPage: React.FC = () => {
               type="text"
               value={searchTerm}
               onChange={(e) => setSearchTerm(e.target.value)}
-              placeholder="Search by name or ID..."
+              placeholder="Search by name, ID, category or supplier..."
               className="w-full p-2 border border-gray-300 rounded"
             />
+            {searchResults && searchResults.total > searchResults.ids.length && (
+              <p className="text-xs text-gray-500 mt-1">
+                Showing the best {searchResults.ids.length} of {searchResults.total}{searchResults.exact ? '' : '+'} matches
+              </p>
+            )}
           </div>
           
           <div>
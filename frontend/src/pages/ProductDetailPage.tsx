@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { inventoryService, predictionService } from '../services/api';
+import { inventoryService } from '../services/api';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import { useVoice } from '../contexts/VoiceContext';
 
@@ -47,12 +47,10 @@ const ProductDetailPage: React.FC = () => {
       
       setLoading(true);
       try {
-        // Fetch product details
-        const productData = await inventoryService.getProduct(productId);
+        // Product, forecast and restock recommendation in one request
+        const { product: productData, forecast: forecastData, restock: recommendationData } =
+          await inventoryService.getProductDetails(productId, forecastDays);
         setProduct(productData);
-        
-        // Fetch forecast
-        const forecastData = await predictionService.getDemandForecast(productId, forecastDays);
         setForecast(forecastData.forecast);
         
         // Check if product is trending
@@ -70,12 +68,7 @@ const ProductDetailPage: React.FC = () => {
           setIsTrending(recentAvg > olderAvg * 1.1); // 10% increase = trending
         }
         
-        
-        // Fetch restock recommendation
-        const recommendationData = await predictionService.getRestockRecommendation(
-          productId, 
-          isTrending
-        );
+        // The backend detects the trend itself for its recommendation
         setRecommendation(recommendationData.recommendation);
         
       } catch (err: any) {
@@ -86,7 +79,7 @@ const ProductDetailPage: React.FC = () => {
     };
 
     fetchData();
-  }, [productId, forecastDays, isTrending]);
+  }, [productId, forecastDays]);
 
   // Prepare chart data
 const prepareChartData = (): { day: string; lstm: number; prophet: number; ensemble: number }[] => {
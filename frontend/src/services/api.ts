@@ -100,6 +100,19 @@ export const authService = {
   },
 };
 
+// Batched requests: several API calls in one round trip, authenticated once by the server
+export const batchService = {
+  // Paths are relative to the API; resolves to one { status, body } per request, in order.
+  // parallel lets the server run a batch of GETs concurrently.
+  run: async (requests: { method?: string; path: string; body?: any }[], parallel: boolean = false) => {
+    const response = await api.post('/batch', {
+      requests: requests.map((request) => ({ method: 'GET', ...request, path: `/api${request.path}` })),
+      parallel
+    });
+    return response.data.responses as { status: number; body: any }[];
+  }
+};
+
 // Inventory services
 export const inventoryService = {
   getAllProducts: async () => {
@@ -115,6 +128,47 @@ export const inventoryService = {
       return await mockApiService.getAllProducts();
     }
   },
+  searchProducts: async (query: string, params: { page?: number; per_page?: number; category?: string } = {}) => {
+    if (useMockData) {
+      const products = await mockApiService.getAllProducts();
+      const terms = query.toLowerCase().split(/\W+/).filter(Boolean);
+      const matches = products.filter((product: any) => terms.every(term =>
+        [product.id, product.name, product.category, product.supplier].some(field =>
+          String(field).toLowerCase().split(/\W+/).some(word => word.startsWith(term)))) &&
+        (!params.category || product.category === params.category));
+      return { query, total: matches.length, total_exact: true, page: 1, per_page: matches.length, products: matches };
+    }
+    const response = await api.get('/inventory/search', { params: { q: query, ...params } });
+    return response.data;
+  },
+  // The product page's product, forecast and restock recommendation in one batch
+  getProductDetails: async (productId: string, forecastDays: number = 30) => {
+    if (!useMockData) {
+      let responses;
+      try {
+        responses = await batchService.run([
+          { path: `/inventory/${productId}` },
+          { path: `/predictions/forecast/${productId}?days=${forecastDays}` },
+          { path: `/predictions/restock/${productId}` }
+        ]);
+      } catch (error) {
+        console.error('Error fetching product details in a batch, fetching them one by one:', error);
+      }
+      if (responses) {
+        const failed = responses.find((item) => item.status >= 400);
+        if (failed) {
+          throw new Error(failed.body?.message || `Request failed with status ${failed.status}`);
+        }
+        const [product, forecast, restock] = responses.map((item) => item.body);
+        return { product, forecast, restock };
+      }
+    }
+    return {
+      product: await inventoryService.getProduct(productId),
+      forecast: await predictionService.getDemandForecast(productId, forecastDays),
+      restock: await predictionService.getRestockRecommendation(productId)
+    };
+  },
   getProduct: async (productId: string) => {
     if (useMockData) {
       return await mockApiService.getProduct(productId);
@@ -163,12 +217,15 @@ export const inventoryService = {
     const response = await api.delete(`/inventory/${productId}?delete_supplier=${deleteSupplier}`);
     return response.data;
   },
-  recordTransaction: async (transactionData: any) => {
+  // Pass the same idempotencyKey when retrying a transaction so it is only recorded once
+  recordTransaction: async (transactionData: any, idempotencyKey: string = crypto.randomUUID()) => {
     if (useMockData) {
       // Simulate successful transaction recording
       return { success: true, message: 'Transaction recorded successfully (Mock)' };
     }
-    const response = await api.post('/inventory/transaction', transactionData);
+    const response = await api.post('/inventory/transaction', transactionData, {
+      headers: { 'Idempotency-Key': idempotencyKey }
+    });
     return response.data;
   },
 };
@@ -206,19 +263,21 @@ export const predictionService = {
       };
     }
   },
-  getRestockRecommendation: async (productId: string, isTrending: boolean = false) => {
+  // Leave isTrending out to let the backend detect the product's trend
+  getRestockRecommendation: async (productId: string, isTrending?: boolean) => {
     if (useMockData) {
       // Return mock restock recommendation
       return {
         product_id: productId,
         recommended_restock: Math.floor(Math.random() * 100) + 50,
         optimal_order_time: new Date(Date.now() + 86400000 * 3).toISOString(),
-        is_trending: isTrending,
+        is_trending: !!isTrending,
         confidence: 0.92
       };
     }
     try {
-      const response = await api.get(`/predictions/restock/${productId}?trending=${isTrending}`);
+      const params = isTrending === undefined ? {} : { trending: isTrending };
+      const response = await api.get(`/predictions/restock/${productId}`, { params });
       return response.data;
     } catch (error) {
       console.error('Error fetching restock recommendation, using mock data:', error);
@@ -228,12 +287,13 @@ export const predictionService = {
         product_id: productId,
         recommended_restock: Math.floor(Math.random() * 100) + 50,
         optimal_order_time: new Date(Date.now() + 86400000 * 3).toISOString(),
-        is_trending: isTrending,
+        is_trending: !!isTrending,
         confidence: 0.92
       };
     }
   },
-  getLLMInsights: async (query: string, productId?: string) => {
+  // sessionId continues a conversation; the response carries the session_id to pass on the next question
+  getLLMInsights: async (query: string, productId?: string, sessionId?: string) => {
     if (useMockData) {
       // Return mock insights
       return {
@@ -243,7 +303,11 @@ export const predictionService = {
       };
     }
     try {
-      const payload = productId ? { query, product_id: productId } : { query };
+      const payload = {
+        query,
+        ...(productId ? { product_id: productId } : {}),
+        ...(sessionId ? { session_id: sessionId } : {})
+      };
       const response = await api.post('/predictions/insights', payload);
       return response.data;
     } catch (error) {
@@ -258,6 +322,35 @@ export const predictionService = {
     }
   },
   
+  // Catalog-wide reorder points, EOQ and supplier orders for the given what-if parameters
+  getRestockPlan: async (params: { service_level?: number; ordering_cost?: number; holding_rate?: number; review_days?: number }) => {
+    if (useMockData) {
+      return null;
+    }
+    try {
+      const response = await api.get('/predictions/optimize', { params: { ...params, items: 10 } });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching restock plan:', error);
+      return null;
+    }
+  },
+  
+  // Monte Carlo stockout risk of the reorder policy for the given what-if parameters
+  simulateRestockPolicy: async (params: { service_level?: number; ordering_cost?: number; holding_rate?: number;
+                                          product_ids?: string[]; paths?: number; horizon_days?: number }) => {
+    if (useMockData) {
+      return null;
+    }
+    try {
+      const response = await api.post('/predictions/simulate', { paths: 1000, horizon_days: 30, items: 10, ...params });
+      return response.data;
+    } catch (error) {
+      console.error('Error simulating restock policy:', error);
+      return null;
+    }
+  },
+  
   // Add a method to get dashboard data
   getDashboardData: async () => {
     if (useMockData) {
@@ -289,4 +382,55 @@ export const predictionService = {
   }
 };
 
+// Stock alert services
+export const alertService = {
+  // Opens the server-sent alert stream. Returns null when running on mock data,
+  // in which case callers fall back to scanning the product list.
+  subscribe: (onSnapshot: (alerts: any[]) => void, onAlert: (alert: any) => void) => {
+    const token = localStorage.getItem('token');
+    if (useMockData || !token || typeof EventSource === 'undefined') {
+      return null;
+    }
+    // EventSource cannot send headers, so the stream authenticates with a
+    // short-lived stream token in the query string instead of the session token.
+    // The browser reconnects on its own, resuming from the last event id; once
+    // the stream token has expired the reconnect is refused and a fresh one is fetched.
+    let source: EventSource | null = null;
+    let closed = false;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+
+    const open = async () => {
+      try {
+        const response = await api.post('/auth/stream-token');
+        if (closed) {
+          return;
+        }
+        source = new EventSource(`${API_URL}/alerts/stream?token=${encodeURIComponent(response.data.token)}`);
+        source.addEventListener('snapshot', (event) => onSnapshot(JSON.parse((event as MessageEvent).data)));
+        source.addEventListener('alert', (event) => onAlert(JSON.parse((event as MessageEvent).data)));
+        source.onerror = () => {
+          if (source && source.readyState === EventSource.CLOSED && !closed) {
+            retry = setTimeout(open, 1000);
+          }
+        };
+      } catch (error) {
+        console.error('Error opening the alert stream:', error);
+        // A refused session stays refused; anything else is worth another try
+        if (!closed && (error as any)?.response?.status !== 401) {
+          retry = setTimeout(open, 5000);
+        }
+      }
+    };
+
+    open();
+    return {
+      close: () => {
+        closed = true;
+        clearTimeout(retry);
+        source?.close();
+      }
+    };
+  }
+};
+
 export default api;
\ No newline at end of file